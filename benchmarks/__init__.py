@@ -0,0 +1 @@
+"""Micro benchmarks for the comparison pipeline."""
@@ -0,0 +1,50 @@
+"""Keyword template detection: one automaton pass vs. searching each keyword.
+
+Run with ``python -m benchmarks.classifier``.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import timeit
+
+from datacomparison.services.classifier import TemplateClassifier
+
+ALPHABET = "借款合同承诺书租赁保证担保抵押质押授权委托声明确认收据发票申请表登记证明协议补充变更解除终止"
+
+
+def _word(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(length))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--templates", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--keywords", type=int, default=5)
+    parser.add_argument("--text-length", type=int, default=5000)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    text = _word(rng, args.text_length)
+    for count in args.templates:
+        specs = {f"template_{index}": [_word(rng, rng.randint(3, 6)) for _ in range(args.keywords)] for index in range(count)}
+        classifier = TemplateClassifier(specs)
+
+        def naive() -> None:
+            scores = {
+                template_id: sum(keyword in text for keyword in keywords) / len(keywords)
+                for template_id, keywords in specs.items()
+            }
+            max(scores.items(), key=lambda item: item[1])
+
+        automaton = timeit.timeit(lambda: classifier.classify(text), number=args.number) / args.number
+        baseline = timeit.timeit(naive, number=args.number) / args.number
+        print(
+            f"{count:>5} templates: automaton {automaton * 1e3:7.2f} ms, "
+            f"per-keyword search {baseline * 1e3:7.2f} ms (x{baseline / automaton:.1f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Compare per-call template setup with the compiled execution plan.
+
+Run with ``python -m benchmarks.compiled_plan``.
+"""
+from __future__ import annotations
+
+import argparse
+import timeit
+
+from datacomparison.services import comparison, extraction
+from datacomparison.services.service import DocumentComparisonService
+from datacomparison.templates import TemplateRegistry
+
+DOCUMENT_TEXT = "承诺书\n姓名：张三\n身份证号：110101199001011234\n金额：100,000.00\n日期：2024-05-20"
+SYSTEM_DATA = {
+    "customer_name": "张三",
+    "id_number": "110101199001011234",
+    "amount": "100000.00",
+    "signing_date": "2024-05-20",
+}
+
+
+def legacy_compare(template, text, system_data):
+    """Per-field registry lookups, regex compilation and config parsing on every call."""
+
+    for field_template in template.fields.values():
+        extractor = extraction.registry.get(field_template.extractor.get("strategy", "regex"))
+        extracted = extractor.extract(text, field_template.extractor, field_template.name)
+        value = extracted.value
+        for normalizer in field_template.normalizers:
+            value = normalizer(value)
+        comparator = comparison.registry.get(field_template.comparison.get("strategy", "exact"))
+        comparator.compare(field_template.name, system_data.get(field_template.name), value or extracted.value, field_template.comparison)
+
+
+def planned_compare(plan, text, system_data):
+    """The same work driven by the precompiled plan."""
+
+    for field_plan in plan.fields:
+        extracted = field_plan.extract(text)
+        value = field_plan.normalize(extracted.value)
+        field_plan.compare(system_data.get(field_plan.name), value or extracted.value)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    template = TemplateRegistry().load("promise_letter")
+    service = DocumentComparisonService()
+
+    legacy = timeit.timeit(lambda: legacy_compare(template, DOCUMENT_TEXT, SYSTEM_DATA), number=args.number)
+    planned = timeit.timeit(lambda: planned_compare(template.plan, DOCUMENT_TEXT, SYSTEM_DATA), number=args.number)
+    end_to_end = timeit.timeit(
+        lambda: service.compare("promise_letter", SYSTEM_DATA, document_text=DOCUMENT_TEXT),
+        number=args.number,
+    )
+    print(f"legacy field loop:   {legacy / args.number * 1e6:8.2f} us/compare")
+    print(f"compiled field loop: {planned / args.number * 1e6:8.2f} us/compare")
+    print(f"speedup:             {legacy / planned:8.2f}x")
+    print(f"service.compare:     {end_to_end / args.number * 1e6:8.2f} us/compare")
+
+
+if __name__ == "__main__":
+    main()
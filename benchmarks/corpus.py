@@ -0,0 +1,217 @@
+"""Synthetic promise-letter corpora for the benchmark suite.
+
+Run with ``python -m benchmarks.corpus out/ --size 100 --formats txt pdf png``.
+Generation is seeded, so the same arguments always produce the same
+records and text. Formats:
+
+* ``txt`` - plain text files.
+* ``pdf`` - PDFs with a text layer, using the non-embedded ``STSong-Light``
+  CJK font that every PDF reader provides.
+* ``scan_pdf`` - image-only PDFs of the rendered page, as from a scanner.
+* ``png`` - rendered page images; the letter text is also stored in an
+  ``iTXt`` chunk (see :data:`TEXT_CHUNK`) for stand-in OCR backends.
+
+Rendering needs Pillow; pass ``--font`` with a CJK TrueType font for
+legible Chinese glyphs, otherwise the first font found is used.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+try:  # optional dependency for rendered pages
+    from PIL import Image, ImageDraw, ImageFont  # type: ignore
+    from PIL.PngImagePlugin import PngInfo  # type: ignore
+except Exception:  # pragma: no cover - dependency might be unavailable
+    Image = ImageDraw = ImageFont = PngInfo = None  # type: ignore
+
+FORMATS = ("txt", "pdf", "scan_pdf", "png")
+# PNG text chunk keyword holding the ground-truth text of a rendered page
+TEXT_CHUNK = "datacomparison:text"
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗"
+GIVEN_NAMES = "伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超秀兰霞平刚桂英"
+# 18-digit resident id check digit weights and codes
+_ID_WEIGHTS = (7, 9, 10, 5, 8, 4, 2, 1, 6, 3, 7, 9, 10, 5, 8, 4, 2)
+_ID_CHECK = "10X98765432"
+_FONT_CANDIDATES = (
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/System/Library/Fonts/PingFang.ttc",
+    "C:/Windows/Fonts/simhei.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+# A4 at 150 DPI
+_PAGE_SIZE = (1240, 1754)
+_PAGE_DPI = 150
+
+
+@dataclass(frozen=True)
+class LetterRecord:
+    """System data of one letter and the text printed on it."""
+
+    name: str
+    document_id: str
+    system_data: Dict[str, str]
+    text: str
+
+
+def _id_number(rng: random.Random) -> str:
+    body = f"{rng.randint(110000, 659000)}{rng.randint(1950, 2004)}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}{rng.randint(0, 999):03d}"
+    return body + _ID_CHECK[sum(int(digit) * weight for digit, weight in zip(body, _ID_WEIGHTS)) % 11]
+
+
+def generate_records(size: int, seed: int = 0, mismatch_rate: float = 0.1) -> List[LetterRecord]:
+    """Letters with varied number and date formats; ``mismatch_rate`` of them disagree with their system data."""
+
+    rng = random.Random(seed)
+    records = []
+    for index in range(size):
+        name = rng.choice(SURNAMES) + "".join(rng.choice(GIVEN_NAMES) for _ in range(rng.randint(1, 2)))
+        id_number = _id_number(rng)
+        cents = rng.randint(100_00, 5_000_000_00)
+        amount = f"{cents // 100}.{cents % 100:02d}"
+        year, month, day = rng.randint(2018, 2025), rng.randint(1, 12), rng.randint(1, 28)
+        system_data = {
+            "customer_name": name,
+            "id_number": id_number,
+            "amount": amount,
+            "signing_date": f"{year}-{month:02d}-{day:02d}",
+        }
+        printed_amount = f"{cents // 100:,}.{cents % 100:02d}" if rng.random() < 0.5 else amount
+        printed_date = rng.choice(
+            (f"{year}-{month:02d}-{day:02d}", f"{year}/{month}/{day}", f"{year}年{month}月{day}日", f"{year}.{month:02d}.{day:02d}")
+        )
+        if rng.random() < mismatch_rate:
+            printed_amount = f"{cents // 100 + rng.randint(1, 999)}.00"
+        text = "\n".join(
+            (
+                "承诺书",
+                f"承诺人姓名：{name}",
+                f"身份证号：{id_number}",
+                f"本人承诺于约定期限内归还借款，金额：{printed_amount}",
+                "如未按期履行，愿承担相应法律责任。",
+                f"日期：{printed_date}",
+            )
+        )
+        records.append(LetterRecord(name, f"letter-{index:05d}", system_data, text))
+    return records
+
+
+def _pdf_text(text: str) -> str:
+    """Hex string in the UCS-2 encoding of the ``UniGB-UCS2-H`` CMap."""
+
+    return "<" + text.encode("utf-16-be").hex().upper() + ">"
+
+
+def text_pdf(text: str) -> bytes:
+    """A one-page A4 PDF with ``text`` as its text layer."""
+
+    lines = " T* ".join(f"{_pdf_text(line)} Tj" for line in text.splitlines())
+    content = f"BT /F1 14 Tf 22 TL 72 770 Td {lines} ET".encode("ascii")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content),
+        b"<< /Type /Font /Subtype /Type0 /BaseFont /STSong-Light /Encoding /UniGB-UCS2-H /DescendantFonts [6 0 R] >>",
+        b"<< /Type /Font /Subtype /CIDFontType0 /BaseFont /STSong-Light"
+        b" /CIDSystemInfo << /Registry (Adobe) /Ordering (GB1) /Supplement 2 >> /FontDescriptor 7 0 R >>",
+        b"<< /Type /FontDescriptor /FontName /STSong-Light /Flags 6 /FontBBox [-25 -254 1000 880]"
+        b" /ItalicAngle 0 /Ascent 880 /Descent -120 /CapHeight 880 /StemV 93 >>",
+    ]
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(output)
+
+
+def load_font(path: Optional[Path] = None, size: int = 36):
+    if ImageFont is None:
+        raise RuntimeError("Pillow is required to render pages")
+    for candidate in ([str(path)] if path else []) + list(_FONT_CANDIDATES):
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def render_page(text: str, font=None):
+    """Grayscale A4 page at 150 DPI with ``text`` drawn on it."""
+
+    if Image is None:
+        raise RuntimeError("Pillow is required to render pages")
+    font = font or load_font()
+    page = Image.new("L", _PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(page)
+    y = 180
+    for line in text.splitlines():
+        draw.text((150, y), line, fill=0, font=font)
+        y += 70
+    page.info["dpi"] = (_PAGE_DPI, _PAGE_DPI)
+    return page
+
+
+def write_corpus(
+    directory: Path,
+    records: Sequence[LetterRecord],
+    formats: Iterable[str] = ("txt",),
+    font_path: Optional[Path] = None,
+) -> Dict[str, List[Path]]:
+    """Write every record in each of ``formats``; returns the paths per format in record order."""
+
+    formats = list(formats)
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown corpus formats: {sorted(unknown)}")
+    directory.mkdir(parents=True, exist_ok=True)
+    font = load_font(font_path) if {"scan_pdf", "png"} & set(formats) else None
+    paths: Dict[str, List[Path]] = {name: [] for name in formats}
+    for record in records:
+        page = render_page(record.text, font) if font is not None else None
+        for name in formats:
+            stem = directory / record.document_id
+            if name == "txt":
+                path = stem.with_suffix(".txt")
+                path.write_text(record.text, encoding="utf-8")
+            elif name == "pdf":
+                path = stem.with_suffix(".pdf")
+                path.write_bytes(text_pdf(record.text))
+            elif name == "scan_pdf":
+                path = directory / f"{record.document_id}-scan.pdf"
+                page.save(path, "PDF", resolution=_PAGE_DPI)
+            else:
+                path = stem.with_suffix(".png")
+                info = PngInfo()
+                info.add_itxt(TEXT_CHUNK, record.text)
+                page.save(path, dpi=(_PAGE_DPI, _PAGE_DPI), pnginfo=info)
+            paths[name].append(path)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=["txt", "pdf"])
+    parser.add_argument("--font", type=Path)
+    args = parser.parse_args()
+
+    records = generate_records(args.size, args.seed)
+    paths = write_corpus(args.directory, records, args.formats, args.font)
+    for name, written in paths.items():
+        print(f"{name}: {len(written)} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+"""Open-loop load test of the API with a stand-in OCR backend.
+
+Run with ``python -m benchmarks.loadtest run --rates 5 10 20 40 --duration 20``.
+Image parsing is replaced by :class:`StandInOcrParser`. It returns the text
+that :mod:`benchmarks.corpus` embeds in each generated PNG after a
+configurable simulated wait (``--ocr-latency``, like waiting on the
+tesseract subprocess) and CPU burn (``--ocr-cpu``). Runs are therefore
+deterministic and need no tesseract.
+
+Requests arrive as a seeded Poisson process at each offered rate whatever
+the server's progress (open loop). Latency is measured from the scheduled
+send time, so queueing in the client counts too. For each rate the
+throughput, latency percentiles, errors by kind and event-loop lag are
+reported. The first rate that misses its target (throughput below 90% of
+the rate requests were sent at, error rate above ``--max-error-rate`` or p99 above
+``--slo-ms``) is the saturation point.
+
+``--mode inprocess`` (default) drives the ASGI app in this process; client
+and server then share the event loop. ``--mode subprocess`` starts
+``python -m benchmarks.loadtest serve`` under uvicorn with ``--workers``
+processes, and the server reports its own loop lag on ``/loadtest/lag``
+(from whichever worker answers).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence
+
+from benchmarks.corpus import TEXT_CHUNK, generate_records, write_corpus
+from datacomparison import api
+from datacomparison.config import settings
+from datacomparison.services.document_parser import DEFAULT_REGISTRY, ParsedDocument
+from datacomparison.services.executor import TaskExecutor
+
+try:  # optional dependency for the load generator
+    import httpx  # type: ignore
+except Exception:  # pragma: no cover - dependency might be unavailable
+    httpx = None  # type: ignore
+
+# JSON options of install_standin; set for worker processes that import this module
+ENVIRONMENT_VARIABLE = "DATACOMPARISON_LOADTEST"
+TEMPLATE_ID = "promise_letter"
+_IMAGE_SUFFIXES = (".png", ".jpg", ".tif", ".tiff")
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+app = api.app
+
+
+def read_png_text(path: Path, keyword: str = TEXT_CHUNK) -> str:
+    """Text of the ``iTXt`` chunk named ``keyword``, read without decoding the image."""
+
+    with path.open("rb") as stream:
+        if stream.read(8) != _PNG_SIGNATURE:
+            raise ValueError(f"{path} is not a PNG file")
+        while True:
+            header = stream.read(8)
+            if len(header) < 8:
+                return ""
+            length, kind = struct.unpack(">I4s", header)
+            if kind == b"IDAT":
+                # text chunks written by benchmarks.corpus come before the image data
+                return ""
+            data = stream.read(length)
+            stream.read(4)  # CRC
+            if kind != b"iTXt":
+                continue
+            name, _, rest = data.partition(b"\0")
+            if name.decode("latin-1") != keyword:
+                continue
+            compressed = rest[0] == 1
+            # compression flag and method, then language tag and translated keyword
+            _language, _, rest = rest[2:].partition(b"\0")
+            _translated, _, text = rest.partition(b"\0")
+            return (zlib.decompress(text) if compressed else text).decode("utf-8")
+
+
+class StandInOcrParser:
+    """Deterministic replacement for ``ImageParser`` with simulated OCR cost.
+
+    Each page waits ``latency_seconds`` and burns ``cpu_seconds`` of CPU,
+    both scaled by up to ``jitter`` either way depending on the file name.
+    """
+
+    version = "standin"
+    cacheable = True
+
+    def __init__(self, latency_seconds: float = 0.2, cpu_seconds: float = 0.0, jitter: float = 0.0) -> None:
+        self.latency_seconds = latency_seconds
+        self.cpu_seconds = cpu_seconds
+        self.jitter = jitter
+
+    def _simulate(self, path: Path) -> None:
+        factor = 1.0 + self.jitter * (zlib.crc32(path.name.encode("utf-8")) / 0xFFFFFFFF * 2 - 1)
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds * factor)
+        if self.cpu_seconds:
+            deadline = time.process_time() + self.cpu_seconds * factor
+            while time.process_time() < deadline:
+                pass
+
+    def page_count(self, path: Path) -> int:
+        return 1
+
+    def parse_page(self, path: Path, index: int) -> str:
+        self._simulate(path)
+        return read_png_text(path)
+
+    def iter_pages(self, path: Path) -> Iterator[str]:
+        yield self.parse_page(path, 0)
+
+    def parse(self, path: Path) -> ParsedDocument:
+        return ParsedDocument(text=self.parse_page(path, 0))
+
+
+@dataclass
+class LoopLagMonitor:
+    """Samples how late ``asyncio.sleep(interval)`` wakes up on the running loop."""
+
+    interval: float = 0.01
+    samples: Deque[float] = field(default_factory=lambda: deque(maxlen=100_000))
+    _task: Optional["asyncio.Task[None]"] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def drain(self) -> List[float]:
+        samples = list(self.samples)
+        self.samples.clear()
+        return samples
+
+
+monitor = LoopLagMonitor()
+_installed: Dict[str, Any] = {}
+
+
+def install_standin(
+    latency_seconds: float = 0.2,
+    cpu_seconds: float = 0.0,
+    jitter: float = 0.0,
+    cache: bool = False,
+    process_workers: Optional[int] = None,
+    thread_workers: Optional[int] = None,
+    max_queue_depth: Optional[int] = None,
+) -> StandInOcrParser:
+    """Route images to the stand-in parser and size the API's pools.
+
+    The parse cache is off by default so every request does the simulated
+    OCR. Options are exported in :data:`ENVIRONMENT_VARIABLE` so uvicorn
+    workers importing this module install the same setup.
+    """
+
+    options = dict(
+        latency_seconds=latency_seconds,
+        cpu_seconds=cpu_seconds,
+        jitter=jitter,
+        cache=cache,
+        process_workers=process_workers,
+        thread_workers=thread_workers,
+        max_queue_depth=max_queue_depth,
+    )
+    parser = StandInOcrParser(latency_seconds, cpu_seconds, jitter)
+    for suffix in _IMAGE_SUFFIXES:
+        DEFAULT_REGISTRY.parsers[suffix] = parser
+    settings.cache.enabled = cache
+    executor_config = settings.executor
+    previous = api.comparison_service.executor
+    api.comparison_service.executor = TaskExecutor(
+        use_processes=executor_config.use_processes,
+        process_workers=process_workers or executor_config.process_workers,
+        thread_workers=thread_workers or executor_config.thread_workers,
+        driver_workers=executor_config.driver_workers,
+        max_queue_depth=max_queue_depth or executor_config.max_queue_depth,
+        task_timeout_seconds=executor_config.task_timeout_seconds,
+        max_tasks_per_worker=executor_config.max_tasks_per_worker,
+    )
+    previous.shutdown(wait=False)
+    if not _installed:
+        app.add_api_route("/loadtest/lag", _lag_samples, methods=["GET"])
+        app.add_event_handler("startup", monitor.start)
+    _installed.update(options)
+    os.environ[ENVIRONMENT_VARIABLE] = json.dumps(options)
+    return parser
+
+
+async def _lag_samples() -> Dict[str, List[float]]:
+    """Loop lag samples taken since the previous call."""
+
+    return {"samples": monitor.drain()}
+
+
+def percentile(ordered: Sequence[float], share: float) -> float:
+    """Nearest-rank percentile of sorted values; 0 when there are none."""
+
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+@dataclass
+class StepResult:
+    offered_rate: float
+    duration: float
+    sent: int = 0
+    latencies: List[float] = field(default_factory=list)
+    errors: Dict[str, int] = field(default_factory=dict)
+    loop_lag: List[float] = field(default_factory=list)
+    max_in_flight: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        lag = sorted(self.loop_lag)
+        failed = sum(self.errors.values())
+        return {
+            "offered_rate": self.offered_rate,
+            # Poisson arrivals only match the offered rate on average
+            "sent_rate": round(self.sent / self.duration, 2),
+            "sent": self.sent,
+            "succeeded": len(latencies),
+            "throughput": round(len(latencies) / self.elapsed, 2) if self.elapsed else 0.0,
+            "error_rate": round(failed / self.sent, 4) if self.sent else 0.0,
+            "errors": dict(sorted(self.errors.items())),
+            "latency_ms": {
+                name: round(percentile(latencies, share) * 1e3, 1)
+                for name, share in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))
+            },
+            "loop_lag_ms": {
+                name: round(percentile(lag, share) * 1e3, 2) for name, share in (("p50", 0.5), ("p99", 0.99), ("max", 1.0))
+            },
+            "max_in_flight": self.max_in_flight,
+        }
+
+
+def build_requests(size: int, seed: int, directory: Path, text_share: float) -> List[Dict[str, Any]]:
+    """Compare payloads for a generated corpus; ``text_share`` of them send the text inline."""
+
+    records = generate_records(size, seed)
+    paths = write_corpus(directory, records, ["png"])["png"]
+    rng = random.Random(seed)
+    payloads = []
+    for record, path in zip(records, paths):
+        payload: Dict[str, Any] = {"template_id": TEMPLATE_ID, "system_data": record.system_data}
+        if rng.random() < text_share:
+            payload["document_text"] = record.text
+        else:
+            payload["document_path"] = str(path)
+        payloads.append(payload)
+    return payloads
+
+
+async def run_step(
+    client: "httpx.AsyncClient",
+    payloads: Sequence[Dict[str, Any]],
+    rate: float,
+    duration: float,
+    seed: int,
+) -> StepResult:
+    """Send requests as a Poisson process at ``rate`` per second for ``duration`` seconds."""
+
+    result = StepResult(offered_rate=rate, duration=duration)
+    rng = random.Random(seed)
+    loop = asyncio.get_running_loop()
+    in_flight = 0
+
+    async def send(payload: Dict[str, Any], scheduled: float) -> None:
+        nonlocal in_flight
+        in_flight += 1
+        result.max_in_flight = max(result.max_in_flight, in_flight)
+        try:
+            response = await client.post("/compare", json=payload)
+        except Exception as exc:
+            kind = type(exc).__name__
+        else:
+            kind = "" if response.status_code == 200 else str(response.status_code)
+        finally:
+            in_flight -= 1
+        if kind:
+            result.errors[kind] = result.errors.get(kind, 0) + 1
+        else:
+            result.latencies.append(loop.time() - scheduled)
+
+    started = loop.time()
+    scheduled = started
+    tasks = []
+    while True:
+        scheduled += rng.expovariate(rate)
+        if scheduled - started > duration:
+            break
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(loop.create_task(send(payloads[result.sent % len(payloads)], scheduled)))
+        result.sent += 1
+    await asyncio.gather(*tasks)
+    result.elapsed = loop.time() - started
+    return result
+
+
+def saturated(summary: Dict[str, Any], slo_ms: Optional[float], max_error_rate: float) -> bool:
+    if summary["throughput"] < 0.9 * summary["sent_rate"]:
+        return True
+    if summary["error_rate"] > max_error_rate:
+        return True
+    return slo_ms is not None and summary["latency_ms"]["p99"] > slo_ms
+
+
+def _standin_options(args: argparse.Namespace) -> Dict[str, Any]:
+    return dict(
+        latency_seconds=args.ocr_latency,
+        cpu_seconds=args.ocr_cpu,
+        jitter=args.jitter,
+        cache=args.cache,
+        process_workers=args.process_workers,
+        thread_workers=args.thread_workers,
+        max_queue_depth=args.queue_depth,
+    )
+
+
+def _start_server(args: argparse.Namespace) -> "subprocess.Popen[bytes]":
+    command = [
+        sys.executable, "-m", "benchmarks.loadtest", "serve", "--port", str(args.port), "--workers", str(args.workers),
+    ]
+    for name, value in _standin_options(args).items():
+        if name == "cache":
+            command += ["--cache"] if value else []
+        elif value is not None:
+            command += [f"--{_FLAGS[name]}", str(value)]
+    return subprocess.Popen(command)
+
+
+# command line flag of each install_standin option
+_FLAGS = {
+    "latency_seconds": "ocr-latency",
+    "cpu_seconds": "ocr-cpu",
+    "jitter": "jitter",
+    "process_workers": "process-workers",
+    "thread_workers": "thread-workers",
+    "max_queue_depth": "queue-depth",
+}
+
+
+async def _wait_ready(client: "httpx.AsyncClient", timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("the load test server did not start")
+        await asyncio.sleep(0.2)
+
+
+async def run_load(args: argparse.Namespace, payloads: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    server = None
+    if args.mode == "subprocess":
+        server = _start_server(args)
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=timeout, limits=limits)
+    else:
+        install_standin(**_standin_options(args))
+        transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+        client = httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout, limits=limits)
+        monitor.start()
+    summaries = []
+    try:
+        async with client:
+            await _wait_ready(client)
+            for step, rate in enumerate(args.rates):
+                if args.mode == "subprocess":
+                    await client.get("/loadtest/lag")  # discard samples taken while idle
+                else:
+                    monitor.drain()
+                result = await run_step(client, payloads, rate, args.duration, args.seed + step)
+                if args.mode == "subprocess":
+                    result.loop_lag = (await client.get("/loadtest/lag")).json()["samples"]
+                else:
+                    result.loop_lag = monitor.drain()
+                summary = result.summary()
+                summary["saturated"] = saturated(summary, args.slo_ms, args.max_error_rate)
+                summaries.append(summary)
+                _print_step(summary)
+                if summary["saturated"] and not args.keep_going:
+                    break
+    finally:
+        monitor.stop()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        else:
+            api.comparison_service.executor.shutdown(wait=False)
+    return summaries
+
+
+def _print_step(summary: Dict[str, Any]) -> None:
+    latency, lag = summary["latency_ms"], summary["loop_lag_ms"]
+    print(
+        f"rate {summary['offered_rate']:>7.1f}/s  done {summary['throughput']:>7.1f}/s"
+        f"  p50 {latency['p50']:>8.1f} ms  p99 {latency['p99']:>8.1f} ms"
+        f"  errors {summary['error_rate']:>6.1%}  lag p99 {lag['p99']:>7.2f} ms"
+        f"  in flight {summary['max_in_flight']:>4}{'  SATURATED' if summary['saturated'] else ''}"
+    )
+
+
+def _add_standin_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--ocr-latency", type=float, default=0.2, help="simulated OCR wait per page, seconds")
+    parser.add_argument("--ocr-cpu", type=float, default=0.0, help="simulated OCR CPU time per page, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="relative spread of the simulated cost")
+    parser.add_argument("--cache", action="store_true", help="keep the parse cache enabled")
+    parser.add_argument("--process-workers", type=int)
+    parser.add_argument("--thread-workers", type=int)
+    parser.add_argument("--queue-depth", type=int)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="drive load and report per-rate results")
+    run.add_argument("--rates", type=float, nargs="+", default=[5, 10, 20, 40, 80], help="offered requests per second")
+    run.add_argument("--duration", type=float, default=20.0, help="seconds per rate")
+    run.add_argument("--mode", choices=["inprocess", "subprocess"], default="inprocess")
+    run.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (subprocess mode)")
+    run.add_argument("--port", type=int, default=8765)
+    run.add_argument("--size", type=int, default=200, help="documents in the generated corpus")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--text-share", type=float, default=0.0, help="share of requests sending document_text")
+    run.add_argument("--timeout", type=float, default=60.0, help="client timeout per request, seconds")
+    run.add_argument("--slo-ms", type=float, help="p99 latency target; slower steps count as saturated")
+    run.add_argument("--max-error-rate", type=float, default=0.01)
+    run.add_argument("--keep-going", action="store_true", help="run every rate even after saturation")
+    run.add_argument("--output", type=Path, help="write the per-rate results as JSON here")
+    _add_standin_arguments(run)
+
+    serve = commands.add_parser("serve", help="serve the API with the stand-in OCR backend")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--workers", type=int, default=1)
+    _add_standin_arguments(serve)
+    args = parser.parse_args()
+
+    if httpx is None and args.command == "run":
+        parser.error("httpx is required for the load generator")
+    if args.command == "serve":
+        import uvicorn  # type: ignore
+
+        # the app is imported by uvicorn, which installs the stand-in from the environment
+        os.environ[ENVIRONMENT_VARIABLE] = json.dumps(_standin_options(args))
+        uvicorn.run("benchmarks.loadtest:app", host=args.host, port=args.port, workers=args.workers, log_level="warning")
+        return
+
+    with tempfile.TemporaryDirectory(prefix="datacomparison-load-") as directory:
+        payloads = build_requests(args.size, args.seed, Path(directory), args.text_share)
+        summaries = asyncio.run(run_load(args, payloads))
+    saturation = next((summary["offered_rate"] for summary in summaries if summary["saturated"]), None)
+    if saturation is None:
+        print("no saturation up to the highest offered rate")
+    else:
+        print(f"saturated at {saturation:g} requests/s")
+    if args.output:
+        report = {"options": {key: str(value) for key, value in vars(args).items()}, "steps": summaries, "saturated_at": saturation}
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
+elif os.environ.get(ENVIRONMENT_VARIABLE):
+    # imported by uvicorn or by spawned worker processes
+    install_standin(**json.loads(os.environ[ENVIRONMENT_VARIABLE]))
@@ -0,0 +1,64 @@
+"""Time and memory of each image preprocessing step, and OCR time with and without it.
+
+Run with ``python -m benchmarks.preprocessing scan1.jpg scan2.tif ...``;
+requires Pillow, and pytesseract for the OCR timings.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Optional
+
+from datacomparison.services import preprocessing as preprocessing_module
+from datacomparison.services.document_parser import ImageParser, pytesseract
+from datacomparison.services.preprocessing import Image, ImagePreprocessing, image_bytes
+
+DEFAULT_CONFIG = {"target_dpi": 300, "color": "grayscale", "deskew": True, "crop_margins": True}
+
+
+def _ocr_seconds(parser: ImageParser, path: Path, preprocessing: Optional[ImagePreprocessing]) -> float:
+    started = time.perf_counter()
+    parser.parse(path, preprocessing)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("images", nargs="+", type=Path)
+    parser.add_argument("--config", type=json.loads, default=DEFAULT_CONFIG, help="preprocessing settings as JSON")
+    parser.add_argument("--skip-ocr", action="store_true")
+    args = parser.parse_args()
+
+    if Image is None:
+        parser.error("Pillow is required")
+    preprocessing = ImagePreprocessing.from_config(args.config)
+    if preprocessing is None:
+        parser.error("--config enables no preprocessing step")
+    image_parser = ImageParser()
+    stats = preprocessing_module.stats
+    stats.reset()
+    for path in args.images:
+        with Image.open(path) as image:
+            size, mode, original = image.size, image.mode, image_bytes(image)
+            processed = preprocessing.apply(image)
+            print(f"{path.name}: {size} {mode} {original / 2**20:.1f} MiB -> "
+                  f"{processed.size} {processed.mode} {image_bytes(processed) / 2**20:.1f} MiB")
+
+    print(f"{'step':<14}{'runs':>6}{'total ms':>11}{'MiB before':>12}{'MiB after':>11}")
+    for name, totals in stats.snapshot().items():
+        print(
+            f"{name:<14}{totals.count:>6}{totals.seconds * 1e3:>11.1f}"
+            f"{totals.bytes_before / 2**20:>12.1f}{totals.bytes_after / 2**20:>11.1f}"
+        )
+
+    if args.skip_ocr or pytesseract is None:
+        return
+    raw = sum(_ocr_seconds(image_parser, path, None) for path in args.images)
+    prepared = sum(_ocr_seconds(image_parser, path, preprocessing) for path in args.images)
+    print(f"OCR total: {raw:.2f} s raw, {prepared:.2f} s preprocessed (x{raw / prepared:.1f})")
+
+
+if __name__ == "__main__":
+    main()
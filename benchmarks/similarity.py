@@ -0,0 +1,73 @@
+"""Compare the similarity metrics with the original ``SequenceMatcher`` ratio.
+
+Run with ``python -m benchmarks.similarity``.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import timeit
+from difflib import SequenceMatcher
+from typing import List, Tuple
+
+from datacomparison.services.similarity import METRICS, score_pairs
+
+ALPHABET = "北京市朝阳区建国路号楼单元室上海浦东新区世纪大道有限公司科技发展股份集团"
+
+
+def _mutate(rng: random.Random, text: str, edits: int) -> str:
+    chars = list(text)
+    for _ in range(edits):
+        position = rng.randrange(len(chars))
+        operation = rng.random()
+        if operation < 0.4:
+            chars[position] = rng.choice(ALPHABET)
+        elif operation < 0.7:
+            chars.insert(position, rng.choice(ALPHABET))
+        elif len(chars) > 1:
+            del chars[position]
+    return "".join(chars)
+
+
+def _pairs(rng: random.Random, count: int, length: int, related: bool) -> List[Tuple[str, str]]:
+    pairs = []
+    for _ in range(count):
+        expected = "".join(rng.choice(ALPHABET) for _ in range(length))
+        if related:
+            actual = _mutate(rng, expected, max(1, length // 8))
+        else:
+            actual = "".join(rng.choice(ALPHABET) for _ in range(length))
+        pairs.append((expected, actual))
+    return pairs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pairs", type=int, default=2000)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[4, 20, 80, 300])
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--number", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for length in args.lengths:
+        for related in (True, False):
+            pairs = _pairs(rng, args.pairs, length, related)
+            kind = "near matches" if related else "unrelated"
+            print(f"length {length}, {kind} ({args.pairs} pairs, threshold {args.threshold})")
+            _report(pairs, args.threshold, args.number)
+
+
+def _report(pairs: List[Tuple[str, str]], threshold: float, number: int) -> None:
+    baseline = timeit.timeit(lambda: [SequenceMatcher(None, a, b).ratio() for a, b in pairs], number=number) / number
+    print(f"  {'SequenceMatcher':<22}{baseline * 1e3:9.2f} ms")
+    for name, metric in METRICS.items():
+        if name == "sequence_matcher":
+            continue
+        elapsed = timeit.timeit(lambda: [metric(a, b, threshold) for a, b in pairs], number=number) / number
+        print(f"  {name:<22}{elapsed * 1e3:9.2f} ms  x{baseline / elapsed:5.1f}")
+    batch = timeit.timeit(lambda: score_pairs(pairs, "levenshtein", threshold), number=number) / number
+    print(f"  {'score_pairs':<22}{batch * 1e3:9.2f} ms  x{baseline / batch:5.1f}")
+
+if __name__ == "__main__":
+    main()
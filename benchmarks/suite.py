@@ -0,0 +1,280 @@
+"""Reproducible benchmark suite for the parse -> extract -> normalize -> compare pipeline.
+
+Run with ``python -m benchmarks.suite --output results.json``. No network or
+GPU is needed. A seeded synthetic corpus (see :mod:`benchmarks.corpus`) is
+generated in a temporary directory, and throughput and p50/p99 latency are
+measured for:
+
+* ``pipeline.<format>.<stage>`` - each stage of ``DocumentComparisonService.compare``
+  as reported in ``ComparisonReport.timings``, per document format
+  (``inline`` is ``document_text``);
+* ``store.inline.<compare|recompare>`` - inline comparisons with
+  ``settings.cache.store_extractions`` on, and recomparisons served from the
+  stored extractions; against ``pipeline.inline.total`` this is the cost of storing;
+* ``extract.regex.<field>`` - ``RegexExtractor`` for each template field;
+* ``compare.<strategy>`` - every comparator in the comparator registry;
+* ``normalize.<name>`` - every configured normalizer.
+
+Formats whose parser dependencies (pdfplumber, pytesseract) are missing are
+recorded as skipped. Results are JSON with sorted keys, one metric per
+line block, so two runs diff cleanly; ``--baseline old.json`` prints the
+p50 change of every metric and exits with status 1 when any regresses by
+more than ``--tolerance``.
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import math
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from benchmarks.corpus import FORMATS, LetterRecord, generate_records, write_corpus
+from datacomparison.config import settings
+from datacomparison.services import comparison, extraction
+from datacomparison.services.cache import ParseCache
+from datacomparison.services.candidates import NgramIndex
+from datacomparison.services.extraction_store import ExtractionStore
+from datacomparison.services.service import DocumentComparisonService
+from datacomparison.templates import TemplateRegistry
+
+TEMPLATE_ID = "promise_letter"
+# pipeline formats besides the corpus file formats
+INLINE = "inline"
+# field whose values feed each comparison strategy; others use the names
+_STRATEGY_FIELDS = {"exact": "id_number", "numeric": "amount", "date": "signing_date"}
+_NORMALIZER_FIELDS = {"date": "signing_date", "numeric": "amount"}
+
+
+def summarize(samples_ns: Sequence[int]) -> Dict[str, float]:
+    """Count, throughput and latency percentiles (nearest rank) of per-call timings."""
+
+    ordered = sorted(samples_ns)
+    count = len(ordered)
+    total = sum(ordered)
+
+    def percentile(share: float) -> float:
+        return ordered[max(0, math.ceil(share * count) - 1)] / 1e3
+
+    return {
+        "count": count,
+        "ops_per_sec": round(count / (total / 1e9), 1) if total else 0.0,
+        "mean_us": round(total / count / 1e3, 2),
+        "p50_us": round(percentile(0.50), 2),
+        "p99_us": round(percentile(0.99), 2),
+    }
+
+
+def _time_calls(calls: Sequence[Callable[[], Any]], repeat: int) -> List[int]:
+    samples = []
+    clock = time.perf_counter_ns
+    for _ in range(repeat):
+        for call in calls:
+            started = clock()
+            call()
+            samples.append(clock() - started)
+    return samples
+
+
+def bench_pipeline(
+    service: DocumentComparisonService,
+    records: Sequence[LetterRecord],
+    paths: Dict[str, List[Path]],
+    repeat: int,
+) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    sources: List[Tuple[str, List[Dict[str, Any]]]] = [(INLINE, [{"document_text": record.text} for record in records])]
+    sources += [(name, [{"document_path": path} for path in files]) for name, files in paths.items()]
+    for name, documents in sources:
+        try:
+            service.compare(TEMPLATE_ID, records[0].system_data, **documents[0])
+        except RuntimeError as exc:  # a parser dependency is not installed
+            results[f"pipeline.{name}"] = {"skipped": str(exc)}
+            continue
+        stages: Dict[str, List[int]] = {}
+        for _ in range(repeat):
+            for record, document in zip(records, documents):
+                report = service.compare(TEMPLATE_ID, record.system_data, **document)
+                for stage, seconds in report.timings.items():
+                    stages.setdefault(stage, []).append(int(seconds * 1e9))
+        for stage, samples in stages.items():
+            results[f"pipeline.{name}.{stage}"] = summarize(samples)
+    return results
+
+
+def bench_extraction_store(records: Sequence[LetterRecord], repeat: int) -> Dict[str, Dict[str, Any]]:
+    service = DocumentComparisonService(extraction_store=ExtractionStore(ParseCache()))
+    compared: List[int] = []
+    recompared: List[int] = []
+    for _ in range(repeat):
+        for record in records:
+            report = service.compare(TEMPLATE_ID, record.system_data, document_text=record.text)
+            compared.append(int(report.timings["total"] * 1e9))
+            report = service.recompare(TEMPLATE_ID, record.system_data, document_digest=report.document_digest)
+            recompared.append(int(report.timings["total"] * 1e9))
+    return {"store.inline.compare": summarize(compared), "store.inline.recompare": summarize(recompared)}
+
+
+def bench_extractors(records: Sequence[LetterRecord], repeat: int) -> Dict[str, Dict[str, Any]]:
+    template = TemplateRegistry().load(TEMPLATE_ID)
+    extractor = extraction.registry.get("regex")
+    results = {}
+    for field_template in template.fields.values():
+        if field_template.extractor.get("strategy", "regex") != "regex":
+            continue
+        compiled = extractor.compile(field_template.extractor, field_template.name)  # type: ignore[attr-defined]
+        calls = [lambda text=record.text: compiled(text) for record in records]
+        results[f"extract.regex.{field_template.name}"] = summarize(_time_calls(calls, repeat))
+    return results
+
+
+def _comparison_inputs(strategy: str, records: Sequence[LetterRecord]) -> Tuple[Dict[str, Any], List[Tuple[str, str]]]:
+    field_name = _STRATEGY_FIELDS.get(strategy, "customer_name")
+    pairs = []
+    for index, record in enumerate(records):
+        expected = record.system_data[field_name]
+        # every other pair differs in one character so both outcomes are exercised
+        actual = expected if index % 2 else expected[:-1] + ("0" if expected[-1] != "0" else "1")
+        pairs.append((expected, actual))
+    config: Dict[str, Any] = {"strategy": strategy}
+    if strategy == "candidate_search":
+        index = NgramIndex.build((record.document_id, record.name) for record in records)
+        comparison.registry.get(strategy).register_index("benchmark", index)  # type: ignore[attr-defined]
+        config.update(index="benchmark", top_k=5, threshold=0.5)
+    return config, pairs
+
+
+def bench_comparators(records: Sequence[LetterRecord], repeat: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for strategy in comparison.registry.strategies():
+        comparator = comparison.registry.get(strategy)
+        config, pairs = _comparison_inputs(strategy, records)
+        prepared = comparison.prepare_config(comparator, config)
+        calls = [
+            lambda expected=expected, actual=actual: comparator.compare(strategy, expected, actual, prepared)
+            for expected, actual in pairs
+        ]
+        results[f"compare.{strategy}"] = summarize(_time_calls(calls, repeat))
+    return results
+
+
+def bench_normalizers(records: Sequence[LetterRecord], repeat: int) -> Dict[str, Dict[str, Any]]:
+    template = TemplateRegistry().load(TEMPLATE_ID)
+    results = {}
+    for name, target in sorted(settings.extraction.normalizers.items()):
+        module_name, function_name = target.rsplit(".", 1)
+        normalizer = getattr(importlib.import_module(module_name), function_name)
+        field_plan = next(plan for plan in template.plan.fields if plan.name == _NORMALIZER_FIELDS.get(name, "customer_name"))
+        # raw values as printed on the letters, not the canonical system values
+        values = [field_plan.extract(record.text).value for record in records]
+        calls = [lambda value=value: normalizer(value) for value in values]
+        results[f"normalize.{name}"] = summarize(_time_calls(calls, repeat))
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def run_suite(
+    size: int = 200,
+    seed: int = 0,
+    repeat: int = 3,
+    formats: Sequence[str] = ("txt", "pdf", "png"),
+    font_path: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """Run every benchmark; returns ``{"meta": ..., "results": {metric: summary}}``."""
+
+    records = generate_records(size, seed)
+    previous_cache = settings.cache.enabled
+    # measure parsing itself, not parse cache hits
+    settings.cache.enabled = False
+    try:
+        with tempfile.TemporaryDirectory(prefix="datacomparison-bench-") as directory:
+            paths = write_corpus(Path(directory), records, formats, font_path)
+            service = DocumentComparisonService()
+            results = bench_pipeline(service, records, paths, repeat)
+            results.update(bench_extraction_store(records, repeat))
+    finally:
+        settings.cache.enabled = previous_cache
+    results.update(bench_extractors(records, repeat))
+    results.update(bench_comparators(records, repeat))
+    results.update(bench_normalizers(records, repeat))
+    meta = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "size": size,
+        "seed": seed,
+        "repeat": repeat,
+        "formats": list(formats),
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print the p50 change of each metric; returns the metrics slower than ``1 + tolerance``."""
+
+    regressions = []
+    old, new = baseline["results"], current["results"]
+    for metric in sorted(set(old) | set(new)):
+        before, after = old.get(metric, {}), new.get(metric, {})
+        if "p50_us" not in before or "p50_us" not in after:
+            print(f"{metric:<40} {'-' if 'p50_us' not in before else before['p50_us']:>10} -> "
+                  f"{'-' if 'p50_us' not in after else after['p50_us']}")
+            continue
+        ratio = after["p50_us"] / before["p50_us"] if before["p50_us"] else 1.0
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(metric)
+            flag = "  REGRESSION"
+        print(f"{metric:<40} {before['p50_us']:>10.2f} -> {after['p50_us']:>10.2f} us  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200, help="documents in the synthetic corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the corpus per benchmark")
+    parser.add_argument("--formats", nargs="*", choices=FORMATS, default=["txt", "pdf", "png"])
+    parser.add_argument("--font", type=Path, help="CJK TrueType font for rendered pages")
+    parser.add_argument("--output", type=Path, help="write results as JSON here")
+    parser.add_argument("--baseline", type=Path, help="results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown against the baseline")
+    args = parser.parse_args()
+
+    current = run_suite(args.size, args.seed, args.repeat, args.formats, args.font)
+    if args.output:
+        args.output.write_text(json.dumps(current, indent=2, sort_keys=True, ensure_ascii=False) + "\n", encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare_results(baseline, current, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        return
+    for metric, summary in sorted(current["results"].items()):
+        if "skipped" in summary:
+            print(f"{metric:<40} skipped: {summary['skipped']}")
+            continue
+        print(
+            f"{metric:<40} {summary['ops_per_sec']:>12.1f} ops/s  p50 {summary['p50_us']:>10.2f} us"
+            f"  p99 {summary['p99_us']:>10.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,37 @@
 """FastAPI application exposing comparison endpoints."""
 from __future__ import annotations
 
+import asyncio
+import json
+from dataclasses import asdict
 from pathlib import Path
-from typing import Dict, Optional
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence, TypeVar, cast
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field, root_validator
 
-from datacomparison.services.service import DocumentComparisonService, service
-from datacomparison.templates import registry as template_registry
+from datacomparison.config import settings
+from datacomparison.services import jobs, metrics, uploads
+from datacomparison.services.executor import ExecutorBusyError, TaskTimeoutError
+from datacomparison.services.service import (
+    BatchItem,
+    BatchItemResult,
+    ComparisonReport,
+    DocumentComparisonService,
+    service,
+)
+from datacomparison.templates import TemplateWatcher, registry as template_registry
 
+T = TypeVar("T")
 
 class ComparisonRequest(BaseModel):
     template_id: Optional[str] = Field(None, description="Template identifier")
     system_data: Dict[str, str] = Field(..., description="Canonical business data from core system")
     document_path: Optional[str] = Field(None, description="Path to document to parse")
     document_text: Optional[str] = Field(None, description="Raw text content of document")
+    include_timings: bool = Field(False, description="Return per-stage timings for profiling")
+    fail_fast: Optional[bool] = Field(None, description="Skip remaining fields once a required field fails")
 
     @root_validator
     def validate_source(cls, values):
@@ -24,17 +40,141 @@ class ComparisonRequest(BaseModel):
         return values
 
 
+class RecompareRequest(BaseModel):
+    template_id: Optional[str] = Field(None, description="Template identifier; the one used last when omitted")
+    system_data: Dict[str, str] = Field(..., description="Corrected business data from core system")
+    document_digest: Optional[str] = Field(None, description="document_digest of an earlier comparison")
+    document_path: Optional[str] = Field(None, description="Path to document to parse")
+    document_text: Optional[str] = Field(None, description="Raw text content of document")
+    include_timings: bool = Field(False, description="Return per-stage timings for profiling")
+
+    @root_validator
+    def validate_source(cls, values):
+        if not any(values.get(name) for name in ("document_digest", "document_path", "document_text")):
+            raise ValueError("document_digest、document_path 或 document_text 至少提供一个")
+        return values
+
+
 class ComparisonResponse(BaseModel):
     status: str
     template_id: str
     description: str
     fields: Dict[str, Dict[str, object]]
+    template_score: Optional[float] = Field(None, description="Keyword score when the template was detected")
+    template_version: str = Field("", description="Version of the template definition used")
+    timings: Optional[Dict[str, float]] = Field(None, description="Seconds per stage, when requested")
+    document_digest: Optional[str] = Field(None, description="SHA-256 of the document, accepted by /compare/recompare")
+
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    attempts: int
+    max_attempts: int
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+
+class BatchComparisonRequest(BaseModel):
+    items: List[ComparisonRequest] = Field(..., min_items=1, max_items=1000, description="Documents to compare")
+
+
+class StreamingBatchRequest(BaseModel):
+    items: List[ComparisonRequest] = Field(..., min_items=1, max_items=100_000, description="Documents to compare")
+
+
+class BatchItemResponse(BaseModel):
+    index: int
+    result: Optional[ComparisonResponse] = None
+    error: Optional[str] = None
+
+
+class BatchComparisonResponse(BaseModel):
+    results: List[BatchItemResponse]
+
+
+def _to_response(report: ComparisonReport, include_timings: bool = False) -> ComparisonResponse:
+    fields = {
+        field.field_name: {
+            "extracted_value": field.extracted_value,
+            "normalized_value": field.normalized_value,
+            "expected_value": field.expected_value,
+            "passed": field.passed,
+            "score": field.score,
+            "message": field.message,
+            "confidence": field.confidence,
+            "evaluated": field.evaluated,
+            "candidates": [asdict(candidate) for candidate in field.candidates],
+        }
+        for field in report.fields
+    }
+    return ComparisonResponse(
+        status=report.status,
+        template_id=report.template_id,
+        description=report.description,
+        fields=fields,
+        template_score=report.template_score,
+        template_version=report.template_version,
+        timings=report.timings if include_timings else None,
+        document_digest=report.document_digest,
+    )
+
+
+def _to_batch_item_response(result: BatchItemResult) -> BatchItemResponse:
+    return BatchItemResponse(
+        index=result.index,
+        result=_to_response(result.report) if result.report is not None else None,
+        error=result.error,
+    )
+
+
+def _to_batch_item(request: ComparisonRequest) -> BatchItem:
+    return BatchItem(
+        system_data=request.system_data,
+        template_id=request.template_id,
+        document_path=Path(request.document_path) if request.document_path else None,
+        document_text=request.document_text,
+        fail_fast=request.fail_fast,
+    )
 
 
 app = FastAPI(title="Data Comparison Service", version="0.1.0")
 comparison_service: DocumentComparisonService = service
 
 
+job_store: jobs.JobStore = jobs.store
+job_worker: Optional[jobs.JobWorker] = None
+template_watcher: Optional[TemplateWatcher] = None
+
+
+@app.on_event("startup")
+def start_job_worker() -> None:
+    global job_worker, template_watcher
+    if settings.warm_up.enabled:
+        comparison_service.warm_up(settings.warm_up)
+    if settings.jobs.enabled:
+        job_worker = jobs.JobWorker.from_config(settings.jobs, job_store, comparison_service)
+        job_worker.start()
+    if settings.templates.reload_interval_seconds:
+        template_watcher = TemplateWatcher(comparison_service.template_registry, settings.templates.reload_interval_seconds)
+        template_watcher.start()
+
+
+@app.on_event("shutdown")
+def shutdown_executor() -> None:
+    if template_watcher is not None:
+        template_watcher.stop(timeout=5)
+    if job_worker is not None:
+        job_worker.stop(timeout=5)
+    comparison_service.executor.shutdown(wait=False)
+
+
 @app.get("/templates/{template_id}")
 async def get_template(template_id: str):
     try:
@@ -54,6 +194,8 @@ async def get_template(template_id: str):
             }
             for field in template.fields.values()
         ],
+        "keywords": template.keywords,
+        "version": template.version,
     }
 
 
@@ -61,36 +203,218 @@ async def get_template(template_id: str):
 async def compare(request: ComparisonRequest):
     document_path = Path(request.document_path) if request.document_path else None
     try:
-        report = comparison_service.compare(
+        report = await comparison_service.compare_async(
             template_id=request.template_id,
             system_data=request.system_data,
             document_path=document_path,
             document_text=request.document_text,
+            fail_fast=request.fail_fast,
         )
+    except ExecutorBusyError as exc:  # pragma: no cover - API level error translation
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+    except TaskTimeoutError as exc:  # pragma: no cover - API level error translation
+        raise HTTPException(status_code=504, detail=str(exc)) from exc
     except Exception as exc:  # pragma: no cover - API level error translation
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    fields = {
-        field.field_name: {
-            "extracted_value": field.extracted_value,
-            "normalized_value": field.normalized_value,
-            "expected_value": field.expected_value,
-            "passed": field.passed,
-            "score": field.score,
-            "message": field.message,
-            "confidence": field.confidence,
-        }
-        for field in report.fields
-    }
+    return _to_response(report, request.include_timings)
 
-    return ComparisonResponse(
-        status=report.status,
-        template_id=report.template_id,
-        description=report.description,
-        fields=fields,
+
+def _upload_system_data(form: uploads.UploadForm) -> Dict[str, str]:
+    if form.upload is None:
+        raise ValueError("缺少上传文件")
+    try:
+        system_data = json.loads(form.fields.get("system_data", ""))
+    except json.JSONDecodeError as exc:
+        raise ValueError("system_data 须为 JSON 对象") from exc
+    if not isinstance(system_data, dict) or not all(isinstance(value, str) for value in system_data.values()):
+        raise ValueError("system_data 须为字符串值的 JSON 对象")
+    return system_data
+
+
+def _form_flag(value: Optional[str]) -> Optional[bool]:
+    if not value:
+        return None
+    return value.lower() in {"1", "true"}
+
+
+@app.post("/compare/upload", response_model=ComparisonResponse)
+async def compare_upload(request: Request):
+    """Compare an uploaded document.
+
+    Multipart form with one file part plus ``system_data`` (a JSON object)
+    and optional ``template_id``, ``include_timings`` and ``fail_fast`` fields. The body is
+    streamed, so memory per request stays bounded by
+    ``settings.uploads.spool_bytes``.
+    """
+
+    limits = settings.uploads
+    try:
+        content_length = int(request.headers.get("content-length") or 0)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Content-Length 请求头无效") from exc
+    # the form fields and multipart framing come on top of the file itself
+    if content_length > limits.max_bytes + 4 * limits.max_field_bytes:
+        raise HTTPException(status_code=413, detail=f"上传文件超过 {limits.max_bytes} 字节上限")
+    try:
+        form = await uploads.read_multipart(request.stream(), request.headers.get("content-type", ""), limits)
+    except uploads.UploadTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    try:
+        system_data = _upload_system_data(form)
+        upload = cast(uploads.SpooledUpload, form.upload)
+        report = await comparison_service.compare_async(
+            template_id=form.fields.get("template_id") or None,
+            system_data=system_data,
+            document_path=upload.materialize(),
+            document_digest=upload.digest,
+            fail_fast=_form_flag(form.fields.get("fail_fast")),
+        )
+    except ExecutorBusyError as exc:  # pragma: no cover - API level error translation
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+    except TaskTimeoutError as exc:  # pragma: no cover - API level error translation
+        raise HTTPException(status_code=504, detail=str(exc)) from exc
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    finally:
+        form.close()
+
+    return _to_response(report, bool(_form_flag(form.fields.get("include_timings"))))
+
+
+@app.post("/compare/recompare", response_model=ComparisonResponse)
+async def recompare(request: RecompareRequest):
+    """Compare a document compared before against corrected system data, reusing its extractions."""
+
+    try:
+        report = await comparison_service.recompare_async(
+            template_id=request.template_id,
+            system_data=request.system_data,
+            document_path=Path(request.document_path) if request.document_path else None,
+            document_text=request.document_text,
+            document_digest=request.document_digest,
+        )
+    except LookupError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except ExecutorBusyError as exc:  # pragma: no cover - API level error translation
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+    except TaskTimeoutError as exc:  # pragma: no cover - API level error translation
+        raise HTTPException(status_code=504, detail=str(exc)) from exc
+    except Exception as exc:  # pragma: no cover - API level error translation
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    return _to_response(report, request.include_timings)
+
+
+@app.post("/compare/batch", response_model=BatchComparisonResponse)
+async def compare_batch(request: BatchComparisonRequest):
+    items = [_to_batch_item(item) for item in request.items]
+    try:
+        # the batch bounds its own fan-out; per-document timeouts apply inside
+        results = await comparison_service.executor.run_driver(comparison_service.compare_batch, items, timeout=None)
+    except ExecutorBusyError as exc:  # pragma: no cover - API level error translation
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+
+    return BatchComparisonResponse(results=[_to_batch_item_response(result) for result in results])
+
+
+@app.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_job(request: ComparisonRequest):
+    if not settings.jobs.enabled:
+        raise HTTPException(status_code=503, detail="异步任务未启用（settings.jobs.enabled）")
+    try:
+        job_id = await comparison_service.executor.run_io(
+            job_store.submit, request.dict(), settings.jobs.max_attempts, timeout=None
+        )
+    except ExecutorBusyError as exc:  # pragma: no cover - API level error translation
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+    return JobSubmitResponse(job_id=job_id, status=jobs.QUEUED)
+
+
+async def _job_store_call(func: Callable[..., T], *args: object) -> T:
+    """Run a job store query on the thread pool; SQLite reads must not block the event loop."""
+
+    try:
+        return await comparison_service.executor.run_io(func, *args, timeout=None)
+    except ExecutorBusyError as exc:  # pragma: no cover - API level error translation
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+
+
+async def _load_job(job_id: str) -> jobs.Job:
+    job = await _job_store_call(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务 {job_id} 不存在")
+    return job
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    job = await _load_job(job_id)
+    return JobStatusResponse(
+        job_id=job.job_id,
+        status=job.status,
+        attempts=job.attempts,
+        max_attempts=job.max_attempts,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
     )
 
 
+@app.get("/jobs/{job_id}/result", response_model=ComparisonResponse)
+async def get_job_result(job_id: str):
+    job = await _load_job(job_id)
+    if job.status == jobs.FAILED:
+        raise HTTPException(status_code=422, detail=job.error)
+    result = await _job_store_call(job_store.result, job_id) if job.status == jobs.SUCCEEDED else None
+    if result is None:
+        raise HTTPException(status_code=409, detail=f"任务 {job_id} 尚未完成（{job.status}）")
+    return _to_response(jobs.report_from_dict(result), bool(job.payload.get("include_timings")))
+
+
+async def _ndjson_results(items: Sequence[BatchItem]) -> AsyncIterator[bytes]:
+    """Pull one finished result at a time, so a slow client throttles the workers."""
+
+    executor = comparison_service.executor
+    iterator = comparison_service.iter_compare_batch(items, ordered=False)
+    future = None
+    try:
+        while True:
+            try:
+                future = executor.submit_driver(next, iterator, None)
+            except ExecutorBusyError:
+                await asyncio.sleep(0.05)
+                continue
+            result = await asyncio.wrap_future(future)
+            if result is None:
+                break
+            yield (_to_batch_item_response(result).json(ensure_ascii=False) + "\n").encode("utf-8")
+    finally:
+        # closing the generator cancels queued parses; wait until it is idle
+        if future is None:
+            iterator.close()
+        else:
+            future.add_done_callback(lambda _future: iterator.close())
+
+
+@app.post("/compare/batch/stream")
+async def compare_batch_stream(request: StreamingBatchRequest):
+    """Stream one NDJSON line per item, in completion order, tagged with its index."""
+
+    items = [_to_batch_item(item) for item in request.items]
+    return StreamingResponse(_ndjson_results(items), media_type="application/x-ndjson")
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Latency histograms and counters in the Prometheus text format."""
+
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
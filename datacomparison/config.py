@@ -1,9 +1,10 @@
 """Application configuration for the data comparison service."""
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict, List, Optional, Tuple
 
 
 @dataclass
@@ -12,6 +13,16 @@ class TemplateConfig:
 
     directory: Path = Path(__file__).resolve().parent / "templates"
     default_template: str = "promise_letter"
+    # pick the template from the document's keywords when no template_id is given
+    auto_detect: bool = True
+    # share of a template's keyword weight that must be found; otherwise the default is used
+    detection_min_score: float = 0.5
+    # paged documents (PDF) are detected from their first pages, then read on with the chosen template
+    detection_pages: int = 1
+    # seconds between checks for changed template files; 0 disables hot reloading
+    reload_interval_seconds: float = 2.0
+    # a template id that is not found rescans the directory at most this often
+    missing_rescan_seconds: float = 2.0
 
 
 @dataclass
@@ -20,18 +31,142 @@ class ExtractionConfig:
 
     confidence_threshold: float = 0.6
     fuzzy_match_threshold: float = 0.85
+    # default metric of the "fuzzy" comparison; see datacomparison.services.similarity.METRICS
+    fuzzy_metric: str = "levenshtein"
+    # "per_field" searches each pattern separately; "single_pass" scans the text once per template
+    mode: str = "per_field"
+    # stop evaluating fields once a required field fails; overridable per template and request
+    fail_fast: bool = False
     normalizers: Dict[str, str] = field(default_factory=lambda: {
         "date": "datacomparison.utils.normalizers.normalize_date",
         "numeric": "datacomparison.utils.normalizers.normalize_numeric",
     })
 
 
+@dataclass
+class ParsingConfig:
+    """Settings for page-by-page parsing of multi-page documents."""
+
+    stream_pages: bool = True
+    # pages parsed ahead in parallel when worker processes are enabled
+    page_window: int = 4
+    # stop parsing once every required field has a match
+    early_termination: bool = True
+    # parallel tesseract calls when a template OCRs only field regions
+    region_ocr_threads: int = 4
+    # PDF pages with fewer non-blank characters in their text layer are OCR'd
+    pdf_min_text_chars: int = 20
+    pdf_ocr_resolution: int = 300
+    # image preprocessing before OCR, overridable per template; empty disables it
+    # e.g. {"target_dpi": 300, "color": "grayscale", "deskew": True, "crop_margins": True}
+    preprocessing: Dict[str, Any] = field(default_factory=dict)
+    # extra parsers by suffix as "module:attribute" (a parser class or factory), created on first use
+    # e.g. {".odt": "myplugins.odt:OdtParser"}
+    plugins: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class CacheConfig:
+    """Settings for the parsed-document cache."""
+
+    enabled: bool = True
+    memory_max_bytes: int = 64 * 1024 * 1024
+    ttl_seconds: Optional[float] = 24 * 3600.0
+    # optional SQLite file used as a second, persistent tier
+    disk_path: Optional[Path] = None
+    disk_max_bytes: int = 1024 * 1024 * 1024
+    # also keep each document's field extractions for DocumentComparisonService.recompare,
+    # in a cache of their own (same TTL) so they neither evict parse results nor count in their stats;
+    # off by default as hashing and storing them costs every comparison
+    store_extractions: bool = False
+    extractions_memory_max_bytes: int = 16 * 1024 * 1024
+    extractions_disk_path: Optional[Path] = None
+
+
+@dataclass
+class ExecutorConfig:
+    """Settings for the worker pools used by asynchronous comparisons."""
+
+    # run OCR/PDF parsing in worker processes; False runs it on process_workers threads
+    # kept apart from the thread pool
+    use_processes: bool = True
+    process_workers: int = field(default_factory=lambda: os.cpu_count() or 1)
+    # threads for light work; the pool has one more per process worker for the comparisons waiting on them
+    thread_workers: int = 4
+    # threads driving /compare/batch and streamed batches, each held for a whole batch
+    driver_workers: int = 4
+    # tasks admitted (queued or running) before new submissions are rejected
+    max_queue_depth: int = 64
+    task_timeout_seconds: Optional[float] = 120.0
+    # replace a worker process after this many tasks; None keeps workers forever
+    max_tasks_per_worker: Optional[int] = 200
+
+
+@dataclass
+class JobConfig:
+    """Settings for the durable asynchronous job queue."""
+
+    # accept /jobs and start job workers together with the API
+    enabled: bool = False
+    database_path: Path = Path("data") / "jobs.sqlite3"
+    concurrency: int = 2
+    max_attempts: int = 3
+    retry_backoff_seconds: float = 2.0
+    retry_backoff_max_seconds: float = 60.0
+    poll_interval_seconds: float = 0.5
+    # a claimed job is handed to another worker if not finished within this time
+    lease_seconds: float = 600.0
+
+
+@dataclass
+class UploadConfig:
+    """Settings for documents uploaded to the API."""
+
+    max_bytes: int = 64 * 1024 * 1024
+    # uploads larger than this are spilled from memory to a temporary file
+    spool_bytes: int = 1024 * 1024
+    max_field_bytes: int = 1024 * 1024
+    # temporary files go to the system temp directory when None
+    directory: Optional[Path] = None
+
+
+@dataclass
+class MetricsConfig:
+    """Settings for latency histograms and counters served on ``/metrics``."""
+
+    enabled: bool = True
+    # upper bounds in seconds of the latency histogram buckets
+    latency_buckets: Tuple[float, ...] = (
+        0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+    )
+
+
+@dataclass
+class WarmUpConfig:
+    """Work done at startup so the first requests do not pay for it."""
+
+    enabled: bool = False
+    # suffixes whose parsers and backends are imported; "*" for every registered parser
+    parsers: List[str] = field(default_factory=lambda: ["*"])
+    # templates compiled ahead; "*" for every template in the directory
+    templates: List[str] = field(default_factory=lambda: ["*"])
+    # fork the worker processes after the imports above so they inherit them
+    start_workers: bool = True
+
+
 @dataclass
 class Settings:
     """Global application settings."""
 
     templates: TemplateConfig = field(default_factory=TemplateConfig)
     extraction: ExtractionConfig = field(default_factory=ExtractionConfig)
+    parsing: ParsingConfig = field(default_factory=ParsingConfig)
+    cache: CacheConfig = field(default_factory=CacheConfig)
+    executor: ExecutorConfig = field(default_factory=ExecutorConfig)
+    jobs: JobConfig = field(default_factory=JobConfig)
+    uploads: UploadConfig = field(default_factory=UploadConfig)
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+    warm_up: WarmUpConfig = field(default_factory=WarmUpConfig)
 
     @property
     def template_directory(self) -> Path:
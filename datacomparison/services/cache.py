@@ -0,0 +1,228 @@
+"""Content-addressed cache for parsed documents.
+
+Entries are keyed by the SHA-256 of the file content plus the parser identity
+and version, so renamed or re-uploaded copies of a file hit the cache while a
+parser upgrade naturally invalidates old entries.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from datacomparison.config import CacheConfig, settings
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: Path) -> str:
+    """Return the hex SHA-256 digest of a file, read in chunks."""
+
+    digest = hashlib.sha256()
+    with path.open("rb") as stream:
+        for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parser_identity(parser: Any) -> str:
+    """Stable identifier for a parser implementation and its version."""
+
+    return f"{type(parser).__module__}.{type(parser).__qualname__}@{getattr(parser, 'version', '0')}"
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    memory_hits: int = 0
+    disk_hits: int = 0
+    stores: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class _DiskTier:
+    """SQLite-backed second tier bounded by total payload size."""
+
+    def __init__(self, path: Path, max_bytes: int) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS parse_cache ("
+            " key TEXT PRIMARY KEY, payload BLOB NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS parse_cache_accessed ON parse_cache (accessed)")
+        self._connection.commit()
+        self._max_bytes = max_bytes
+        # access times of reads, written with the next put instead of one commit per read
+        self._accessed: Dict[str, float] = {}
+
+    def get(self, key: str, ttl_seconds: Optional[float], now: float) -> Tuple[Optional[bytes], float, bool]:
+        """Return ``(payload, created, expired)`` for ``key``."""
+
+        row = self._connection.execute("SELECT payload, created FROM parse_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, 0.0, False
+        payload, created = row
+        if ttl_seconds is not None and now - created > ttl_seconds:
+            self._accessed.pop(key, None)
+            self._connection.execute("DELETE FROM parse_cache WHERE key = ?", (key,))
+            self._connection.commit()
+            return None, created, True
+        self._accessed[key] = now
+        return payload, created, False
+
+    def _flush_accessed(self) -> None:
+        if self._accessed:
+            self._connection.executemany(
+                "UPDATE parse_cache SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def put(self, key: str, payload: bytes, created: float) -> int:
+        """Store ``payload`` and return the number of evicted entries."""
+
+        if len(payload) > self._max_bytes:
+            return 0
+        # eviction below picks the least recently read entries
+        self._flush_accessed()
+        self._connection.execute(
+            "INSERT OR REPLACE INTO parse_cache (key, payload, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, payload, len(payload), created, created),
+        )
+        evicted = 0
+        (total,) = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM parse_cache").fetchone()
+        while total > self._max_bytes:
+            oldest = self._connection.execute(
+                "SELECT key, size FROM parse_cache ORDER BY accessed LIMIT 1"
+            ).fetchone()
+            if oldest is None:
+                break
+            self._connection.execute("DELETE FROM parse_cache WHERE key = ?", (oldest[0],))
+            total -= oldest[1]
+            evicted += 1
+        self._connection.commit()
+        return evicted
+
+    def clear(self) -> None:
+        self._accessed.clear()
+        self._connection.execute("DELETE FROM parse_cache")
+        self._connection.commit()
+
+
+class ParseCache:
+    """Two-tier (memory LRU + optional SQLite) cache of parsed documents."""
+
+    def __init__(
+        self,
+        memory_max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: Optional[float] = None,
+        disk_path: Optional[Path] = None,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+    ) -> None:
+        self._memory: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._memory_max_bytes = memory_max_bytes
+        self._ttl_seconds = ttl_seconds
+        self._disk = _DiskTier(disk_path, disk_max_bytes) if disk_path else None
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+
+    @classmethod
+    def from_config(cls, config: CacheConfig) -> "ParseCache":
+        return cls(
+            memory_max_bytes=config.memory_max_bytes,
+            ttl_seconds=config.ttl_seconds,
+            disk_path=config.disk_path,
+            disk_max_bytes=config.disk_max_bytes,
+        )
+
+    @staticmethod
+    def key_for(digest: str, parser: Any) -> str:
+        return f"{digest}:{parser_identity(parser)}"
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._memory_bytes
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh copy of the cached payload or ``None``."""
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                payload, created = entry
+                if self._expired(created, now):
+                    self._drop(key)
+                    self.stats.expirations += 1
+                else:
+                    self._memory.move_to_end(key)
+                    self.stats.hits += 1
+                    self.stats.memory_hits += 1
+                    return json.loads(payload)
+            if self._disk is not None:
+                payload, created, expired = self._disk.get(key, self._ttl_seconds, now)
+                if expired:
+                    self.stats.expirations += 1
+                if payload is not None:
+                    # keep the original creation time so the TTL still counts from the store
+                    self._store_memory(key, payload, created)
+                    self.stats.hits += 1
+                    self.stats.disk_hits += 1
+                    return json.loads(payload)
+            self.stats.misses += 1
+            return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        now = time.time()
+        with self._lock:
+            self._store_memory(key, payload, now)
+            if self._disk is not None:
+                self.stats.evictions += self._disk.put(key, payload, now)
+            self.stats.stores += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._disk is not None:
+                self._disk.clear()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self._ttl_seconds is not None and now - created > self._ttl_seconds
+
+    def _drop(self, key: str) -> None:
+        payload, _ = self._memory.pop(key)
+        self._memory_bytes -= len(payload)
+
+    def _store_memory(self, key: str, payload: bytes, created: float) -> None:
+        if key in self._memory:
+            self._drop(key)
+        if len(payload) > self._memory_max_bytes:
+            return
+        self._memory[key] = (payload, created)
+        self._memory_bytes += len(payload)
+        while self._memory_bytes > self._memory_max_bytes:
+            oldest = next(iter(self._memory))
+            self._drop(oldest)
+            self.stats.evictions += 1
+
+
+cache = ParseCache.from_config(settings.cache)
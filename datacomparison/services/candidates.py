@@ -0,0 +1,203 @@
+"""Character n-gram inverted index for fuzzy candidate search.
+
+Used when a document's key field is unreadable and the customer has to be
+found by name among millions of master records. Records are stored compactly
+(one joined string plus offset arrays, one ``array('I')`` posting list per
+n-gram) and a query only touches the posting lists of its own n-grams.
+
+Saved indexes are a JSON header followed by the raw strings and arrays, so
+loading one never executes code from the file.
+"""
+from __future__ import annotations
+
+import heapq
+import json
+import struct
+import sys
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from datacomparison.utils.records import read_records
+
+_FORMAT_VERSION = 2
+_MAGIC = b"NGIDX"
+_HEADER_LENGTH = struct.Struct("<I")
+_SEPARATOR = "\x1f"
+
+
+def ngrams(text: str, n: int = 2) -> FrozenSet[str]:
+    """Padded character n-grams, so one- and two-character names still overlap."""
+
+    padded = f"\x02{text.strip()}\x03"
+    if len(padded) <= n:
+        return frozenset((padded,))
+    return frozenset(padded[i : i + n] for i in range(len(padded) - n + 1))
+
+
+@dataclass(frozen=True)
+class Candidate:
+    record_id: str
+    text: str
+    score: float
+
+
+class NgramIndex:
+    """Immutable inverted index from character n-grams to record positions."""
+
+    def __init__(
+        self,
+        ids: str,
+        id_offsets: array,
+        texts: str,
+        text_offsets: array,
+        postings: Dict[str, array],
+        n: int = 2,
+    ) -> None:
+        self._ids = ids
+        self._id_offsets = id_offsets
+        self._texts = texts
+        self._text_offsets = text_offsets
+        self._postings = postings
+        self.n = n
+
+    @classmethod
+    def build(cls, records: Iterable[Tuple[str, str]], n: int = 2) -> "NgramIndex":
+        """Index ``(record_id, text)`` pairs; records with empty text are skipped."""
+
+        ids: List[str] = []
+        texts: List[str] = []
+        id_offsets = array("I", [0])
+        text_offsets = array("I", [0])
+        postings: Dict[str, array] = {}
+        for record_id, text in records:
+            text = (text or "").strip()
+            if not text:
+                continue
+            position = len(texts)
+            for gram in ngrams(text, n):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array("I")
+                posting.append(position)
+            ids.append(record_id)
+            texts.append(text)
+            id_offsets.append(id_offsets[-1] + len(record_id) + 1)
+            text_offsets.append(text_offsets[-1] + len(text) + 1)
+        joined_ids = "".join(f"{value}{_SEPARATOR}" for value in ids)
+        joined_texts = "".join(f"{value}{_SEPARATOR}" for value in texts)
+        return cls(joined_ids, id_offsets, joined_texts, text_offsets, postings, n)
+
+    @classmethod
+    def from_file(cls, source: Path, id_field: str, text_field: str, n: int = 2) -> "NgramIndex":
+        """Build from a CSV or JSONL extract."""
+
+        return cls.build(((row.get(id_field, ""), row.get(text_field, "")) for row in read_records(source)), n)
+
+    @classmethod
+    def load(cls, path: Path) -> "NgramIndex":
+        with path.open("rb") as stream:
+            if stream.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not an n-gram index; rebuild it with NgramIndex.save")
+            (header_length,) = _HEADER_LENGTH.unpack(stream.read(_HEADER_LENGTH.size))
+            header = json.loads(stream.read(header_length).decode("utf-8"))
+            if header.get("version") != _FORMAT_VERSION:
+                raise ValueError(f"Unsupported n-gram index format {header.get('version')} in {path}")
+            if header["itemsize"] != array("I").itemsize:
+                raise ValueError(f"{path} was written on a platform with {header['itemsize']}-byte positions")
+
+            def read_array(count: int) -> array:
+                values = array("I")
+                data = stream.read(count * values.itemsize)
+                if len(data) != count * values.itemsize:
+                    raise ValueError(f"Truncated n-gram index {path}")
+                values.frombytes(data)
+                if header["byteorder"] != sys.byteorder:
+                    values.byteswap()
+                return values
+
+            ids = stream.read(header["ids_bytes"]).decode("utf-8")
+            texts = stream.read(header["texts_bytes"]).decode("utf-8")
+            id_offsets = read_array(header["records"] + 1)
+            text_offsets = read_array(header["records"] + 1)
+            postings = {gram: read_array(count) for gram, count in header["postings"]}
+        return cls(ids, id_offsets, texts, text_offsets, postings, header["n"])
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        ids, texts = self._ids.encode("utf-8"), self._texts.encode("utf-8")
+        grams = sorted(self._postings)
+        header = json.dumps(
+            {
+                "version": _FORMAT_VERSION,
+                "n": self.n,
+                "byteorder": sys.byteorder,
+                "itemsize": self._id_offsets.itemsize,
+                "records": len(self),
+                "ids_bytes": len(ids),
+                "texts_bytes": len(texts),
+                # posting lists follow in this order
+                "postings": [[gram, len(self._postings[gram])] for gram in grams],
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+        with path.open("wb") as stream:
+            stream.write(_MAGIC + _HEADER_LENGTH.pack(len(header)) + header + ids + texts)
+            self._id_offsets.tofile(stream)
+            self._text_offsets.tofile(stream)
+            for gram in grams:
+                self._postings[gram].tofile(stream)
+
+    def __len__(self) -> int:
+        return len(self._text_offsets) - 1
+
+    def record_id(self, position: int) -> str:
+        return self._ids[self._id_offsets[position] : self._id_offsets[position + 1] - 1]
+
+    def text(self, position: int) -> str:
+        return self._texts[self._text_offsets[position] : self._text_offsets[position + 1] - 1]
+
+    def search(
+        self,
+        query: Optional[str],
+        top_k: int = 5,
+        min_score: float = 0.0,
+        max_posting_ratio: float = 0.05,
+        rerank_factor: int = 20,
+    ) -> List[Candidate]:
+        """Return up to ``top_k`` records ranked by Dice similarity of their n-grams.
+
+        Posting lists are merged rarest first; n-grams shared by more than
+        ``max_posting_ratio`` of all records (common surnames) only count
+        when nothing rarer matched. The ``top_k * rerank_factor`` records with
+        the most shared n-grams are then scored exactly.
+        """
+
+        if not query or not query.strip() or not len(self):
+            return []
+        query_grams = ngrams(query, self.n)
+        lists = sorted(
+            (self._postings[gram] for gram in query_grams if gram in self._postings),
+            key=len,
+        )
+        common_limit = max(top_k * rerank_factor, int(len(self) * max_posting_ratio))
+        counts: Counter = Counter()
+        for posting in lists:
+            if counts and len(posting) > common_limit:
+                break
+            counts.update(posting)
+        if not counts:
+            return []
+
+        shortlist = heapq.nlargest(top_k * rerank_factor, counts.items(), key=lambda item: item[1])
+        scored = []
+        for position, _shared in shortlist:
+            text = self.text(position)
+            grams = ngrams(text, self.n)
+            score = 2.0 * len(query_grams & grams) / (len(query_grams) + len(grams))
+            if score >= min_score:
+                scored.append((score, -position, text))
+        best = heapq.nlargest(top_k, scored)
+        return [Candidate(self.record_id(-negated), text, round(score, 4)) for score, negated, text in best]
@@ -0,0 +1,144 @@
+"""Template detection from document text.
+
+Every template may declare anchor ``keywords`` (optionally weighted). All
+keywords of all templates are compiled into one Aho-Corasick automaton, so a
+single pass over the text finds every occurrence whatever the number of
+templates. A template scores the weighted share of its keywords found.
+"""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+KeywordSpec = Union[Sequence[str], Mapping[str, float]]
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton reporting which keywords occur in a text."""
+
+    def __init__(self, keywords: Sequence[str]) -> None:
+        self.keywords = list(keywords)
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = goto[state][char] = len(goto)
+                    goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(index)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                candidate = goto[fallback].get(char, 0)
+                fail[next_state] = candidate if candidate != next_state else 0
+                # a state also reports every keyword that ends at its fail state
+                outputs[next_state] = outputs[next_state] + outputs[fail[next_state]]
+        self._goto = goto
+        self._fail = fail
+        self._outputs = outputs
+        self._alphabet = frozenset(char for keyword in self.keywords for char in keyword)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Yield ``(end_position, keyword_index)`` for every occurrence."""
+
+        goto, fail, outputs, alphabet = self._goto, self._fail, self._outputs, self._alphabet
+        state = 0
+        for position, char in enumerate(text):
+            if char not in alphabet:
+                state = 0
+                continue
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in outputs[state]:
+                yield position + 1, index
+
+    def found(self, text: str) -> List[bool]:
+        """Which keywords occur in ``text``, by keyword index."""
+
+        goto, fail, outputs, alphabet = self._goto, self._fail, self._outputs, self._alphabet
+        seen = [False] * len(self.keywords)
+        state = 0
+        # same walk as iter_matches, inlined: this is the hot path of detection
+        for char in text:
+            if char not in alphabet:
+                state = 0
+                continue
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in outputs[state]:
+                seen[index] = True
+        return seen
+
+
+@dataclass(frozen=True)
+class TemplateMatch:
+    template_id: str
+    score: float
+    keywords: Tuple[str, ...]
+
+
+class TemplateClassifier:
+    """Picks the template whose anchor keywords best cover a document."""
+
+    def __init__(self, templates: Mapping[str, KeywordSpec]) -> None:
+        weights: Dict[str, Dict[str, float]] = {}
+        for template_id, spec in templates.items():
+            items = spec.items() if isinstance(spec, Mapping) else ((keyword, 1.0) for keyword in spec)
+            keyword_weights = {keyword: float(weight) for keyword, weight in items if keyword and float(weight) > 0}
+            if keyword_weights:
+                weights[template_id] = keyword_weights
+        keywords = sorted({keyword for keyword_weights in weights.values() for keyword in keyword_weights})
+        self._automaton = KeywordAutomaton(keywords)
+        # keyword index -> templates using it and with what weight
+        self._postings: List[List[Tuple[str, float]]] = [[] for _ in keywords]
+        position = {keyword: index for index, keyword in enumerate(keywords)}
+        for template_id, keyword_weights in weights.items():
+            for keyword, weight in keyword_weights.items():
+                self._postings[position[keyword]].append((template_id, weight))
+        self._totals = {template_id: sum(keyword_weights.values()) for template_id, keyword_weights in weights.items()}
+
+    def __len__(self) -> int:
+        return len(self._totals)
+
+    def rank(self, text: str) -> List[TemplateMatch]:
+        """Every template with at least one keyword in ``text``, best first."""
+
+        found: Dict[str, float] = {}
+        matched: Dict[str, List[str]] = {}
+        keywords = self._automaton.keywords
+        for index, present in enumerate(self._automaton.found(text)):
+            if not present:
+                continue
+            for template_id, weight in self._postings[index]:
+                found[template_id] = found.get(template_id, 0.0) + weight
+                matched.setdefault(template_id, []).append(keywords[index])
+        ranked = [
+            TemplateMatch(template_id, round(weight / self._totals[template_id], 4), tuple(matched[template_id]))
+            for template_id, weight in found.items()
+        ]
+        # ties go to the template with more keyword weight matched, then by id
+        ranked.sort(key=lambda match: (-match.score, -found[match.template_id], match.template_id))
+        return ranked
+
+    def classify(self, text: str, min_score: float = 0.0) -> Optional[TemplateMatch]:
+        """The best template for ``text``, or ``None`` if none reaches ``min_score``."""
+
+        ranked = self.rank(text)
+        if not ranked or ranked[0].score < min_score:
+            return None
+        return ranked[0]
+
@@ -1,12 +1,20 @@
 """Comparison strategies for extracted data versus system records."""
 from __future__ import annotations
 
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, field
 from decimal import Decimal, InvalidOperation
-from difflib import SequenceMatcher
-from typing import Any, Dict, Optional, Protocol
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Protocol, Sequence, Tuple
 
 from datacomparison.config import settings
+from datacomparison.services.candidates import Candidate, NgramIndex
+from datacomparison.services.similarity import get_metric
+
+try:  # optional dependency for column-wise numeric comparison
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover - dependency might be unavailable
+    np = None
 
 
 @dataclass
@@ -17,6 +25,70 @@ class ComparisonOutcome:
     passed: bool
     score: float
     message: str = ""
+    candidates: List[Candidate] = field(default_factory=list)
+
+
+BoundComparator = Callable[[Optional[str], Optional[str]], ComparisonOutcome]
+
+
+class BatchOutcome:
+    """Column-wise comparison results.
+
+    ``passed`` and ``scores`` are plain lists; full :class:`ComparisonOutcome`
+    objects (with their messages) are built only when indexed or iterated.
+    """
+
+    def __init__(
+        self,
+        field_name: str,
+        expected: Sequence[Optional[str]],
+        actual: Sequence[Optional[str]],
+        passed: List[bool],
+        scores: List[float],
+        message: Callable[[int], str],
+    ) -> None:
+        self.field_name = field_name
+        self.expected = expected
+        self.actual = actual
+        self.passed = passed
+        self.scores = scores
+        self._message = message
+
+    @classmethod
+    def from_outcomes(
+        cls,
+        field_name: str,
+        expected: Sequence[Optional[str]],
+        actual: Sequence[Optional[str]],
+        outcomes: List[ComparisonOutcome],
+    ) -> "BatchOutcome":
+        return cls(
+            field_name,
+            expected,
+            actual,
+            [outcome.passed for outcome in outcomes],
+            [outcome.score for outcome in outcomes],
+            lambda index: outcomes[index].message,
+        )
+
+    def __len__(self) -> int:
+        return len(self.passed)
+
+    def __getitem__(self, index: int) -> ComparisonOutcome:
+        return ComparisonOutcome(
+            self.field_name,
+            self.expected[index],
+            self.actual[index],
+            self.passed[index],
+            self.scores[index],
+            self._message(index),
+        )
+
+    def __iter__(self) -> Iterator[ComparisonOutcome]:
+        return (self[index] for index in range(len(self)))
+
+    def failed(self) -> List[int]:
+        return [index for index, passed in enumerate(self.passed) if not passed]
 
 
 class Comparator(Protocol):
@@ -30,6 +102,38 @@ class Comparator(Protocol):
         ...
 
 
+class BatchComparator(Protocol):
+    def compare_batch(
+        self,
+        field_name: str,
+        expected: Sequence[Optional[str]],
+        actual: Sequence[Optional[str]],
+        config: Dict[str, Any],
+    ) -> BatchOutcome:
+        ...
+
+
+def prepare_config(comparator: Comparator, config: Mapping[str, Any]) -> Dict[str, Any]:
+    """Return ``config`` with strategy parameters parsed ahead of time when supported."""
+
+    prepare = getattr(comparator, "prepare", None)
+    return prepare(config) if prepare else dict(config)
+
+
+def _equality_batch(
+    field_name: str,
+    expected: Sequence[Optional[str]],
+    actual: Sequence[Optional[str]],
+    passed_message: str,
+    failed_message: str,
+) -> BatchOutcome:
+    passed = [e == a and e is not None for e, a in zip(expected, actual)]
+    scores = [1.0 if value else 0.0 for value in passed]
+    return BatchOutcome(
+        field_name, expected, actual, passed, scores, lambda index: passed_message if passed[index] else failed_message
+    )
+
+
 class ExactComparator:
     def compare(self, field_name: str, expected: Optional[str], actual: Optional[str], config: Dict[str, Any]) -> ComparisonOutcome:
         passed = expected == actual and expected is not None
@@ -37,19 +141,88 @@ class ExactComparator:
         message = "匹配成功" if passed else "字段值不一致"
         return ComparisonOutcome(field_name, expected, actual, passed, score, message)
 
+    def compare_batch(
+        self,
+        field_name: str,
+        expected: Sequence[Optional[str]],
+        actual: Sequence[Optional[str]],
+        config: Dict[str, Any],
+    ) -> BatchOutcome:
+        return _equality_batch(field_name, expected, actual, "匹配成功", "字段值不一致")
+
 
 class FuzzyComparator:
+    """Similarity comparison; ``metric`` selects a function from :mod:`similarity`."""
+
+    def prepare(self, config: Mapping[str, Any]) -> Dict[str, Any]:
+        prepared = dict(config)
+        prepared["threshold"] = float(config.get("threshold", settings.extraction.fuzzy_match_threshold))
+        prepared["metric"] = get_metric(config.get("metric", settings.extraction.fuzzy_metric))
+        return prepared
+
     def compare(self, field_name: str, expected: Optional[str], actual: Optional[str], config: Dict[str, Any]) -> ComparisonOutcome:
         if expected is None or actual is None:
             return ComparisonOutcome(field_name, expected, actual, False, 0.0, "缺少比较值")
-        ratio = SequenceMatcher(None, expected, actual).ratio()
-        threshold = float(config.get("threshold", settings.extraction.fuzzy_match_threshold))
+        metric = config.get("metric", settings.extraction.fuzzy_metric)
+        if isinstance(metric, str):
+            metric = get_metric(metric)
+        threshold = config.get("threshold", settings.extraction.fuzzy_match_threshold)
+        if not isinstance(threshold, float):
+            threshold = float(threshold)
+        ratio = metric(expected, actual, threshold)
         passed = ratio >= threshold
         message = f"相似度 {ratio:.2f}, 阈值 {threshold:.2f}"
         return ComparisonOutcome(field_name, expected, actual, passed, ratio, message)
 
 
+# Decimal's default context precision; longer differences would be rounded
+_DECIMAL_DIGITS = 28
+_VECTOR_MAX_DIGITS = 15
+_VECTOR_MIN_ROWS = 64
+
+
+def _fixed_point(value: str) -> Optional[Tuple[int, int]]:
+    """``(coefficient, places)`` of a plain ASCII decimal literal, ``None`` for other forms."""
+
+    whole, dot, fraction = value.partition(".")
+    sign = whole[:1]
+    digits = whole[1:] if sign in ("-", "+") and sign else whole
+    if not (value.isascii() and digits.isdigit() and (not dot or fraction.isdigit())):
+        return None
+    coefficient = int(digits + fraction)
+    return (-coefficient if sign == "-" else coefficient), len(fraction)
+
+
+def _decimal_fixed_point(value: Decimal) -> Optional[Tuple[int, int]]:
+    if not value.is_finite():
+        return None
+    sign, digits, exponent = value.as_tuple()
+    coefficient = int("".join(map(str, digits)) or "0")
+    if sign:
+        coefficient = -coefficient
+    if exponent >= 0:
+        return coefficient * 10 ** exponent, 0
+    return coefficient, -exponent
+
+
+def _format_fixed_point(coefficient: int, places: int) -> str:
+    """``str(Decimal)`` of a non-negative fixed-point value, without building the Decimal."""
+
+    digits = str(coefficient)
+    if len(digits) - 1 - places < -6:
+        return str(Decimal(coefficient).scaleb(-places))
+    if not places:
+        return digits
+    digits = digits.rjust(places + 1, "0")
+    return f"{digits[:-places]}.{digits[-places:]}"
+
+
 class NumericComparator:
+    def prepare(self, config: Mapping[str, Any]) -> Dict[str, Any]:
+        prepared = dict(config)
+        prepared["tolerance"] = Decimal(str(config.get("tolerance", "0")))
+        return prepared
+
     def compare(self, field_name: str, expected: Optional[str], actual: Optional[str], config: Dict[str, Any]) -> ComparisonOutcome:
         if expected is None or actual is None:
             return ComparisonOutcome(field_name, expected, actual, False, 0.0, "缺少金额或数值")
@@ -58,13 +231,152 @@ class NumericComparator:
             actual_value = Decimal(actual)
         except (InvalidOperation, ValueError):
             return ComparisonOutcome(field_name, expected, actual, False, 0.0, "无法解析为数值")
-        tolerance = Decimal(str(config.get("tolerance", "0")))
+        tolerance = config.get("tolerance", "0")
+        if not isinstance(tolerance, Decimal):
+            tolerance = Decimal(str(tolerance))
         diff = abs(expected_value - actual_value)
         passed = diff <= tolerance
-        score = float(max(0, 1 - (diff / (expected_value or Decimal("1"))))) if expected_value else 0.0
+        score = max(0.0, 1.0 - float(diff) / float(expected_value)) if expected_value else 0.0
         message = f"差值 {diff}, 容差 {tolerance}"
         return ComparisonOutcome(field_name, expected, actual, passed, score, message)
 
+    def compare_batch(
+        self,
+        field_name: str,
+        expected: Sequence[Optional[str]],
+        actual: Sequence[Optional[str]],
+        config: Dict[str, Any],
+    ) -> BatchOutcome:
+        """Column-wise :meth:`compare` with identical results.
+
+        Plain decimal literals are compared as scaled integers: whole columns
+        at once with NumPy 2 when it is installed, row by row otherwise.
+        Other spellings, missing values and rows that would overflow go
+        through :meth:`compare`.
+        """
+
+        tolerance = config.get("tolerance", "0")
+        if not isinstance(tolerance, Decimal):
+            tolerance = Decimal(str(tolerance))
+        tolerance_fixed = _decimal_fixed_point(tolerance)
+        if tolerance_fixed is None:
+            outcomes = [self.compare(field_name, e, a, config) for e, a in zip(expected, actual)]
+            return BatchOutcome.from_outcomes(field_name, expected, actual, outcomes)
+
+        count = len(expected)
+        pending: List[int]
+        if np is not None and hasattr(np, "strings") and count >= _VECTOR_MIN_ROWS:
+            passed, scores, diffs, places, pending = self._score_columns(expected, actual, tolerance_fixed)
+        else:
+            passed, scores, diffs, places = [False] * count, [0.0] * count, [0] * count, [0] * count
+            pending = list(range(count))
+
+        fallback: Dict[int, ComparisonOutcome] = {}
+        for index in pending:
+            expected_value, actual_value = expected[index], actual[index]
+            parsed_expected = _fixed_point(expected_value) if expected_value is not None else None
+            parsed_actual = _fixed_point(actual_value) if actual_value is not None else None
+            result = None
+            if parsed_expected is not None and parsed_actual is not None:
+                result = self._score_row(parsed_expected + parsed_actual, tolerance_fixed)
+            if result is None:
+                outcome = fallback[index] = self.compare(field_name, expected_value, actual_value, config)
+                passed[index], scores[index] = outcome.passed, outcome.score
+            else:
+                passed[index], scores[index], diffs[index], places[index] = result
+
+        tolerance_text = str(tolerance)
+
+        def message(index: int) -> str:
+            if index in fallback:
+                return fallback[index].message
+            return f"差值 {_format_fixed_point(diffs[index], places[index])}, 容差 {tolerance_text}"
+
+        return BatchOutcome(field_name, expected, actual, passed, scores, message)
+
+    @staticmethod
+    def _score_row(row: Tuple[int, int, int, int], tolerance: Tuple[int, int]) -> Optional[Tuple[bool, float, int, int]]:
+        expected, expected_places, actual, actual_places = row
+        places = max(expected_places, actual_places)
+        diff = abs(expected * 10 ** (places - expected_places) - actual * 10 ** (places - actual_places))
+        if len(str(diff)) > _DECIMAL_DIGITS:
+            return None
+        tolerance_value, tolerance_places = tolerance
+        scale = max(places, tolerance_places)
+        passed = diff * 10 ** (scale - places) <= tolerance_value * 10 ** (scale - tolerance_places)
+        try:
+            # int / int is correctly rounded, as is float(Decimal)
+            score = max(0.0, 1.0 - (diff / 10 ** places) / (expected / 10 ** expected_places)) if expected else 0.0
+        except OverflowError:
+            return None
+        return passed, score, diff, places
+
+    @staticmethod
+    def _score_columns(
+        expected: Sequence[Optional[str]], actual: Sequence[Optional[str]], tolerance: Tuple[int, int]
+    ) -> Tuple[List[bool], List[float], List[int], List[int], List[int]]:
+        """NumPy path: parse and score whole columns; returns the rows it could not handle last."""
+
+        expected_column, expected_places, expected_digits, expected_valid = _parse_column(expected)
+        actual_column, actual_places, actual_digits, actual_valid = _parse_column(actual)
+        valid = expected_valid & actual_valid & (expected_places <= _VECTOR_MAX_DIGITS) & (actual_places <= _VECTOR_MAX_DIGITS)
+        tolerance_value, tolerance_places = tolerance
+        row_places = np.maximum(expected_places, actual_places)
+        scale = max(tolerance_places, int(row_places[valid].max()) if valid.any() else 0)
+        scaled_tolerance = tolerance_value * 10 ** (scale - tolerance_places)
+        count = len(expected)
+        if scale > _VECTOR_MAX_DIGITS or abs(scaled_tolerance) >= 2 ** 62:
+            return [False] * count, [0.0] * count, [0] * count, [0] * count, list(range(count))
+        # keep every scaled value below 10**15 so it converts to float exactly
+        valid &= expected_digits - expected_places + scale <= _VECTOR_MAX_DIGITS
+        valid &= actual_digits - actual_places + scale <= _VECTOR_MAX_DIGITS
+
+        powers = 10 ** np.arange(scale + 1, dtype=np.int64)
+        expected_scaled = np.where(valid, expected_column, 0) * powers[np.where(valid, scale - expected_places, 0)]
+        actual_scaled = np.where(valid, actual_column, 0) * powers[np.where(valid, scale - actual_places, 0)]
+        diff = np.abs(expected_scaled - actual_scaled)
+        passed = diff <= scaled_tolerance
+        divisor = float(10 ** scale)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            score = np.maximum(0.0, 1.0 - (diff / divisor) / (expected_scaled / divisor))
+        score = np.where(expected_scaled == 0, 0.0, score)
+        row_places = np.where(valid, row_places, 0)
+        row_diff = diff // powers[scale - row_places]
+        return passed.tolist(), score.tolist(), row_diff.tolist(), row_places.tolist(), np.flatnonzero(~valid).tolist()
+
+
+def _parse_column(values: Sequence[Optional[str]]) -> Tuple[Any, Any, Any, Any]:
+    """Vectorized :func:`_fixed_point`: coefficients, places, digit counts and a validity mask.
+
+    Forms such as ``"1."`` or ``".5"`` are accepted here because ``Decimal``
+    reads them with the same value and exponent.
+    """
+
+    text = np.array(["" if value is None else value for value in values], dtype=np.str_)
+    unsigned = np.strings.lstrip(text, "+-")
+    length = np.strings.str_len(unsigned)
+    dot = np.strings.find(unsigned, ".")
+    places = np.where(dot < 0, 0, length - dot - 1)
+    digits = np.strings.replace(unsigned, ".", "", 1)
+    digit_count = np.strings.str_len(digits)
+    # read the digits straight from the UTF-32 code points instead of astype(int)
+    width = max(1, digits.dtype.itemsize // 4)
+    codes = np.ascontiguousarray(digits).view(np.uint32).reshape(len(digits), width).astype(np.int64)
+    present = codes != 0
+    is_digit = (codes >= 48) & (codes <= 57)
+    valid = (
+        (np.strings.str_len(text) - length <= 1)
+        & (digit_count > 0)
+        & (digit_count <= _VECTOR_MAX_DIGITS)
+        & (is_digit == present).all(axis=1)
+        & (present.sum(axis=1) == digit_count)
+    )
+    exponents = digit_count[:, None] - 1 - np.arange(width)
+    powers = 10 ** np.clip(exponents, 0, _VECTOR_MAX_DIGITS).astype(np.int64)
+    coefficients = np.where(is_digit & valid[:, None], (codes - 48) * powers, 0).sum(axis=1)
+    coefficients = np.where(np.strings.startswith(text, "-"), -coefficients, coefficients)
+    return coefficients, places, digit_count, valid
+
 
 class DateComparator:
     def compare(self, field_name: str, expected: Optional[str], actual: Optional[str], config: Dict[str, Any]) -> ComparisonOutcome:
@@ -73,6 +385,74 @@ class DateComparator:
         message = "日期匹配" if passed else "日期不一致"
         return ComparisonOutcome(field_name, expected, actual, passed, score, message)
 
+    def compare_batch(
+        self,
+        field_name: str,
+        expected: Sequence[Optional[str]],
+        actual: Sequence[Optional[str]],
+        config: Dict[str, Any],
+    ) -> BatchOutcome:
+        return _equality_batch(field_name, expected, actual, "日期匹配", "日期不一致")
+
+
+class CandidateSearchComparator:
+    """Looks the extracted value up in an n-gram index of master records.
+
+    Config: ``index`` (name given to :meth:`register_index`) or ``index_path``
+    (a file written by :meth:`NgramIndex.save`), ``top_k`` and ``threshold``.
+    With an expected value the field passes when it is among the candidates
+    scoring at least ``threshold`` (by record id or text); without one it
+    passes when any candidate does.
+    """
+
+    def __init__(self) -> None:
+        self._indexes: Dict[str, NgramIndex] = {}
+        self._lock = threading.Lock()
+
+    def register_index(self, name: str, index: NgramIndex) -> None:
+        self._indexes[name] = index
+
+    def _index_for(self, config: Mapping[str, Any]) -> NgramIndex:
+        if "index_path" in config:
+            key = str(Path(config["index_path"]).resolve())
+            with self._lock:
+                if key not in self._indexes:
+                    self._indexes[key] = NgramIndex.load(Path(key))
+            return self._indexes[key]
+        name = config.get("index")
+        if name is None:
+            raise ValueError("candidate_search requires 'index' or 'index_path'")
+        if name not in self._indexes:
+            raise KeyError(f"Unknown candidate index '{name}'")
+        return self._indexes[name]
+
+    def prepare(self, config: Mapping[str, Any]) -> Dict[str, Any]:
+        prepared = dict(config)
+        prepared["index"] = self._index_for(config)
+        prepared["top_k"] = int(config.get("top_k", 5))
+        prepared["threshold"] = float(config.get("threshold", settings.extraction.fuzzy_match_threshold))
+        return prepared
+
+    def compare(self, field_name: str, expected: Optional[str], actual: Optional[str], config: Dict[str, Any]) -> ComparisonOutcome:
+        if actual is None:
+            return ComparisonOutcome(field_name, expected, actual, False, 0.0, "缺少比较值")
+        if not isinstance(config.get("index"), NgramIndex):
+            # raw config, e.g. only an index_path
+            config = self.prepare(config)
+        index = config["index"]
+        threshold = config["threshold"]
+        candidates = index.search(actual, config["top_k"], min_score=threshold)
+        if expected is None:
+            best = candidates[0] if candidates else None
+        else:
+            best = next((c for c in candidates if expected in (c.record_id, c.text)), None)
+        score = best.score if best else 0.0
+        if candidates:
+            message = "候选：" + "、".join(f"{c.text}({c.score:.2f})" for c in candidates)
+        else:
+            message = f"无相似度不低于 {threshold:.2f} 的候选"
+        return ComparisonOutcome(field_name, expected, actual, best is not None, score, message, candidates)
+
 
 class ComparatorRegistry:
     def __init__(self) -> None:
@@ -81,8 +461,35 @@ class ComparatorRegistry:
             "fuzzy": FuzzyComparator(),
             "numeric": NumericComparator(),
             "date": DateComparator(),
+            "candidate_search": CandidateSearchComparator(),
         }
 
+    def register(self, strategy: str, comparator: Comparator) -> None:
+        self._registry[strategy] = comparator
+
+    def strategies(self) -> List[str]:
+        return sorted(self._registry)
+
+    def compare_batch(
+        self,
+        strategy: str,
+        field_name: str,
+        expected: Sequence[Optional[str]],
+        actual: Sequence[Optional[str]],
+        config: Optional[Mapping[str, Any]] = None,
+    ) -> BatchOutcome:
+        """Compare two columns pairwise; same outcomes as calling ``compare`` per row."""
+
+        if len(expected) != len(actual):
+            raise ValueError("expected and actual columns must have the same length")
+        comparator = self.get(strategy)
+        prepared = prepare_config(comparator, config or {})
+        compare_batch = getattr(comparator, "compare_batch", None)
+        if compare_batch is not None:
+            return compare_batch(field_name, expected, actual, prepared)
+        outcomes = [comparator.compare(field_name, e, a, prepared) for e, a in zip(expected, actual)]
+        return BatchOutcome.from_outcomes(field_name, expected, actual, outcomes)
+
     def get(self, strategy: str) -> Comparator:
         if strategy not in self._registry:
             raise KeyError(f"Unsupported comparison strategy '{strategy}'")
@@ -1,31 +1,33 @@
 """Document parsing utilities that convert files into raw text."""
 from __future__ import annotations
 
+import contextvars
+import hashlib
+import importlib
 import logging
-from dataclasses import dataclass
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Optional, Protocol
+from typing import Any, Callable, Deque, Dict, Iterator, List, Mapping, Optional, Protocol, Sequence, Tuple, Union
 
-try:  # optional dependency for images
-    from PIL import Image  # type: ignore
-except Exception:  # pragma: no cover - dependency might be unavailable
-    Image = None  # type: ignore
+from datacomparison.config import settings
+from datacomparison.services.cache import ParseCache, cache as default_cache, file_digest
+from datacomparison.services import metrics
+from datacomparison.services.executor import ExecutorBusyError
+from datacomparison.services.preprocessing import ImagePreprocessing, collect_stats
 
-try:  # optional dependency for PDFs
-    import pdfplumber  # type: ignore
-except Exception:  # pragma: no cover - dependency might be unavailable
-    pdfplumber = None
-
-try:  # optional dependency for Word documents
-    import docx  # type: ignore
-except Exception:  # pragma: no cover
-    docx = None
-
-try:  # optional dependency for OCR
-    import pytesseract  # type: ignore
-except Exception:  # pragma: no cover
-    pytesseract = None
+from datacomparison.utils.optional import OptionalModules, import_optional
 
+# parser backends, imported on first use; each is None when not installed
+_optional = OptionalModules(
+    globals(),
+    {"Image": "PIL.Image", "pdfplumber": "pdfplumber", "docx": "docx", "pytesseract": "pytesseract"},
+)
+__getattr__ = _optional.module_getattr
 
 LOGGER = logging.getLogger(__name__)
 
@@ -33,52 +35,362 @@ LOGGER = logging.getLogger(__name__)
 class ParsedDocument(Dict[str, str]):
     """Simple dictionary subclass to store text representations."""
 
+    # seconds per stage (ocr, preprocessing) measured while parsing; not cached
+    timings: Optional[Dict[str, float]] = None
+    # preprocessing step totals (PreprocessingStats.as_dict) of the same parse; not cached
+    preprocessing_stats: Optional[Dict[str, Dict[str, float]]] = None
+
 
 class Parser(Protocol):
     def parse(self, path: Path) -> ParsedDocument:
         ...
 
 
+class PagedParser(Parser, Protocol):
+    """Parser that can also work page by page."""
+
+    def page_count(self, path: Path) -> int:
+        ...
+
+    def parse_page(self, path: Path, index: int) -> str:
+        ...
+
+    def iter_pages(self, path: Path) -> Iterator[str]:
+        ...
+
+
+def supports_pages(parser: Parser) -> bool:
+    return all(hasattr(parser, name) for name in ("page_count", "parse_page", "iter_pages"))
+
+
+# tesseract configs selectable by name in a template region's "ocr" entry
+OCR_PRESETS: Dict[str, str] = {
+    "line": "--psm 7",
+    "block": "--psm 6",
+    "digits": "--psm 7 -c tessedit_char_whitelist=0123456789",
+    "id_number": "--psm 7 -c tessedit_char_whitelist=0123456789Xx",
+    "amount": "--psm 7 -c tessedit_char_whitelist=0123456789.,",
+    "date": "--psm 7 -c tessedit_char_whitelist=0123456789-/.年月日",
+}
+
+
+@dataclass(frozen=True)
+class OcrRegion:
+    """Part of a page that is OCR'd on its own for one field.
+
+    ``box`` is ``(left, top, right, bottom)``, either as fractions of the
+    page size (``relative``) or in pixels.
+    """
+
+    field_name: str
+    box: Tuple[float, float, float, float]
+    relative: bool = True
+    page: int = 0
+    config: str = ""
+    lang: Optional[str] = None
+
+    @classmethod
+    def from_config(cls, field_name: str, config: Mapping[str, Any]) -> "OcrRegion":
+        values = [float(value) for value in config.get("box", ())]
+        if len(values) != 4 or values[0] >= values[2] or values[1] >= values[3]:
+            raise ValueError(f"Region of field '{field_name}' needs a box [left, top, right, bottom]")
+        box = (values[0], values[1], values[2], values[3])
+        units = config.get("units", "relative")
+        if units not in ("relative", "pixels"):
+            raise ValueError(f"Unsupported region units '{units}' for field '{field_name}'")
+        if units == "relative" and not all(0.0 <= value <= 1.0 for value in box):
+            raise ValueError(f"Relative region of field '{field_name}' must lie within [0, 1]")
+        ocr = config.get("ocr", "")
+        return cls(
+            field_name=field_name,
+            box=box,
+            relative=units == "relative",
+            page=int(config.get("page", 0)),
+            config=OCR_PRESETS.get(ocr, ocr),
+            lang=config.get("lang"),
+        )
+
+    def pixel_box(self, width: int, height: int) -> Tuple[int, int, int, int]:
+        left, top, right, bottom = self.box
+        if self.relative:
+            left, right = left * width, right * width
+            top, bottom = top * height, bottom * height
+        return (
+            max(0, min(width, int(left))),
+            max(0, min(height, int(top))),
+            max(0, min(width, int(round(right)))),
+            max(0, min(height, int(round(bottom)))),
+        )
+
+
+def regions_signature(regions: Sequence[OcrRegion]) -> str:
+    """Short digest identifying a set of regions, used in parse cache keys."""
+
+    return hashlib.sha256(repr(tuple(regions)).encode("utf-8")).hexdigest()[:16]
+
+
+def has_text_layer(text: str) -> bool:
+    """Whether a PDF page's extracted text is substantial enough to skip OCR."""
+
+    return sum(not char.isspace() for char in text) >= settings.parsing.pdf_min_text_chars
+
+
+def supports_routes(parser: Parser) -> bool:
+    """Whether the parser reports how each page was read (see ``page_routes``)."""
+
+    return all(hasattr(parser, name) for name in ("parse_routed_page", "iter_routed_pages"))
+
+
+def supports_regions(parser: Parser) -> bool:
+    return hasattr(parser, "parse_regions")
+
+
+def supports_preprocessing(parser: Parser) -> bool:
+    return getattr(parser, "preprocessable", False)
+
+
+def _parser_options(parser: Parser, preprocessing: Optional[ImagePreprocessing]) -> Dict[str, Any]:
+    # only image parsers take preprocessing; other formats ignore the template's settings
+    if preprocessing is None or not supports_preprocessing(parser):
+        return {}
+    return {"preprocessing": preprocessing}
+
+
+# a parser, its class, a factory returning one, or "module:attribute" naming either
+ParserSpec = Union[Parser, Callable[[], Parser], str]
+# guards the lazy instantiation of registered parsers
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _is_lazy(spec: ParserSpec) -> bool:
+    return isinstance(spec, (str, type)) or not hasattr(spec, "parse")
+
+
+def _instantiate(spec: ParserSpec) -> Parser:
+    if isinstance(spec, str):
+        module_name, _, attribute = spec.partition(":")
+        if not attribute:
+            raise ValueError(f"Parser plugin '{spec}' must be given as 'module:attribute'")
+        spec = getattr(importlib.import_module(module_name), attribute)
+    return spec() if _is_lazy(spec) else spec  # type: ignore[operator,return-value]
+
+
 @dataclass
 class ParserRegistry:
-    """Registry for different document parsers."""
+    """Registry for different document parsers.
 
-    parsers: Dict[str, Parser]
+    Parsers registered with a class, factory or ``"module:attribute"`` string
+    are created on first use; suffixes registered with the same spec share
+    one instance.
+    """
+
+    parsers: Dict[str, Parser] = field(default_factory=dict)
+    # suffix -> spec of a parser not created yet
+    pending: Dict[str, ParserSpec] = field(default_factory=dict)
+
+    def register(self, suffixes: Union[str, Sequence[str]], parser: ParserSpec) -> None:
+        for suffix in [suffixes] if isinstance(suffixes, str) else suffixes:
+            suffix = "." + suffix.lower().lstrip(".")
+            with _REGISTRY_LOCK:
+                self.parsers.pop(suffix, None)
+                self.pending.pop(suffix, None)
+                if _is_lazy(parser):
+                    self.pending[suffix] = parser
+                else:
+                    self.parsers[suffix] = parser  # type: ignore[assignment]
+
+    def suffixes(self) -> List[str]:
+        return sorted(set(self.parsers) | set(self.pending))
+
+    def _get(self, suffix: str) -> Optional[Parser]:
+        parser = self.parsers.get(suffix)
+        if parser is not None or suffix not in self.pending:
+            return parser
+        with _REGISTRY_LOCK:
+            spec = self.pending.get(suffix)
+            if spec is None:  # created by another thread meanwhile
+                return self.parsers[suffix]
+            parser = _instantiate(spec)
+            for other, other_spec in list(self.pending.items()):
+                if other_spec is spec:
+                    self.parsers[other] = parser
+                    del self.pending[other]
+        return parser
 
     def for_path(self, path: Path) -> Parser:
         suffix = path.suffix.lower()
-        if suffix in self.parsers:
-            return self.parsers[suffix]
-        if suffix == ".jpeg":
-            return self.parsers.get(".jpg")
-        raise ValueError(f"No parser available for '{suffix}' files")
+        parser = self._get(suffix)
+        if parser is None and suffix == ".jpeg":
+            parser = self._get(".jpg")
+        if parser is None:
+            raise ValueError(f"No parser available for '{suffix}' files")
+        return parser
+
+    def preload(self, suffixes: Optional[Sequence[str]] = None) -> List[str]:
+        """Create the parsers of ``suffixes`` (all when None) and import their backends.
+
+        Returns the backend modules that are not installed.
+        """
+
+        missing = []
+        for suffix in self.suffixes() if suffixes is None else suffixes:
+            parser = self.for_path(Path("document" + suffix))
+            for module_name in getattr(parser, "backends", ()):
+                if import_optional(module_name) is None and module_name not in missing:
+                    missing.append(module_name)
+        return missing
 
 
 class TextParser:
     """Parser used for plain text files."""
 
+    version = "1"
+    # reading the file is as cheap as hashing it
+    cacheable = False
+
     def parse(self, path: Path) -> ParsedDocument:
         text = path.read_text(encoding="utf-8")
         return ParsedDocument(text=text)
 
 
+def _ocr_image(image: Any, preprocessing: Optional[ImagePreprocessing] = None, config: str = "", **options: Any) -> str:
+    if preprocessing is not None:
+        started = time.perf_counter()
+        image = preprocessing.apply(image)
+        metrics.record_stage("preprocessing", time.perf_counter() - started)
+    dpi = image.info.get("dpi")
+    if dpi and "--dpi" not in config:
+        # tesseract does not read the resolution from the images it is handed
+        config = f"{config} --dpi {int(dpi[0])}".strip()
+    started = time.perf_counter()
+    text = _optional.get("pytesseract").image_to_string(image, config=config, **options)
+    metrics.record_stage("ocr", time.perf_counter() - started)
+    return text
+
+
+# per thread (and so per worker process): (key, open pdfplumber document)
+_open_pdfs = threading.local()
+
+
+def release_open_pdf(path: Optional[Path] = None) -> None:
+    """Close this thread's open PDF handle, only if it belongs to ``path`` when given."""
+
+    current = getattr(_open_pdfs, "current", None)
+    if current is None or (path is not None and current[0][1] != str(path)):
+        return
+    _open_pdfs.current = None
+    current[1].close()
+
+
 class PdfParser:
-    """Parser for PDF files using pdfplumber."""
+    """Parser for PDF files using pdfplumber.
 
-    def parse(self, path: Path) -> ParsedDocument:
+    Pages with an embedded text layer are read directly; pages without one
+    (scans) are rasterized and OCR'd. The route each page took is recorded
+    in the parsed document's ``page_routes`` entry.
+    """
+
+    version = "2"
+    cacheable = True
+    # preprocessing applies to pages that are rasterized for OCR
+    preprocessable = True
+    # modules imported on first use; see ParserRegistry.preload
+    backends = ("pdfplumber", "PIL.Image", "pytesseract")
+
+    def _open(self, path: Path):
+        pdfplumber = _optional.get("pdfplumber")
         if pdfplumber is None:
             raise RuntimeError("pdfplumber is required for PDF parsing but is not installed")
-        text_parts = []
-        with pdfplumber.open(str(path)) as pdf:
+        return pdfplumber.open(str(path))
+
+    def _read_page(self, page: Any, preprocessing: Optional[ImagePreprocessing]) -> Tuple[str, str]:
+        text = page.extract_text() or ""
+        if has_text_layer(text):
+            return text, "text"
+        if _optional.get("pytesseract") is None or _optional.get("Image") is None:
+            LOGGER.warning("Page %d has no text layer and OCR is not installed", page.page_number)
+            return text, "empty"
+        resolution = settings.parsing.pdf_ocr_resolution
+        if preprocessing is not None and preprocessing.target_dpi:
+            # rasterize at the target resolution instead of downscaling afterwards
+            resolution = min(resolution, preprocessing.target_dpi)
+        image = page.to_image(resolution=resolution).original
+        image.info["dpi"] = (resolution, resolution)
+        return _ocr_image(image, preprocessing), "ocr"
+
+    def page_count(self, path: Path) -> int:
+        with self._open(path) as pdf:
+            return len(pdf.pages)
+
+    def _document(self, path: Path):
+        """This thread's open handle of ``path``, kept for the next page of the same file.
+
+        Pages of one document are parsed one task at a time, so each worker
+        opens the file once per document instead of once per page. The
+        handle is closed after the last page; one left by a document that
+        stopped early is closed by the thread's next parse.
+        """
+
+        stat = path.stat()
+        # the pid keeps forked workers off handles inherited from their parent
+        key = (os.getpid(), str(path), stat.st_mtime_ns, stat.st_size)
+        current = getattr(_open_pdfs, "current", None)
+        if current is not None and current[0] == key:
+            return current[1]
+        release_open_pdf()
+        pdf = self._open(path)
+        _open_pdfs.current = (key, pdf)
+        return pdf
+
+    def parse_routed_page(
+        self, path: Path, index: int, preprocessing: Optional[ImagePreprocessing] = None
+    ) -> Tuple[str, str]:
+        pdf = self._document(path)
+        page = pdf.pages[index]
+        finished = True
+        try:
+            result = self._read_page(page, preprocessing)
+            finished = index >= len(pdf.pages) - 1
+            return result
+        finally:
+            # the handle stays open for the next page; drop the page's parsed layout
+            close = getattr(page, "close", None)
+            if close is not None:
+                close()
+            if finished:
+                release_open_pdf()
+
+    def parse_page(self, path: Path, index: int, preprocessing: Optional[ImagePreprocessing] = None) -> str:
+        return self.parse_routed_page(path, index, preprocessing)[0]
+
+    def iter_routed_pages(self, path: Path, preprocessing: Optional[ImagePreprocessing] = None) -> Iterator[Tuple[str, str]]:
+        """Yield ``(text, route)`` per page, ``route`` being ``text``, ``ocr`` or ``empty``."""
+
+        with self._open(path) as pdf:
             for page in pdf.pages:
-                text_parts.append(page.extract_text() or "")
-        return ParsedDocument(text="\n".join(text_parts))
+                yield self._read_page(page, preprocessing)
+
+    def iter_pages(self, path: Path, preprocessing: Optional[ImagePreprocessing] = None) -> Iterator[str]:
+        for text, _route in self.iter_routed_pages(path, preprocessing):
+            yield text
+
+    def parse(self, path: Path, preprocessing: Optional[ImagePreprocessing] = None) -> ParsedDocument:
+        pages = list(self.iter_routed_pages(path, preprocessing))
+        return ParsedDocument(
+            text="\n".join(text for text, _route in pages),
+            page_routes=",".join(route for _text, route in pages),
+        )
 
 
 class DocxParser:
     """Parser for Word documents using python-docx."""
 
+    version = "1"
+    cacheable = True
+    backends = ("docx",)
+
     def parse(self, path: Path) -> ParsedDocument:
+        docx = _optional.get("docx")
         if docx is None:
             raise RuntimeError("python-docx is required for DOCX parsing but is not installed")
         document = docx.Document(str(path))
@@ -87,16 +399,68 @@ class DocxParser:
 
 
 class ImageParser:
-    """Parser for image files via OCR."""
+    """Parser for image files via OCR; multi-frame images (TIFF) are OCR'd per frame."""
 
-    def parse(self, path: Path) -> ParsedDocument:
-        if pytesseract is None:
+    version = "2"
+    cacheable = True
+    preprocessable = True
+    backends = ("PIL.Image", "pytesseract")
+
+    def _open(self, path: Path):
+        if _optional.get("pytesseract") is None:
             raise RuntimeError("pytesseract is required for OCR but is not installed")
+        Image = _optional.get("Image")
         if Image is None:
             raise RuntimeError("Pillow is required for OCR but is not installed")
-        image = Image.open(path)
-        text = pytesseract.image_to_string(image)
-        return ParsedDocument(text=text)
+        return Image.open(path)
+
+    def page_count(self, path: Path) -> int:
+        with self._open(path) as image:
+            return getattr(image, "n_frames", 1)
+
+    def parse_page(self, path: Path, index: int, preprocessing: Optional[ImagePreprocessing] = None) -> str:
+        with self._open(path) as image:
+            image.seek(index)
+            return _ocr_image(image, preprocessing)
+
+    def iter_pages(self, path: Path, preprocessing: Optional[ImagePreprocessing] = None) -> Iterator[str]:
+        with self._open(path) as image:
+            for index in range(getattr(image, "n_frames", 1)):
+                image.seek(index)
+                yield _ocr_image(image, preprocessing)
+
+    def parse(self, path: Path, preprocessing: Optional[ImagePreprocessing] = None) -> ParsedDocument:
+        return ParsedDocument(text="\n".join(self.iter_pages(path, preprocessing)))
+
+    def parse_regions(
+        self,
+        path: Path,
+        regions: Sequence[OcrRegion],
+        preprocessing: Optional[ImagePreprocessing] = None,
+    ) -> ParsedDocument:
+        """OCR only ``regions``, in parallel; returns the text of each keyed by field name.
+
+        Boxes refer to the original page; ``preprocessing`` runs on each crop.
+        """
+
+        crops = []
+        with self._open(path) as image:
+            for region in regions:
+                image.seek(region.page)
+                crops.append(image.crop(region.pixel_box(*image.size)))
+
+        def recognize(item: Tuple[OcrRegion, Any]) -> str:
+            region, crop = item
+            options = {"lang": region.lang} if region.lang else {}
+            return _ocr_image(crop, preprocessing, region.config, **options)
+
+        threads = max(1, min(settings.parsing.region_ocr_threads, len(crops)))
+        # tesseract runs as a subprocess, so threads give real parallelism
+        # each task runs in a copy of this context so its OCR time reaches the caller's timings
+        contexts = [contextvars.copy_context() for _ in crops]
+        with ThreadPoolExecutor(threads, thread_name_prefix="datacomparison-ocr") as pool:
+            texts = list(pool.map(lambda context, item: context.run(recognize, item), contexts, zip(regions, crops)))
+        return ParsedDocument({region.field_name: text for region, text in zip(regions, texts)})
 
 
 DEFAULT_REGISTRY = ParserRegistry(
@@ -106,12 +470,207 @@ DEFAULT_REGISTRY = ParserRegistry(
         ".docx": DocxParser(),
         ".jpg": ImageParser(),
         ".png": ImageParser(),
+        ".tif": ImageParser(),
+        ".tiff": ImageParser(),
     }
 )
+for _suffix, _spec in settings.parsing.plugins.items():
+    DEFAULT_REGISTRY.register(_suffix, _spec)
 
 
-def parse_document(path: Path, registry: Optional[ParserRegistry] = None) -> ParsedDocument:
-    registry = registry or DEFAULT_REGISTRY
-    parser = registry.for_path(path)
+@dataclass
+class CacheLookup:
+    """Result of probing the parse cache for a file."""
+
+    cache: Optional[ParseCache]
+    key: Optional[str]
+    document: Optional[ParsedDocument]
+
+    def store(self, parsed: ParsedDocument) -> None:
+        if self.cache is not None and self.key is not None:
+            self.cache.put(self.key, parsed)
+
+
+def lookup_parse_cache(
+    path: Path,
+    registry: Optional[ParserRegistry] = None,
+    cache: Optional[ParseCache] = None,
+    variant: str = "",
+    digest: Optional[str] = None,
+) -> CacheLookup:
+    """Hash ``path`` and probe the cache without parsing.
+
+    ``cache`` defaults to the process-wide cache when ``settings.cache.enabled``.
+    ``variant`` separates results of the same file parsed differently, such
+    as region OCR for one template. A ``digest`` computed earlier (e.g. while
+    the file was uploaded) saves reading the file again.
+    """
+
+    parser = (registry or DEFAULT_REGISTRY).for_path(path)
+    if cache is None and settings.cache.enabled:
+        cache = default_cache
+    if cache is None or not getattr(parser, "cacheable", True):
+        return CacheLookup(cache=None, key=None, document=None)
+    key = cache.key_for(digest or file_digest(path), parser)
+    if variant:
+        key = f"{key}:{variant}"
+    cached = cache.get(key)
+    if cached is not None:
+        LOGGER.debug("Parse cache hit for %s", path)
+    return CacheLookup(cache=cache, key=key, document=ParsedDocument(cached) if cached is not None else None)
+
+
+def parse_uncached(
+    path: Path,
+    registry: Optional[ParserRegistry] = None,
+    preprocessing: Optional[ImagePreprocessing] = None,
+) -> ParsedDocument:
+    """Run the parser for ``path`` directly; safe to call in worker processes."""
+
+    parser = (registry or DEFAULT_REGISTRY).for_path(path)
     LOGGER.debug("Using parser %s for %s", parser.__class__.__name__, path)
-    return parser.parse(path)
+    # a worker moving on to another document drops a page handle left open
+    release_open_pdf()
+    with metrics.collect_timings() as timings, collect_stats() as steps:
+        parsed = parser.parse(path, **_parser_options(parser, preprocessing))
+    # travels back with the result from worker processes
+    parsed.timings = timings.as_dict()
+    parsed.preprocessing_stats = steps.as_dict()
+    return parsed
+
+
+def parse_document(
+    path: Path,
+    registry: Optional[ParserRegistry] = None,
+    cache: Optional[ParseCache] = None,
+) -> ParsedDocument:
+    """Parse ``path``, serving repeated content from the parse cache."""
+
+    lookup = lookup_parse_cache(path, registry, cache)
+    if lookup.document is not None:
+        return lookup.document
+    parsed = parse_uncached(path, registry)
+    lookup.store(parsed)
+    return parsed
+
+
+def parse_regions(
+    path: Path,
+    regions: Sequence[OcrRegion],
+    registry: Optional[ParserRegistry] = None,
+    preprocessing: Optional[ImagePreprocessing] = None,
+) -> ParsedDocument:
+    """OCR only the given regions of ``path``; safe to call in worker processes."""
+
+    parser = (registry or DEFAULT_REGISTRY).for_path(path)
+    if not supports_regions(parser):
+        raise ValueError(f"{parser.__class__.__name__} does not support region OCR")
+    release_open_pdf()
+    with metrics.collect_timings() as timings, collect_stats() as steps:
+        parsed = parser.parse_regions(path, regions, **_parser_options(parser, preprocessing))  # type: ignore[attr-defined]
+    parsed.timings = timings.as_dict()
+    parsed.preprocessing_stats = steps.as_dict()
+    return parsed
+
+
+def parse_page(
+    path: Path,
+    index: int,
+    registry: Optional[ParserRegistry] = None,
+    preprocessing: Optional[ImagePreprocessing] = None,
+) -> str:
+    """Parse a single page; safe to call in worker processes."""
+
+    parser = (registry or DEFAULT_REGISTRY).for_path(path)
+    return parser.parse_page(path, index, **_parser_options(parser, preprocessing))
+
+
+def parse_routed_page(
+    path: Path,
+    index: int,
+    registry: Optional[ParserRegistry] = None,
+    preprocessing: Optional[ImagePreprocessing] = None,
+) -> Tuple[str, Optional[str]]:
+    """Parse a single page and report its route, None if the parser has none; safe in worker processes."""
+
+    parser = (registry or DEFAULT_REGISTRY).for_path(path)
+    options = _parser_options(parser, preprocessing)
+    if supports_routes(parser):
+        return parser.parse_routed_page(path, index, **options)  # type: ignore[attr-defined]
+    return parser.parse_page(path, index, **options), None
+
+
+def _submit_page(
+    submit: Callable[..., "Future[Tuple[str, Optional[str]]]"],
+    path: Path,
+    index: int,
+    registry: Optional[ParserRegistry],
+    preprocessing: Optional[ImagePreprocessing],
+) -> "Future[Tuple[str, Optional[str]]]":
+    try:
+        return submit(parse_routed_page, path, index, registry, preprocessing)
+    except ExecutorBusyError:
+        # pools are saturated: parse this page on the calling thread instead
+        future: "Future[Tuple[str, Optional[str]]]" = Future()
+        try:
+            future.set_result(parse_routed_page(path, index, registry, preprocessing))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+
+def iter_document_pages(
+    path: Path,
+    registry: Optional[ParserRegistry] = None,
+    submit: Optional[Callable[..., "Future[Any]"]] = None,
+    window: int = 1,
+    preprocessing: Optional[ImagePreprocessing] = None,
+    timeout: Optional[float] = None,
+    routes: Optional[List[str]] = None,
+) -> Iterator[str]:
+    """Yield the text of each page of ``path`` in document order.
+
+    With ``submit`` (e.g. ``TaskExecutor.submit_cpu``) up to ``window`` pages
+    are parsed ahead in parallel and each is yielded as soon as it and all
+    pages before it are done, waiting at most ``timeout`` seconds per page.
+    Closing the iterator early cancels pages that have not started, so they
+    are never parsed. Documents whose parser has no page support are
+    yielded as a single page. When the parser reports page routes, the
+    route of each page is appended to ``routes`` as the page is yielded.
+    """
+
+    parser = (registry or DEFAULT_REGISTRY).for_path(path)
+    options = _parser_options(parser, preprocessing)
+    if not supports_pages(parser):
+        parsed = parser.parse(path, **options)
+        if routes is not None and parsed.get("page_routes"):
+            routes.extend(parsed["page_routes"].split(","))
+        yield parsed.get("text", "")
+        return
+    if submit is None or window <= 1:
+        if not supports_routes(parser):
+            yield from parser.iter_pages(path, **options)
+            return
+        for text, route in parser.iter_routed_pages(path, **options):  # type: ignore[attr-defined]
+            if routes is not None:
+                routes.append(route)
+            yield text
+        return
+
+    total = parser.page_count(path)
+    pending: Deque["Future[Tuple[str, Optional[str]]]"] = deque()
+    next_index = 0
+    try:
+        while next_index < total or pending:
+            while next_index < total and len(pending) < window:
+                pending.append(_submit_page(submit, path, next_index, registry, preprocessing))
+                next_index += 1
+            text, route = pending.popleft().result(timeout)
+            if routes is not None and route is not None:
+                routes.append(route)
+            yield text
+    finally:
+        for future in pending:
+            future.cancel()
+        # pages parsed on this thread when the pools were busy
+        release_open_pdf(path)
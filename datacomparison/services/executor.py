@@ -0,0 +1,228 @@
+"""Worker pools for running parsing and comparison off the event loop.
+
+CPU-bound work (OCR, PDF parsing) goes to a process pool so it scales with
+cores; light work and single comparisons go to a thread pool, which has a
+thread per worker process besides ``thread_workers`` as a comparison holds
+its thread while a worker parses for it. Batch drivers, which hold a thread
+for a whole batch, get a pool of their own, and so does CPU-bound work
+without processes, so threads waiting on it can never starve it. All pools
+share one admission counter that bounds how many tasks may be queued or
+running at once.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, TypeVar
+
+from datacomparison.config import ExecutorConfig, settings
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_DEFAULT_TIMEOUT = object()
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when the executor already holds ``max_queue_depth`` tasks."""
+
+
+class TaskTimeoutError(TimeoutError):
+    """Raised when a task does not finish within its timeout."""
+
+
+class TaskExecutor:
+    """Process pool for CPU-bound work plus a thread pool for light work."""
+
+    def __init__(
+        self,
+        use_processes: bool = True,
+        process_workers: int = 1,
+        thread_workers: int = 4,
+        driver_workers: int = 4,
+        max_queue_depth: int = 64,
+        task_timeout_seconds: Optional[float] = None,
+        max_tasks_per_worker: Optional[int] = None,
+    ) -> None:
+        self.use_processes = use_processes
+        self.process_workers = process_workers
+        self.thread_workers = thread_workers
+        self.driver_workers = driver_workers
+        self.max_queue_depth = max_queue_depth
+        self.task_timeout_seconds = task_timeout_seconds
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._process_tasks = 0
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        # runs batch drivers
+        self._driver_pool: Optional[ThreadPoolExecutor] = None
+        # runs CPU-bound work when use_processes is off
+        self._cpu_thread_pool: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def from_config(cls, config: ExecutorConfig) -> "TaskExecutor":
+        return cls(
+            use_processes=config.use_processes,
+            process_workers=config.process_workers,
+            thread_workers=config.thread_workers,
+            driver_workers=config.driver_workers,
+            max_queue_depth=config.max_queue_depth,
+            task_timeout_seconds=config.task_timeout_seconds,
+            max_tasks_per_worker=config.max_tasks_per_worker,
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.max_queue_depth:
+                raise ExecutorBusyError(f"任务队列已满（{self.max_queue_depth}），请稍后重试")
+            self._in_flight += 1
+
+    def _release(self, _future: Optional[Future] = None) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _processes(self, replace: bool = False) -> ProcessPoolExecutor:
+        # Workers are recycled by swapping the whole pool rather than with
+        # ``max_tasks_per_child``, which can deadlock on CPython 3.11.
+        # Callers hold ``_lock`` and submit before releasing it, so a
+        # concurrent recycle never shuts the pool down under them.
+        recycle_due = (
+            self.max_tasks_per_worker is not None
+            and self._process_tasks >= self.max_tasks_per_worker * self.process_workers
+        )
+        if self._process_pool is not None and (replace or recycle_due):
+            # running tasks finish in the old pool before its workers exit
+            self._process_pool.shutdown(wait=False)
+            self._process_pool = None
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(self.process_workers)
+            self._process_tasks = 0
+        self._process_tasks += 1
+        return self._process_pool
+
+    def _submit_process(self, func: Callable[..., T], *args: Any) -> "Future[T]":
+        with self._lock:
+            try:
+                return self._processes().submit(func, *args)
+            except BrokenProcessPool:
+                LOGGER.warning("Worker process pool broken, starting a new one")
+                return self._processes(replace=True).submit(func, *args)
+
+    def start_workers(self) -> int:
+        """Start the worker processes now instead of on the first CPU task; returns how many run."""
+
+        if not self.use_processes:
+            return 0
+        # workers fork from this process, inheriting whatever it imported so far
+        futures = [self._submit_process(int, index) for index in range(self.process_workers)]
+        for future in futures:
+            future.result()
+        return self.process_workers
+
+    def _threads(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._thread_pool is None:
+                # one thread per worker process that a comparison may wait on, plus the light work
+                workers = self.thread_workers + self.process_workers
+                self._thread_pool = ThreadPoolExecutor(workers, thread_name_prefix="datacomparison")
+            return self._thread_pool
+
+    def _drivers(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._driver_pool is None:
+                self._driver_pool = ThreadPoolExecutor(self.driver_workers, thread_name_prefix="datacomparison-driver")
+            return self._driver_pool
+
+    def _cpu_threads(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._cpu_thread_pool is None:
+                self._cpu_thread_pool = ThreadPoolExecutor(self.process_workers, thread_name_prefix="datacomparison-cpu")
+            return self._cpu_thread_pool
+
+    def submit_cpu(self, func: Callable[..., T], *args: Any) -> "Future[T]":
+        """Submit CPU-bound work; ``func`` and ``args`` must be picklable."""
+
+        self._admit()
+        try:
+            if not self.use_processes:
+                future = self._cpu_threads().submit(func, *args)
+            else:
+                future = self._submit_process(func, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _submit_thread(self, pool: Callable[[], ThreadPoolExecutor], func: Callable[..., T], *args: Any) -> "Future[T]":
+        self._admit()
+        try:
+            future = pool().submit(func, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def submit_io(self, func: Callable[..., T], *args: Any) -> "Future[T]":
+        """Submit light or I/O-bound work, or a single comparison, to the thread pool."""
+
+        return self._submit_thread(self._threads, func, *args)
+
+    def submit_driver(self, func: Callable[..., T], *args: Any) -> "Future[T]":
+        """Submit work that drives a batch of CPU tasks, kept apart from the thread pool."""
+
+        return self._submit_thread(self._drivers, func, *args)
+
+    async def run_cpu(self, func: Callable[..., T], *args: Any, timeout: Any = _DEFAULT_TIMEOUT) -> T:
+        return await self._wait(self.submit_cpu(func, *args), timeout)
+
+    async def run_io(self, func: Callable[..., T], *args: Any, timeout: Any = _DEFAULT_TIMEOUT) -> T:
+        return await self._wait(self.submit_io(func, *args), timeout)
+
+    async def run_driver(self, func: Callable[..., T], *args: Any, timeout: Any = _DEFAULT_TIMEOUT) -> T:
+        return await self._wait(self.submit_driver(func, *args), timeout)
+
+    def result(self, future: "Future[T]", timeout: Any = _DEFAULT_TIMEOUT) -> T:
+        """Block until ``future`` is done, at most ``task_timeout_seconds`` by default."""
+
+        if timeout is _DEFAULT_TIMEOUT:
+            timeout = self.task_timeout_seconds
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError as exc:
+            # the worker keeps running the task; its slot is released when it ends
+            raise TaskTimeoutError(f"任务超过 {timeout} 秒未完成") from exc
+
+    async def _wait(self, future: "Future[T]", timeout: Any) -> T:
+        if timeout is _DEFAULT_TIMEOUT:
+            timeout = self.task_timeout_seconds
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError as exc:
+            # A running task cannot be interrupted; its slot is released when it ends.
+            raise TaskTimeoutError(f"任务超过 {timeout} 秒未完成") from exc
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pools = [self._process_pool, self._thread_pool, self._driver_pool, self._cpu_thread_pool]
+            self._process_pool = None
+            self._thread_pool = None
+            self._driver_pool = None
+            self._cpu_thread_pool = None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=wait)
+
+
+executor = TaskExecutor.from_config(settings.executor)
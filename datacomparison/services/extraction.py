@@ -3,7 +3,7 @@ from __future__ import annotations
 
 import re
 from dataclasses import dataclass
-from typing import Dict, Optional, Protocol
+from typing import Any, Callable, Dict, List, Mapping, Optional, Protocol, Sequence, Tuple
 
 
 @dataclass
@@ -14,15 +14,43 @@ class ExtractionResult:
     raw: Optional[str] = None
 
 
+BoundExtractor = Callable[[str], ExtractionResult]
+
+
 class Extractor(Protocol):
     def extract(self, text: str, config: Dict[str, str], field_name: str) -> ExtractionResult:
         ...
 
 
+class CompiledRegex:
+    """Regex extractor bound to a single field with its pattern compiled once."""
+
+    __slots__ = ("field_name", "pattern", "confidence", "_named", "_has_value")
+
+    def __init__(self, field_name: str, pattern: "re.Pattern[str]", confidence: float) -> None:
+        self.field_name = field_name
+        self.pattern = pattern
+        self.confidence = confidence
+        self._named = bool(pattern.groupindex)
+        self._has_value = "value" in pattern.groupindex
+
+    def __call__(self, text: str, pos: int = 0) -> ExtractionResult:
+        return self.from_match(self.pattern.search(text, pos))
+
+    def from_match(self, match: Optional["re.Match[str]"]) -> ExtractionResult:
+        if not match:
+            return ExtractionResult(field_name=self.field_name, value=None, confidence=0.0, raw=None)
+        if self._named:
+            value = match.group("value") if self._has_value else None
+        else:
+            value = match.group(1)
+        return ExtractionResult(field_name=self.field_name, value=value, confidence=self.confidence, raw=match.group(0))
+
+
 class RegexExtractor:
     """Extracts values using regular expressions."""
 
-    def extract(self, text: str, config: Dict[str, str], field_name: str) -> ExtractionResult:
+    def compile(self, config: Mapping[str, Any], field_name: str) -> CompiledRegex:
         pattern = config.get("pattern")
         if not pattern:
             raise ValueError("Regex extractor requires a 'pattern'")
@@ -31,14 +59,165 @@ class RegexExtractor:
         if "i" in flags:
             re_flags |= re.IGNORECASE
         compiled = re.compile(pattern, flags=re_flags)
-        match = compiled.search(text)
-        if not match:
-            return ExtractionResult(field_name=field_name, value=None, confidence=0.0, raw=None)
+        return CompiledRegex(field_name, compiled, float(config.get("confidence", 1.0)))
+
+    def extract(self, text: str, config: Dict[str, str], field_name: str) -> ExtractionResult:
+        return self.compile(config, field_name)(text)
+
+
+_REGEX_META = frozenset(".^$*+?{}[]\\|()")
+
+
+def _split_top_level(pattern: str) -> Optional[List[str]]:
+    """Split ``pattern`` on top-level ``|``; ``None`` if it is not well formed."""
+
+    parts: List[str] = []
+    depth = 0
+    in_class = False
+    start = 0
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            index += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+            if pattern[index + 1:index + 2] == "]":
+                index += 1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth < 0:
+                return None
+        elif char == "|" and depth == 0:
+            parts.append(pattern[start:index])
+            start = index + 1
+        index += 1
+    if depth or in_class:
+        return None
+    parts.append(pattern[start:])
+    return parts
+
+
+def _leading_literal(pattern: str) -> str:
+    end = 0
+    while end < len(pattern) and pattern[end] not in _REGEX_META:
+        end += 1
+    prefix = pattern[:end]
+    if end < len(pattern) and pattern[end] in "*?{":
+        # the quantifier makes the last literal character optional
+        prefix = prefix[:-1]
+    return prefix
+
+
+def literal_prefixes(pattern: str) -> List[str]:
+    """Return literal keywords, one of which starts every match of ``pattern``.
+
+    Handles a leading literal run (``姓名[：:]...``) and a leading non-capturing
+    group of literal alternatives (``(?:姓名|名称)...``). Returns an empty list
+    whenever the keywords cannot be determined safely.
+    """
+
+    parts = _split_top_level(pattern)
+    if parts is None or len(parts) != 1:
+        return []
+    if pattern.startswith("(?:"):
+        close = pattern.find(")")
+        alternatives = _split_top_level(pattern[3:close])
+        if close < 0 or pattern[close + 1:close + 2] in ("*", "?", "{") or not alternatives:
+            return []
+        if any(not alt or _leading_literal(alt) != alt for alt in alternatives):
+            return []
+        return alternatives
+    prefix = _leading_literal(pattern)
+    return [prefix] if prefix else []
+
+
+def _overlapping_keywords(keyword: str, keywords: Sequence[str]) -> List[Tuple[int, List[str]]]:
+    """Keywords that may start inside an occurrence of ``keyword``, by offset."""
+
+    overlaps = []
+    for offset in range(1, len(keyword)):
+        tail = keyword[offset:]
+        candidates = [other for other in keywords if other.startswith(tail) or tail.startswith(other)]
+        if candidates:
+            overlaps.append((offset, candidates))
+    return overlaps
+
+
+class SinglePassScanner:
+    """Extracts several regex fields with a single scan over the document text.
+
+    Patterns that start with literal keywords are only tried at positions
+    where one of their keywords occurs, found by one pass of a combined
+    keyword regex. Trying candidate positions left to right keeps the
+    first-match semantics of ``pattern.search``. Patterns without usable
+    keywords fall back to a regular search.
+    """
+
+    def __init__(self, extractors: Sequence[CompiledRegex]) -> None:
+        anchored: Dict[str, List[CompiledRegex]] = {}
+        fallback: List[CompiledRegex] = []
+        for extractor in extractors:
+            keywords: List[str] = []
+            if not extractor.pattern.flags & re.IGNORECASE:
+                keywords = literal_prefixes(extractor.pattern.pattern)
+            for keyword in keywords:
+                anchored.setdefault(keyword, []).append(extractor)
+            if not keywords:
+                fallback.append(extractor)
+
+        keywords = sorted(anchored, key=len, reverse=True)
+        self._anchored = anchored
+        self._anchored_count = len({extractor.field_name for group in anchored.values() for extractor in group})
+        self._fallback = fallback
+        self._keyword_pattern = (
+            re.compile("|".join(re.escape(keyword) for keyword in keywords)) if keywords else None
+        )
+        # The combined pattern reports the longest keyword at a position; every
+        # shorter keyword that prefixes it occurs there as well.
+        self._implied = {keyword: [other for other in keywords if keyword.startswith(other)] for keyword in keywords}
+        # Occurrences starting inside a reported keyword are skipped by
+        # ``finditer`` and have to be checked explicitly.
+        self._overlaps = {keyword: _overlapping_keywords(keyword, keywords) for keyword in keywords}
+
+    def _try_keyword(self, keyword: str, text: str, position: int, results: Dict[str, ExtractionResult]) -> int:
+        found = 0
+        for extractor in self._anchored[keyword]:
+            if extractor.field_name in results:
+                continue
+            match = extractor.pattern.match(text, position)
+            if match:
+                results[extractor.field_name] = extractor.from_match(match)
+                found += 1
+        return found
 
-        value = match.groupdict().get("value") if match.groupdict() else match.group(1)
-        raw = match.group(0)
-        confidence = float(config.get("confidence", 1.0))
-        return ExtractionResult(field_name=field_name, value=value, confidence=confidence, raw=raw)
+    def scan(self, text: str) -> Dict[str, ExtractionResult]:
+        results: Dict[str, ExtractionResult] = {}
+        remaining = self._anchored_count
+        if self._keyword_pattern is not None:
+            for hit in self._keyword_pattern.finditer(text):
+                position = hit.start()
+                keyword = hit.group(0)
+                for candidate in self._implied[keyword]:
+                    remaining -= self._try_keyword(candidate, text, position, results)
+                for offset, candidates in self._overlaps[keyword]:
+                    for candidate in candidates:
+                        if text.startswith(candidate, position + offset):
+                            remaining -= self._try_keyword(candidate, text, position + offset, results)
+                if not remaining:
+                    break
+        for group in self._anchored.values():
+            for extractor in group:
+                if extractor.field_name not in results:
+                    results[extractor.field_name] = extractor.from_match(None)
+        for extractor in self._fallback:
+            results[extractor.field_name] = extractor(text)
+        return results
 
 
 class ExtractorRegistry:
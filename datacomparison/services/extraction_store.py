@@ -0,0 +1,115 @@
+"""Extraction results kept per document so a re-comparison skips parsing.
+
+Entries live in a :class:`ParseCache` of their own (memory/disk tiers and
+TTL as configured in ``settings.cache``) under ``<document sha256>:extractions``
+and hold, per template, each field's extraction and normalized value
+together with the signature of the field's extraction config. A field whose
+signature no longer matches the current template must be extracted again;
+every other field is reused.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from datacomparison.config import settings
+from datacomparison.services.cache import ParseCache, file_digest
+
+
+def content_digest(document_path: Optional[Path], document_text: Optional[str]) -> str:
+    """SHA-256 of the document text when given, else of the file."""
+
+    if document_text:
+        return hashlib.sha256(document_text.encode("utf-8")).hexdigest()
+    if document_path is None:
+        raise ValueError("Either document_path or document_text must be provided")
+    return file_digest(document_path)
+
+
+@dataclass
+class StoredField:
+    value: Optional[str]
+    confidence: float
+    raw: Optional[str]
+    normalized: Optional[str]
+    # FieldPlan.extraction_signature the value was extracted with
+    signature: str
+
+
+@dataclass
+class StoredExtractions:
+    """Extractions of one document for one template."""
+
+    template_id: str
+    template_version: str
+    # parser identity and file suffix; empty for inline text
+    parser: str = ""
+    suffix: str = ""
+    template_score: Optional[float] = None
+    fields: Dict[str, StoredField] = field(default_factory=dict)
+    # fields fail-fast evaluation skipped; a recomparison extracts them when needed
+    skipped: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StoredExtractions":
+        fields = {name: StoredField(**item) for name, item in data.get("fields", {}).items()}
+        return cls(**{**data, "fields": fields})
+
+    def to_dict(self) -> Dict[str, Any]:
+        # dataclasses.asdict deep-copies every value and was most of the cost of storing
+        fields = {name: dict(vars(item)) for name, item in self.fields.items()}
+        return {**vars(self), "fields": fields, "skipped": list(self.skipped)}
+
+
+class ExtractionStore:
+    """Per-document extractions, keyed by content digest and template."""
+
+    def __init__(self, cache: Optional[ParseCache] = None) -> None:
+        self._cache = cache
+        # serializes the read-modify-write of put()
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self) -> Optional[ParseCache]:
+        if self._cache is not None:
+            return self._cache
+        enabled = settings.cache.enabled and settings.cache.store_extractions
+        return extractions_cache if enabled else None
+
+    @staticmethod
+    def key_for(digest: str) -> str:
+        return f"{digest}:extractions"
+
+    def get(self, digest: str, template_id: Optional[str] = None) -> Optional[StoredExtractions]:
+        """Extractions for ``template_id``; for the template used last when None."""
+
+        cache = self.cache
+        entry = cache.get(self.key_for(digest)) if cache is not None else None
+        if entry is None:
+            return None
+        stored = entry["templates"].get(template_id or entry["latest"])
+        return StoredExtractions.from_dict(stored) if stored is not None else None
+
+    def put(self, digest: str, stored: StoredExtractions) -> None:
+        cache = self.cache
+        if cache is None:
+            return
+        key = self.key_for(digest)
+        with self._lock:
+            # a document may have been compared with other templates before
+            entry = cache.get(key) or {"templates": {}}
+            entry["latest"] = stored.template_id
+            entry["templates"][stored.template_id] = stored.to_dict()
+            cache.put(key, entry)
+
+
+extractions_cache = ParseCache(
+    memory_max_bytes=settings.cache.extractions_memory_max_bytes,
+    ttl_seconds=settings.cache.ttl_seconds,
+    disk_path=settings.cache.extractions_disk_path,
+    disk_max_bytes=settings.cache.disk_max_bytes,
+)
+store = ExtractionStore()
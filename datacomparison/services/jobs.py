@@ -0,0 +1,347 @@
+"""Durable asynchronous comparison jobs backed by SQLite.
+
+Jobs are submitted by the API, claimed by worker threads and their results
+stored compressed in the same database. A claim is a lease that the worker
+renews while the job runs: if the worker crashes, the job becomes claimable
+again once the lease expires, so work resumes after a restart without
+coordination between processes. A job whose lease expired
+``max_attempts`` times is failed instead of being claimed again.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, cast
+
+from datacomparison.config import JobConfig, settings
+from datacomparison.services.candidates import Candidate
+from datacomparison.services.service import ComparisonReport, DocumentComparisonService, FieldComparison
+
+LOGGER = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# input errors that will not go away by retrying
+PERMANENT_ERRORS = (ValueError, KeyError, FileNotFoundError)
+
+
+@dataclass
+class Job:
+    job_id: str
+    status: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+    error: Optional[str]
+    created_at: float
+    updated_at: float
+    # expiry of the lease held by the worker that claimed the job; identifies that claim
+    lease_expires_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+
+def report_to_dict(report: ComparisonReport) -> Dict[str, Any]:
+    return asdict(report)
+
+
+def report_from_dict(data: Dict[str, Any]) -> ComparisonReport:
+    fields = [
+        FieldComparison(**{**item, "candidates": [Candidate(**c) for c in item.get("candidates", [])]})
+        for item in data.get("fields", [])
+    ]
+    return ComparisonReport(
+        template_id=data["template_id"],
+        description=data["description"],
+        status=data["status"],
+        fields=fields,
+        template_score=data.get("template_score"),
+        template_version=data.get("template_version", ""),
+        timings=data.get("timings", {}),
+        document_digest=data.get("document_digest"),
+    )
+
+
+def _pack(value: Dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack(blob: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class JobStore:
+    """SQLite job table shared by API handlers and workers (also across processes)."""
+
+    def __init__(self, path: Path, lease_seconds: float = 600.0) -> None:
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        with self._init_lock:
+            if not self._initialized:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS jobs ("
+                    " id TEXT PRIMARY KEY, status TEXT NOT NULL, payload BLOB NOT NULL, result BLOB,"
+                    " error TEXT, attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL,"
+                    " available_at REAL NOT NULL, lease_expires_at REAL,"
+                    " created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+                )
+                connection.execute("CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, available_at)")
+                self._initialized = True
+        return connection
+
+    def submit(self, payload: Dict[str, Any], max_attempts: int = 3) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO jobs (id, status, payload, max_attempts, available_at, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, _pack(payload), max_attempts, now, now, now),
+        )
+        return job_id
+
+    def claim(self) -> Optional[Job]:
+        """Lease the oldest runnable job, including ones whose lease expired."""
+
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # workers that crashed or hung on their last attempt do not get another one
+            connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_expires_at = NULL, updated_at = ?"
+                " WHERE status = ? AND lease_expires_at < ? AND attempts >= max_attempts",
+                (FAILED, "任务租约到期且已达最大尝试次数", now, RUNNING, now),
+            )
+            row = connection.execute(
+                "SELECT id FROM jobs WHERE (status = ? AND available_at <= ?)"
+                " OR (status = ? AND lease_expires_at < ?) ORDER BY available_at LIMIT 1",
+                (QUEUED, now, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            connection.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_expires_at = ?, updated_at = ?"
+                " WHERE id = ?",
+                (RUNNING, now + self.lease_seconds, now, row[0]),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return self.get(row[0])
+
+    def renew(self, job_id: str, lease_expires_at: float) -> Optional[float]:
+        """Extend the lease ``lease_expires_at``; returns the new expiry, or None when it was lost."""
+
+        now = time.time()
+        renewed = now + self.lease_seconds
+        cursor = self._connection().execute(
+            "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE id = ? AND status = ? AND lease_expires_at = ?",
+            (renewed, now, job_id, RUNNING, lease_expires_at),
+        )
+        return renewed if cursor.rowcount else None
+
+    def complete(self, job_id: str, result: Dict[str, Any], lease_expires_at: float) -> bool:
+        """Store the result if the lease is still held; returns whether it was."""
+
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = NULL, lease_expires_at = NULL, updated_at = ?"
+            " WHERE id = ? AND status = ? AND lease_expires_at = ?",
+            (SUCCEEDED, _pack(result), time.time(), job_id, RUNNING, lease_expires_at),
+        )
+        return bool(cursor.rowcount)
+
+    def fail(self, job_id: str, error: str, lease_expires_at: float, retry_in: Optional[float] = None) -> bool:
+        """Record a failure if the lease is still held; with ``retry_in`` the job is queued again after that delay."""
+
+        now = time.time()
+        if retry_in is None:
+            status, available_at = FAILED, now
+        else:
+            status, available_at = QUEUED, now + retry_in
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = ?, error = ?, available_at = ?, lease_expires_at = NULL, updated_at = ?"
+            " WHERE id = ? AND status = ? AND lease_expires_at = ?",
+            (status, error, available_at, now, job_id, RUNNING, lease_expires_at),
+        )
+        return bool(cursor.rowcount)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._connection().execute(
+            "SELECT id, status, payload, attempts, max_attempts, error, created_at, updated_at, lease_expires_at"
+            " FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return Job(
+            job_id=row[0],
+            status=row[1],
+            payload=_unpack(row[2]),
+            attempts=row[3],
+            max_attempts=row[4],
+            error=row[5],
+            created_at=row[6],
+            updated_at=row[7],
+            lease_expires_at=row[8],
+        )
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return _unpack(row[0])
+
+
+class _Heartbeat:
+    """Renews a job's lease in the background until stopped."""
+
+    def __init__(self, store: JobStore, job: Job) -> None:
+        self.store = store
+        self.job_id = job.job_id
+        self.lease_expires_at = cast(float, job.lease_expires_at)
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"datacomparison-lease-{job.job_id[:8]}", daemon=True)
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self) -> None:
+        # renew well before expiry so one slow renewal does not lose the lease
+        while not self._stop.wait(max(self.store.lease_seconds / 3, 0.05)):
+            try:
+                renewed = self.store.renew(self.job_id, self.lease_expires_at)
+            except Exception:  # pragma: no cover - try again on the next beat
+                LOGGER.exception("Renewing the lease of job %s failed", self.job_id)
+                continue
+            if renewed is None:
+                LOGGER.warning("Job %s lost its lease to another worker", self.job_id)
+                self.lost = True
+                return
+            self.lease_expires_at = renewed
+
+
+class JobWorker:
+    """Thread pool that consumes jobs from a :class:`JobStore`."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        service: DocumentComparisonService,
+        concurrency: int = 2,
+        poll_interval: float = 0.5,
+        retry_backoff_seconds: float = 2.0,
+        retry_backoff_max_seconds: float = 60.0,
+    ) -> None:
+        self.store = store
+        self.service = service
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.retry_backoff_max_seconds = retry_backoff_max_seconds
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        self._stop.clear()
+        for number in range(self.concurrency):
+            thread = threading.Thread(target=self._loop, name=f"datacomparison-job-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = self.run_once()
+            except Exception:  # pragma: no cover - keep the worker alive on storage errors
+                LOGGER.exception("Job worker iteration failed")
+                processed = False
+            if not processed:
+                self._stop.wait(self.poll_interval)
+
+    def backoff(self, attempts: int) -> float:
+        return min(self.retry_backoff_max_seconds, self.retry_backoff_seconds * 2 ** max(0, attempts - 1))
+
+    def run_once(self) -> bool:
+        """Claim and process one job; returns ``False`` when the queue is empty."""
+
+        job = self.store.claim()
+        if job is None:
+            return False
+        payload = job.payload
+        with _Heartbeat(self.store, job) as heartbeat:
+            try:
+                report = self.service.compare(
+                    template_id=payload.get("template_id"),
+                    system_data=payload.get("system_data", {}),
+                    document_path=Path(payload["document_path"]) if payload.get("document_path") else None,
+                    document_text=payload.get("document_text"),
+                    offload=True,
+                    fail_fast=payload.get("fail_fast"),
+                )
+            except Exception as exc:
+                error: Optional[Exception] = exc
+            else:
+                error = None
+        if error is not None:
+            message = str(error) or type(error).__name__
+            retry = not isinstance(error, PERMANENT_ERRORS) and job.attempts < job.max_attempts
+            LOGGER.warning("Job %s attempt %s failed: %s", job.job_id, job.attempts, message)
+            held = self.store.fail(
+                job.job_id, message, heartbeat.lease_expires_at, self.backoff(job.attempts) if retry else None
+            )
+        else:
+            held = self.store.complete(job.job_id, report_to_dict(report), heartbeat.lease_expires_at)
+        if not held:
+            LOGGER.warning("Discarding the outcome of job %s: its lease was taken over", job.job_id)
+        return True
+
+    @classmethod
+    def from_config(cls, config: JobConfig, store: JobStore, service: DocumentComparisonService) -> "JobWorker":
+        return cls(
+            store,
+            service,
+            concurrency=config.concurrency,
+            poll_interval=config.poll_interval_seconds,
+            retry_backoff_seconds=config.retry_backoff_seconds,
+            retry_backoff_max_seconds=config.retry_backoff_max_seconds,
+        )
+
+
+store = JobStore(settings.jobs.database_path, lease_seconds=settings.jobs.lease_seconds)
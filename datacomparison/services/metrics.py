@@ -0,0 +1,321 @@
+"""Latency histograms and counters exposed in the Prometheus text format.
+
+Instruments are plain locked counters with fixed buckets, so recording costs
+a ``bisect`` and an uncontended lock. Per-request stage timings are gathered
+in a :class:`StageTimings` bound to a context variable; parsers running in
+worker processes attach theirs to the :class:`ParsedDocument` they return.
+"""
+from __future__ import annotations
+
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from datacomparison.config import settings
+from datacomparison.services import preprocessing
+from datacomparison.services.cache import cache as parse_cache
+
+Sample = Tuple[str, Mapping[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Mapping[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _CounterValue:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramValue:
+    __slots__ = ("_lock", "_bounds", "buckets", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        # the last bucket is +Inf
+        self.buckets = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self.buckets[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Family(ABC):
+    """A metric and its children, one per combination of label values."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _new_child(self) -> object:
+        ...
+
+    def _child(self, values: Tuple[str, ...]) -> object:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _items(self) -> List[Tuple[Dict[str, str], object]]:
+        with self._lock:
+            items = sorted(self._children.items())
+        return [(dict(zip(self.labelnames, values)), child) for values, child in items]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._children.clear()
+
+    @abstractmethod
+    def render(self) -> Iterator[str]:
+        ...
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterValue:
+        return _CounterValue()
+
+    def labels(self, *values: str) -> _CounterValue:
+        return self._child(values)  # type: ignore[return-value]
+
+    def value(self, *values: str) -> float:
+        child = self._children.get(values)
+        return child.value if child is not None else 0.0  # type: ignore[attr-defined]
+
+    def render(self) -> Iterator[str]:
+        for labels, child in self._items():
+            yield f"{self.name}_total{_format_labels(labels)} {_format_value(child.value)}"  # type: ignore[attr-defined]
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets or settings.metrics.latency_buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.bounds)
+
+    def labels(self, *values: str) -> _HistogramValue:
+        return self._child(values)  # type: ignore[return-value]
+
+    def render(self) -> Iterator[str]:
+        for labels, child in self._items():
+            cumulative = 0
+            counts = list(child.buckets)  # type: ignore[attr-defined]
+            for bound, count in zip(self.bounds + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                yield f"{self.name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(child.sum)}"  # type: ignore[attr-defined]
+            yield f"{self.name}_count{_format_labels(labels)} {child.count}"  # type: ignore[attr-defined]
+
+
+class MetricsRegistry:
+    """Metric families plus collectors reporting counters kept elsewhere."""
+
+    def __init__(self) -> None:
+        self._families: Dict[str, _Family] = {}
+        # name -> (type, help, callable returning samples)
+        self._collectors: Dict[str, Tuple[str, str, Callable[[], Iterable[Sample]]]] = {}
+
+    def _register(self, family: _Family) -> _Family:
+        if family.name in self._families or family.name in self._collectors:
+            raise ValueError(f"Metric '{family.name}' is already registered")
+        self._families[family.name] = family
+        return family
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))  # type: ignore[return-value]
+
+    def register_collector(
+        self,
+        name: str,
+        kind: str,
+        documentation: str,
+        collect: Callable[[], Iterable[Sample]],
+    ) -> None:
+        """Report samples computed at scrape time, e.g. from existing stats objects."""
+
+        self._collectors[name] = (kind, documentation, collect)
+
+    def clear(self) -> None:
+        """Drop every recorded value; families stay registered."""
+
+        for family in self._families.values():
+            family.clear()
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in self._families.values():
+            lines.append(f"# HELP {family.name} {family.documentation}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            lines.extend(family.render())
+        for name, (kind, documentation, collect) in self._collectors.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            suffix = "_total" if kind == "counter" else ""
+            for sample_name, labels, value in collect():
+                lines.append(f"{sample_name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class StageTimings:
+    """Seconds spent in each stage while handling one request."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._seconds: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._seconds[stage] = self._seconds.get(stage, 0.0) + seconds
+
+    def merge(self, seconds: Optional[Mapping[str, float]]) -> None:
+        for stage, value in (seconds or {}).items():
+            self.add(stage, value)
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {stage: round(value, 6) for stage, value in self._seconds.items()}
+
+
+_current: ContextVar[Optional[StageTimings]] = ContextVar("datacomparison_stage_timings", default=None)
+
+
+@contextmanager
+def collect_timings() -> Iterator[StageTimings]:
+    """Gather the stages recorded by :func:`record_stage` in this context."""
+
+    timings = StageTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Add ``seconds`` to ``stage`` of the request being handled, if any."""
+
+    timings = _current.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram(
+    "datacomparison_stage_seconds",
+    "Time spent per comparison stage (parse, ocr, extraction, normalization, comparison, ...)",
+    ("stage", "template", "parser"),
+)
+comparisons = registry.counter(
+    "datacomparison_comparisons",
+    "Completed comparisons by status",
+    ("template", "status"),
+)
+failures = registry.counter(
+    "datacomparison_failures",
+    "Comparisons that raised, by exception type",
+    ("template", "error"),
+)
+field_results = registry.counter(
+    "datacomparison_field_results",
+    "Field comparisons by outcome; the pass rate is passed / (passed + failed)",
+    ("template", "field", "result"),
+)
+
+
+def _parse_cache_samples() -> Iterator[Sample]:
+    for event, value in parse_cache.stats.as_dict().items():
+        yield "datacomparison_parse_cache_events", {"event": event}, value
+
+
+registry.register_collector(
+    "datacomparison_parse_cache_events",
+    "counter",
+    "Parse cache hits, misses, stores, evictions and expirations",
+    _parse_cache_samples,
+)
+
+
+def _preprocessing_samples(name: str, value: Callable[[preprocessing.StepTotals], float]) -> Callable[[], Iterator[Sample]]:
+    def collect() -> Iterator[Sample]:
+        for step, totals in sorted(preprocessing.stats.snapshot().items()):
+            yield name, {"step": step}, value(totals)
+
+    return collect
+
+
+
+registry.register_collector(
+    "datacomparison_preprocessing_steps",
+    "counter",
+    "Image preprocessing steps run",
+    _preprocessing_samples("datacomparison_preprocessing_steps", lambda totals: totals.count),
+)
+registry.register_collector(
+    "datacomparison_preprocessing_seconds",
+    "counter",
+    "Time spent per image preprocessing step",
+    _preprocessing_samples("datacomparison_preprocessing_seconds", lambda totals: totals.seconds),
+)
+registry.register_collector(
+    "datacomparison_preprocessing_bytes_saved",
+    "counter",
+    "Decoded image memory saved per preprocessing step",
+    _preprocessing_samples("datacomparison_preprocessing_bytes_saved", lambda totals: totals.bytes_saved),
+)
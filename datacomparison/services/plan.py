@@ -0,0 +1,318 @@
+"""Compiled, immutable execution plans built from templates.
+
+A plan resolves everything that only depends on the template (compiled
+patterns, extractor/comparator/normalizer callables, parsed thresholds) once,
+so :meth:`DocumentComparisonService.compare` only does per-document work.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, Mapping, Optional, Tuple
+
+from datacomparison.services import comparison, extraction
+from datacomparison.services.comparison import ComparisonOutcome
+from datacomparison.services.document_parser import OcrRegion, regions_signature
+from datacomparison.services.extraction import CompiledRegex, ExtractionResult, SinglePassScanner
+from datacomparison.services.preprocessing import ImagePreprocessing
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from datacomparison.templates import Template
+
+LOGGER = logging.getLogger(__name__)
+
+Normalizer = Callable[[Optional[str]], Optional[str]]
+
+# confidence of a value taken as the whole text of its OCR region
+_REGION_TEXT_CONFIDENCE = 0.8
+
+
+class _BoundComparison:
+    """Comparator call with field name and prepared config fixed."""
+
+    __slots__ = ("_compare", "_field_name", "_config")
+
+    def __init__(self, comparator: comparison.Comparator, field_name: str, config: Mapping[str, Any]) -> None:
+        self._compare = comparator.compare
+        self._field_name = field_name
+        self._config = config
+
+    def __call__(self, expected: Optional[str], actual: Optional[str]) -> ComparisonOutcome:
+        return self._compare(self._field_name, expected, actual, self._config)
+
+
+class _BoundExtraction:
+    """Fallback for extractors that do not provide ``compile``."""
+
+    __slots__ = ("_extract", "_field_name", "_config")
+
+    def __init__(self, extractor: extraction.Extractor, field_name: str, config: Mapping[str, Any]) -> None:
+        self._extract = extractor.extract
+        self._field_name = field_name
+        self._config = config
+
+    def __call__(self, text: str) -> ExtractionResult:
+        return self._extract(text, self._config, self._field_name)
+
+
+@dataclass(frozen=True)
+class FieldPlan:
+    """Ready-to-run extraction, normalization and comparison steps for one field."""
+
+    name: str
+    required: bool
+    extractor_strategy: str
+    comparison_strategy: str
+    extract: Callable[[str], ExtractionResult] = field(repr=False)
+    normalizers: Tuple[Normalizer, ...] = field(repr=False)
+    compare: Callable[[Optional[str], Optional[str]], ComparisonOutcome] = field(repr=False)
+    comparison_config: Mapping[str, Any] = field(repr=False)
+    region: Optional[OcrRegion] = None
+    # hash of everything that determines the extracted and normalized value
+    extraction_signature: str = ""
+    priority: int = 0
+
+    def extract_from(self, text: str, pos: int) -> ExtractionResult:
+        """Extract, considering only matches that start at or after ``pos`` when possible."""
+
+        if isinstance(self.extract, CompiledRegex):
+            return self.extract(text, pos)
+        return self.extract(text)
+
+    def normalize(self, value: Optional[str]) -> Optional[str]:
+        for normalizer in self.normalizers:
+            value = normalizer(value)
+        return value
+
+
+@dataclass(frozen=True)
+class ExecutionPlan:
+    """Immutable per-template plan executed by the comparison service."""
+
+    template_id: str
+    description: str
+    fields: Tuple[FieldPlan, ...]
+    extractor_registry: extraction.ExtractorRegistry = field(repr=False, compare=False)
+    comparator_registry: comparison.ComparatorRegistry = field(repr=False, compare=False)
+    scanner: Optional[SinglePassScanner] = field(default=None, repr=False, compare=False)
+    regions: Tuple[OcrRegion, ...] = field(default=(), repr=False)
+    regions_signature: str = field(default="", repr=False, compare=False)
+    preprocessing: Optional[ImagePreprocessing] = field(default=None, repr=False)
+    # version of the template definition the plan was compiled from
+    template_version: str = ""
+    # stop evaluating once a required field fails; fields are then evaluated in evaluation_order
+    fail_fast: bool = False
+    # fields by descending priority, template order among equal priorities
+    evaluation_order: Tuple[FieldPlan, ...] = field(default=(), repr=False, compare=False)
+
+    @property
+    def region_only(self) -> bool:
+        """Whether every field has an OCR region, so full-page OCR can be skipped."""
+
+        return bool(self.regions) and len(self.regions) == len(self.fields)
+
+    def extract_regions(self, texts: Mapping[str, str]) -> Dict[str, ExtractionResult]:
+        """Extract each field from the OCR text of its own region.
+
+        Boxes usually cover just the value, so when the field's pattern does
+        not match the whole region text is taken as the value.
+        """
+
+        results: Dict[str, ExtractionResult] = {}
+        for field_plan in self.fields:
+            text = texts.get(field_plan.name, "")
+            result = field_plan.extract(text)
+            if result.value is None and text.strip():
+                result = ExtractionResult(field_plan.name, text.strip(), _REGION_TEXT_CONFIDENCE, text)
+            results[field_plan.name] = result
+        return results
+
+    def extract_lazily(self, text: str) -> "LazyExtractions":
+        """Extractions computed per field on first access, for fail-fast evaluation."""
+
+        return LazyExtractions(self, text)
+
+    def extract_all(self, text: str) -> Dict[str, ExtractionResult]:
+        """Run every field extractor, using the single-pass scanner when compiled."""
+
+        results = self.scanner.scan(text) if self.scanner is not None else {}
+        for field_plan in self.fields:
+            if field_plan.name not in results:
+                results[field_plan.name] = field_plan.extract(text)
+        return results
+
+    def extract_pages(
+        self,
+        pages: Iterable[str],
+        stop_early: bool = True,
+        decided: Optional[Callable[[FieldPlan, ExtractionResult], bool]] = None,
+    ) -> Tuple[str, Dict[str, ExtractionResult], bool]:
+        """Extract incrementally while pages arrive.
+
+        Each new page is searched together with the previous one, so matches
+        may span one page break. Once a field matches it is not searched
+        again. With ``stop_early`` iteration stops as soon as every required
+        field has matched and the remaining pages are never requested.
+        ``decided`` is called for matched fields in ``evaluation_order``; once
+        it returns True for a field all fields before which have matched, the
+        outcome is settled and iteration stops as well.
+        Returns the text read, the extractions and whether all pages were read.
+        """
+
+        required = {field_plan.name for field_plan in self.fields if field_plan.required}
+        results: Dict[str, ExtractionResult] = {}
+        matched = set()
+        # decided() of the matched fields, asked once per field
+        verdicts: Dict[str, bool] = {}
+        text = ""
+        window_start = 0
+        complete = True
+        settled = False
+        page_iter = iter(pages)
+        for page_text in page_iter:
+            page_start = len(text) + 1 if text else 0
+            text = f"{text}\n{page_text}" if text else page_text
+            for field_plan in self.fields:
+                if field_plan.name not in matched:
+                    extracted = field_plan.extract_from(text, window_start)
+                    results[field_plan.name] = extracted
+                    if extracted.raw is not None:
+                        matched.add(field_plan.name)
+            window_start = page_start
+            if decided is not None:
+                # the first unmatched field may still appear on a later page,
+                # so only a prefix of the evaluation order can settle the outcome
+                for field_plan in self.evaluation_order or self.fields:
+                    if field_plan.name not in matched:
+                        break
+                    if field_plan.name not in verdicts:
+                        verdicts[field_plan.name] = decided(field_plan, results[field_plan.name])
+                    if verdicts[field_plan.name]:
+                        settled = True
+                        break
+            if settled or (stop_early and required and required <= matched):
+                complete = False
+                break
+        close = getattr(page_iter, "close", None)
+        if close is not None:
+            close()
+
+        for field_plan in self.fields:
+            if field_plan.name not in results:
+                results[field_plan.name] = field_plan.extract(text)
+        return text, results, complete
+
+    def built_with(
+        self,
+        extractor_registry: extraction.ExtractorRegistry,
+        comparator_registry: comparison.ComparatorRegistry,
+    ) -> bool:
+        return self.extractor_registry is extractor_registry and self.comparator_registry is comparator_registry
+
+
+class LazyExtractions(Mapping[str, ExtractionResult]):
+    """Field extractions of one text, each run when first looked up."""
+
+    def __init__(self, plan: ExecutionPlan, text: str) -> None:
+        self._fields = {field_plan.name: field_plan for field_plan in plan.fields}
+        self._text = text
+        self._results: Dict[str, ExtractionResult] = {}
+
+    def __getitem__(self, name: str) -> ExtractionResult:
+        result = self._results.get(name)
+        if result is None:
+            result = self._results[name] = self._fields[name].extract(self._text)
+        return result
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+
+def extraction_signature(template: "Template", field_name: str) -> str:
+    """Signature of the config behind one field's extraction; comparison settings are not part of it."""
+
+    field_template = template.fields[field_name]
+    config = {
+        "extractor": field_template.extractor,
+        "normalizers": field_template.normalizer_names,
+        "region": field_template.region,
+        "extraction_mode": template.extraction_mode,
+        "preprocessing": template.preprocessing,
+    }
+    payload = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def compile_plan(
+    template: "Template",
+    extractor_registry: Optional[extraction.ExtractorRegistry] = None,
+    comparator_registry: Optional[comparison.ComparatorRegistry] = None,
+) -> ExecutionPlan:
+    """Resolve every field of ``template`` into a :class:`FieldPlan`."""
+
+    extractor_registry = extractor_registry or extraction.registry
+    comparator_registry = comparator_registry or comparison.registry
+    field_plans = []
+    for field_template in template.fields.values():
+        extractor_strategy = field_template.extractor.get("strategy", "regex")
+        extractor = extractor_registry.get(extractor_strategy)
+        compile_extractor = getattr(extractor, "compile", None)
+        if compile_extractor is not None:
+            bound_extract = compile_extractor(field_template.extractor, field_template.name)
+        else:
+            bound_extract = _BoundExtraction(extractor, field_template.name, field_template.extractor)
+
+        comparison_strategy = field_template.comparison.get("strategy", "exact")
+        comparator = comparator_registry.get(comparison_strategy)
+        config = MappingProxyType(comparison.prepare_config(comparator, field_template.comparison))
+
+        field_plans.append(
+            FieldPlan(
+                name=field_template.name,
+                required=field_template.required,
+                extractor_strategy=extractor_strategy,
+                comparison_strategy=comparison_strategy,
+                extract=bound_extract,
+                normalizers=tuple(field_template.normalizers),
+                compare=_BoundComparison(comparator, field_template.name, config),
+                comparison_config=config,
+                region=OcrRegion.from_config(field_template.name, field_template.region) if field_template.region else None,
+                extraction_signature=extraction_signature(template, field_template.name),
+                priority=field_template.priority,
+            )
+        )
+    scanner = None
+    if template.extraction_mode == "single_pass":
+        regex_extractors = [plan.extract for plan in field_plans if isinstance(plan.extract, CompiledRegex)]
+        scanner = SinglePassScanner(regex_extractors) if regex_extractors else None
+    elif template.extraction_mode != "per_field":
+        raise ValueError(f"Unsupported extraction mode '{template.extraction_mode}'")
+
+    regions = tuple(plan.region for plan in field_plans if plan.region is not None)
+    if regions and len(regions) < len(field_plans):
+        LOGGER.warning(
+            "Template '%s' declares OCR regions for some fields only; its images are OCR'd whole "
+            "and the regions are ignored. Fields without a region: %s",
+            template.template_id,
+            ", ".join(plan.name for plan in field_plans if plan.region is None),
+        )
+    return ExecutionPlan(
+        template_id=template.template_id,
+        description=template.description,
+        fields=tuple(field_plans),
+        extractor_registry=extractor_registry,
+        comparator_registry=comparator_registry,
+        scanner=scanner,
+        regions=regions,
+        regions_signature=regions_signature(regions) if regions else "",
+        preprocessing=ImagePreprocessing.from_config(template.preprocessing),
+        template_version=template.version,
+        fail_fast=template.fail_fast,
+        evaluation_order=tuple(sorted(field_plans, key=lambda plan: -plan.priority)),
+    )
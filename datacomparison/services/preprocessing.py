@@ -0,0 +1,314 @@
+"""Image preprocessing applied to scans before OCR.
+
+Scans arrive at 300-600 DPI although tesseract reads printed text just as
+well at about 300 DPI, so the largest saving comes from decoding and
+downscaling early. The other steps (grayscale or binarization, deskew and
+margin cropping) shrink the image further and help recognition. Each step is
+timed and the in-memory image size before and after it is recorded in
+:data:`stats`, or in the collector of :func:`collect_stats` so that parses
+in worker processes can send their steps back with the result.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Mapping, Optional, Sequence, Tuple
+
+from datacomparison.utils.optional import OptionalModules
+
+# Pillow is imported on first use (``Image`` is None when it is not installed)
+_optional = OptionalModules(globals(), {"Image": "PIL.Image"})
+__getattr__ = _optional.module_getattr
+
+LOGGER = logging.getLogger(__name__)
+
+_COLOR_MODES = ("none", "grayscale", "binarize")
+# bytes per pixel of Pillow's in-memory storage; "1" images use a byte per pixel
+_BYTES_PER_PIXEL = {"1": 1, "L": 1, "P": 1, "LA": 2, "I;16": 2, "RGB": 4, "RGBA": 4, "CMYK": 4, "YCbCr": 4, "I": 4, "F": 4}
+# deskew searches on a thumbnail about this wide
+_DESKEW_WIDTH = 800
+
+
+@dataclass
+class StepTotals:
+    count: int = 0
+    seconds: float = 0.0
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+
+class PreprocessingStats:
+    """Per-step totals of time spent and image memory before and after."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._steps: Dict[str, StepTotals] = {}
+
+    def record(self, step: str, seconds: float, bytes_before: int, bytes_after: int) -> None:
+        with self._lock:
+            totals = self._steps.setdefault(step, StepTotals())
+            totals.count += 1
+            totals.seconds += seconds
+            totals.bytes_before += bytes_before
+            totals.bytes_after += bytes_after
+
+    def merge(self, steps: Optional[Mapping[str, Mapping[str, float]]]) -> None:
+        """Add totals in the form returned by :meth:`as_dict`."""
+
+        with self._lock:
+            for step, values in (steps or {}).items():
+                totals = self._steps.setdefault(step, StepTotals())
+                totals.count += int(values["count"])
+                totals.seconds += values["seconds"]
+                totals.bytes_before += int(values["bytes_before"])
+                totals.bytes_after += int(values["bytes_after"])
+
+    def snapshot(self) -> Dict[str, StepTotals]:
+        with self._lock:
+            return {name: StepTotals(**vars(totals)) for name, totals in self._steps.items()}
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: dict(vars(totals)) for name, totals in self._steps.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._steps.clear()
+
+
+stats = PreprocessingStats()
+
+_collecting: ContextVar[Optional[PreprocessingStats]] = ContextVar("datacomparison_preprocessing_stats", default=None)
+
+
+@contextmanager
+def collect_stats() -> Iterator[PreprocessingStats]:
+    """Record the steps run in this context here instead of in :data:`stats`."""
+
+    collected = PreprocessingStats()
+    token = _collecting.set(collected)
+    try:
+        yield collected
+    finally:
+        _collecting.reset(token)
+
+
+def _record(step: str, seconds: float, bytes_before: int, bytes_after: int) -> None:
+    (_collecting.get() or stats).record(step, seconds, bytes_before, bytes_after)
+
+
+def image_bytes(image: Any) -> int:
+    """Approximate memory held by a decoded Pillow image."""
+
+    width, height = image.size
+    return width * height * _BYTES_PER_PIXEL.get(image.mode, 4)
+
+
+def otsu_threshold(histogram: Sequence[int]) -> int:
+    """Gray level separating a 256-bin histogram into two classes (Otsu's method)."""
+
+    total = sum(histogram)
+    if not total:
+        return 128
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background = weighted_background = 0
+    best_level, best_variance = 0, -1.0
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += level * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+@dataclass(frozen=True)
+class ImagePreprocessing:
+    """Preprocessing settings for one template (or the global default).
+
+    Built from the ``preprocessing`` mapping of a template or of
+    ``settings.parsing.preprocessing``; an empty mapping disables every step.
+    """
+
+    # downscale scans recorded above this resolution
+    target_dpi: Optional[int] = None
+    # downscale anything larger, whatever its recorded resolution
+    max_pixels: Optional[int] = None
+    color: str = "none"
+    # fixed binarization threshold; None picks one per image (Otsu)
+    threshold: Optional[int] = None
+    deskew: bool = False
+    max_skew_degrees: float = 5.0
+    crop_margins: bool = False
+    margin_pixels: int = 10
+
+    @classmethod
+    def from_config(cls, config: Optional[Mapping[str, Any]]) -> Optional["ImagePreprocessing"]:
+        """Validate ``config``; returns ``None`` when no step is enabled."""
+
+        if not config:
+            return None
+        unknown = set(config) - {
+            "target_dpi", "max_pixels", "color", "threshold", "deskew", "max_skew_degrees", "crop_margins", "margin_pixels"
+        }
+        if unknown:
+            raise ValueError(f"Unknown preprocessing options: {', '.join(sorted(unknown))}")
+        color = config.get("color", "none")
+        if color not in _COLOR_MODES:
+            raise ValueError(f"Unsupported preprocessing color mode '{color}'")
+        threshold = config.get("threshold")
+        if threshold is not None and not 0 <= int(threshold) <= 255:
+            raise ValueError("Binarization threshold must lie within [0, 255]")
+        target_dpi = config.get("target_dpi")
+        max_pixels = config.get("max_pixels")
+        if (target_dpi is not None and int(target_dpi) <= 0) or (max_pixels is not None and int(max_pixels) <= 0):
+            raise ValueError("target_dpi and max_pixels must be positive")
+        preprocessing = cls(
+            target_dpi=int(target_dpi) if target_dpi is not None else None,
+            max_pixels=int(max_pixels) if max_pixels is not None else None,
+            color=color,
+            threshold=int(threshold) if threshold is not None else None,
+            deskew=bool(config.get("deskew", False)),
+            max_skew_degrees=float(config.get("max_skew_degrees", 5.0)),
+            crop_margins=bool(config.get("crop_margins", False)),
+            margin_pixels=int(config.get("margin_pixels", 10)),
+        )
+        return preprocessing if preprocessing.steps else None
+
+    @property
+    def steps(self) -> Tuple[str, ...]:
+        """Enabled steps in the order they run; grayscale first so later steps touch less data."""
+
+        steps = []
+        if self.color != "none":
+            steps.append("grayscale")
+        if self.target_dpi or self.max_pixels:
+            steps.append("downscale")
+        if self.deskew:
+            steps.append("deskew")
+        if self.crop_margins:
+            steps.append("crop_margins")
+        if self.color == "binarize":
+            steps.append("binarize")
+        return tuple(steps)
+
+    @property
+    def signature(self) -> str:
+        """Short digest of the settings, used in parse cache keys."""
+
+        return hashlib.sha256(repr(self).encode("utf-8")).hexdigest()[:16]
+
+    def apply(self, image: Any) -> Any:
+        """Run the enabled steps on a freshly opened (not yet loaded) image."""
+
+        steps = self.steps
+        target_size = self._target_size(image) if "downscale" in steps else None
+        source_width, source_dpi = image.size[0], image.info.get("dpi")
+        before = image_bytes(image)
+        started = time.perf_counter()
+        if target_size is not None and getattr(image, "format", None) == "JPEG":
+            # JPEG can decode straight at 1/2, 1/4 or 1/8 size, never holding the full scan
+            image.draft("L" if self.color != "none" else image.mode, target_size)
+        image.load()
+        _record("decode", time.perf_counter() - started, before, image_bytes(image))
+        for step in steps:
+            before = image_bytes(image)
+            started = time.perf_counter()
+            if step == "downscale":
+                image = self._downscale(image, target_size)
+                if source_dpi:
+                    # keep the resolution tesseract is told consistent with the pixels
+                    dpi = round(source_dpi[0] * image.size[0] / source_width)
+                    image.info["dpi"] = (dpi, dpi)
+            else:
+                image = getattr(self, f"_{step}")(image)
+            elapsed = time.perf_counter() - started
+            after = image_bytes(image)
+            _record(step, elapsed, before, after)
+            LOGGER.debug("Preprocessing %s took %.3fs, %d -> %d bytes", step, elapsed, before, after)
+        return image
+
+    def _target_size(self, image: Any) -> Optional[Tuple[int, int]]:
+        width, height = image.size
+        scale = 1.0
+        dpi = image.info.get("dpi")
+        if self.target_dpi and dpi and dpi[0] > self.target_dpi:
+            scale = self.target_dpi / float(dpi[0])
+        if self.max_pixels and width * height * scale * scale > self.max_pixels:
+            scale = (self.max_pixels / float(width * height)) ** 0.5
+        if scale >= 1.0:
+            return None
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def _grayscale(self, image: Any) -> Any:
+        return image if image.mode == "L" else image.convert("L")
+
+    def _downscale(self, image: Any, size: Optional[Tuple[int, int]]) -> Any:
+        if size is None or image.size[0] <= size[0]:
+            return image
+        return image.resize(size, _optional.get("Image").LANCZOS, reducing_gap=3.0)
+
+    def _skew_angle(self, image: Any) -> float:
+        Image = _optional.get("Image")
+        gray = image.convert("L") if image.mode != "L" else image
+        factor = gray.size[0] // _DESKEW_WIDTH
+        thumbnail = gray.reduce(factor) if factor > 1 else gray
+        # ink as bright pixels, so rotation fills with "no ink"
+        inverted = thumbnail.point(lambda value: 255 - value)
+
+        def sharpness(angle: float) -> float:
+            rotated = inverted.rotate(angle, resample=Image.BILINEAR)
+            # row means: text lines give a sharp profile when level
+            profile = rotated.resize((1, rotated.size[1]), Image.BOX).tobytes()
+            return sum((profile[i + 1] - profile[i]) ** 2 for i in range(len(profile) - 1))
+
+        # whole degrees first, then quarter degrees around the best one
+        limit = int(self.max_skew_degrees)
+        best = max(range(-limit, limit + 1), key=sharpness)
+        return max((best + step / 4.0 for step in range(-3, 4)), key=sharpness)
+
+    def _deskew(self, image: Any) -> Any:
+        angle = self._skew_angle(image)
+        if angle == 0.0:
+            return image
+        fill = 255 if image.mode in ("L", "1") else (255,) * len(image.getbands())
+        # bilinear is half the cost of bicubic and reads the same to tesseract
+        rotated = image.rotate(angle, resample=_optional.get("Image").BILINEAR, expand=True, fillcolor=fill)
+        rotated.info = dict(image.info)
+        return rotated
+
+    def _crop_margins(self, image: Any) -> Any:
+        gray = image.convert("L") if image.mode != "L" else image
+        ink = gray.point(lambda value: 255 if value < 128 else 0)
+        box = ink.getbbox()
+        if box is None:
+            return image
+        left, top, right, bottom = box
+        width, height = image.size
+        margin = self.margin_pixels
+        cropped = image.crop((max(0, left - margin), max(0, top - margin), min(width, right + margin), min(height, bottom + margin)))
+        cropped.info = dict(image.info)
+        return cropped
+
+    def _binarize(self, image: Any) -> Any:
+        gray = image.convert("L") if image.mode != "L" else image
+        threshold = self.threshold if self.threshold is not None else otsu_threshold(gray.histogram())
+        binary = gray.point(lambda value: 255 if value > threshold else 0, mode="1")
+        binary.info = dict(image.info)
+        return binary
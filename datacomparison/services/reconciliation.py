@@ -0,0 +1,232 @@
+"""Bulk reconciliation of documents against a system-of-record extract.
+
+The extract (CSV or JSONL, possibly millions of rows) is loaded once into a
+SQLite file keyed by a business key such as ``id_number``. Each document's
+extracted key then finds its expected record with a single indexed lookup,
+and rows that no document matched are reported at the end.
+
+Run with ``python -m datacomparison.services.reconciliation --help``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from datacomparison.config import settings
+from datacomparison.services.extraction import ExtractionResult
+from datacomparison.services.plan import ExecutionPlan
+from datacomparison.services.service import BatchItem, ComparisonReport, DocumentComparisonService, service
+from datacomparison.utils.records import read_records
+
+_BUILD_BATCH_SIZE = 10_000
+
+KeyNormalizer = Callable[[Optional[str]], Optional[str]]
+
+
+def key_normalizer(
+    key_field: str,
+    template_id: Optional[str] = None,
+    comparison_service: DocumentComparisonService = service,
+) -> Optional[KeyNormalizer]:
+    """The normalizers ``template_id`` applies to ``key_field``, chained; None without any."""
+
+    template = comparison_service.template_registry.load(template_id or settings.templates.default_template)
+    field_template = template.fields.get(key_field)
+    if field_template is None or not field_template.normalizers:
+        return None
+    normalizers = list(field_template.normalizers)
+
+    def normalize(value: Optional[str]) -> Optional[str]:
+        for normalizer in normalizers:
+            value = normalizer(value)
+        return value
+
+    return normalize
+
+
+class SystemRecordIndex:
+    """SQLite-backed, memory-mapped index of system records by business key.
+
+    Keys are stored and looked up through ``normalize_key`` (the key field's
+    template normalizers, see :func:`key_normalizer`) so that system records
+    and extracted keys meet in the same form.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        key_field: str = "id_number",
+        mmap_bytes: int = 256 * 1024 * 1024,
+        normalize_key: Optional[KeyNormalizer] = None,
+    ) -> None:
+        self.path = path
+        self.key_field = key_field
+        self.normalize_key = normalize_key
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.execute(f"PRAGMA mmap_size = {int(mmap_bytes)}")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS records (key TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self._connection.execute("CREATE TEMP TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY)")
+
+    @classmethod
+    def build(
+        cls,
+        source: Path,
+        index_path: Path,
+        key_field: str = "id_number",
+        normalize_key: Optional[KeyNormalizer] = None,
+    ) -> "SystemRecordIndex":
+        """Load ``source`` into a fresh index at ``index_path``; later duplicate keys win."""
+
+        if index_path.exists():
+            index_path.unlink()
+        index = cls(index_path, key_field, normalize_key=normalize_key)
+        connection = index._connection
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        keyed = ((index.key(record.get(key_field)), record) for record in read_records(source))
+        rows = ((key, json.dumps(record, ensure_ascii=False)) for key, record in keyed if key)
+        with connection:
+            while True:
+                batch = list(islice(rows, _BUILD_BATCH_SIZE))
+                if not batch:
+                    break
+                connection.executemany("INSERT OR REPLACE INTO records (key, data) VALUES (?, ?)", batch)
+        return index
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def key(self, value: Optional[str]) -> Optional[str]:
+        """``value`` in the form keys are stored in; None when empty."""
+
+        value = (value or "").strip()
+        if value and self.normalize_key is not None:
+            value = (self.normalize_key(value) or value).strip()
+        return value or None
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, str]]:
+        key = self.key(key)
+        if key is None:
+            return None
+        row = self._connection.execute("SELECT data FROM records WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def mark_seen(self, key: str) -> None:
+        self._connection.execute("INSERT OR IGNORE INTO seen (key) VALUES (?)", (self.key(key),))
+
+    def unseen(self) -> Iterator[Tuple[str, Dict[str, str]]]:
+        """Records not matched by any document since the index was opened."""
+
+        cursor = self._connection.execute(
+            "SELECT key, data FROM records WHERE key NOT IN (SELECT key FROM seen) ORDER BY key"
+        )
+        for key, data in cursor:
+            yield key, json.loads(data)
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+@dataclass
+class ReconciliationResult:
+    index: int
+    key: Optional[str]
+    matched: bool
+    report: Optional[ComparisonReport] = None
+    error: Optional[str] = None
+
+
+class Reconciler:
+    """Compares documents with the system record found through their extracted key."""
+
+    def __init__(
+        self,
+        record_index: SystemRecordIndex,
+        comparison_service: DocumentComparisonService = service,
+        key_field: Optional[str] = None,
+    ) -> None:
+        self.record_index = record_index
+        self.service = comparison_service
+        self.key_field = key_field or record_index.key_field
+
+    def iter_reconcile(
+        self,
+        documents: Sequence[Path],
+        template_id: Optional[str] = None,
+        ordered: bool = True,
+    ) -> Iterator[ReconciliationResult]:
+        keys: Dict[int, Tuple[Optional[str], bool]] = {}
+
+        def resolve(index: int, plan: ExecutionPlan, extractions: Dict[str, ExtractionResult]) -> Dict[str, str]:
+            key = None
+            for field_plan in plan.fields:
+                if field_plan.name == self.key_field:
+                    extracted = extractions[field_plan.name].value
+                    key = self.record_index.key(field_plan.normalize(extracted) or extracted)
+            record = self.record_index.get(key)
+            keys[index] = (key, record is not None)
+            if key is None or record is None:
+                return {}
+            self.record_index.mark_seen(key)
+            return record
+
+        items = [BatchItem(system_data={}, template_id=template_id, document_path=path) for path in documents]
+        for result in self.service.iter_compare_batch(items, ordered=ordered, resolve_system_data=resolve):
+            key, matched = keys.pop(result.index, (None, False))
+            yield ReconciliationResult(result.index, key, matched, result.report, result.error)
+
+    def unmatched_records(self) -> Iterator[Tuple[str, Dict[str, str]]]:
+        return self.record_index.unseen()
+
+
+def _document_paths(paths: Iterable[Path]) -> List[Path]:
+    documents: List[Path] = []
+    for path in paths:
+        documents.extend(sorted(child for child in path.rglob("*") if child.is_file()) if path.is_dir() else [path])
+    return documents
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Reconcile documents against a system-of-record extract.")
+    parser.add_argument("--records", type=Path, required=True, help="system extract (.csv or .jsonl)")
+    parser.add_argument("--index", type=Path, help="SQLite index path; rebuilt from --records when --rebuild")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index even if it exists")
+    parser.add_argument("--key", default="id_number", help="business key field")
+    parser.add_argument("--template", default=None, help="template id")
+    parser.add_argument("documents", nargs="+", type=Path, help="document files or directories")
+    args = parser.parse_args(argv)
+
+    index_path = args.index or args.records.with_suffix(".index.sqlite3")
+    normalize_key = key_normalizer(args.key, args.template)
+    if args.rebuild or not index_path.exists():
+        record_index = SystemRecordIndex.build(args.records, index_path, args.key, normalize_key)
+    else:
+        record_index = SystemRecordIndex(index_path, args.key, normalize_key=normalize_key)
+    reconciler = Reconciler(record_index)
+    documents = _document_paths(args.documents)
+
+    for result in reconciler.iter_reconcile(documents, args.template, ordered=False):
+        line = {
+            "document": str(documents[result.index]),
+            "key": result.key,
+            "matched": result.matched,
+            "status": result.report.status if result.report else None,
+            "error": result.error,
+        }
+        if result.report is not None:
+            line["fields"] = {field.field_name: field.passed for field in result.report.fields}
+        sys.stdout.write(json.dumps(line, ensure_ascii=False) + "\n")
+    for key, _record in reconciler.unmatched_records():
+        sys.stdout.write(json.dumps({"key": key, "matched": False, "missing_document": True}, ensure_ascii=False) + "\n")
+    record_index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,47 @@
 """High level orchestration service for document comparison."""
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+import logging
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass, field, replace
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import Callable, Deque, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union, cast
 
-from datacomparison.config import settings
-from datacomparison.services import comparison, extraction
-from datacomparison.services.document_parser import ParsedDocument, parse_document
+from datacomparison.config import WarmUpConfig, settings
+from datacomparison.services import comparison, extraction, metrics, preprocessing
+from datacomparison.services.candidates import Candidate
+from datacomparison.services.classifier import TemplateMatch
+from datacomparison.services.document_parser import (
+    DEFAULT_REGISTRY,
+    CacheLookup,
+    ParsedDocument,
+    iter_document_pages,
+    lookup_parse_cache,
+    parse_regions,
+    parse_uncached,
+    supports_pages,
+    supports_preprocessing,
+    supports_regions,
+)
+from datacomparison.services.cache import parser_identity
+from datacomparison.services.extraction import ExtractionResult
+from datacomparison.services.extraction_store import (
+    ExtractionStore,
+    StoredExtractions,
+    StoredField,
+    content_digest,
+    store as default_extraction_store,
+)
+from datacomparison.services.executor import ExecutorBusyError, TaskExecutor, executor as default_executor
+from datacomparison.services.plan import ExecutionPlan, FieldPlan, LazyExtractions, compile_plan
+from datacomparison.services.preprocessing import ImagePreprocessing
 from datacomparison.templates import Template, TemplateRegistry, registry as template_registry
 
+LOGGER = logging.getLogger(__name__)
+
 
 @dataclass
 class FieldComparison:
@@ -22,6 +54,10 @@ class FieldComparison:
     message: str
     confidence: float
     raw: Optional[str] = None
+    # False when fail-fast evaluation skipped the field after the outcome was decided
+    evaluated: bool = True
+    # master records proposed by the candidate_search strategy, best first
+    candidates: List[Candidate] = field(default_factory=list)
 
 
 @dataclass
@@ -30,12 +66,151 @@ class ComparisonReport:
     description: str
     status: str
     fields: List[FieldComparison] = field(default_factory=list)
+    # set when the template was detected from the document's keywords
+    template_score: Optional[float] = None
+    # version of the template definition used, see Template.version
+    template_version: str = ""
+    # seconds spent per stage (parse, ocr, extraction, normalization, comparison, total)
+    timings: Dict[str, float] = field(default_factory=dict, compare=False)
+    # SHA-256 of the document content; pass it to recompare instead of the document
+    document_digest: Optional[str] = None
 
     @property
     def passed(self) -> bool:
         return self.status == "pass"
 
 
+@dataclass
+class BatchItem:
+    """One document of a batch comparison."""
+
+    system_data: Dict[str, str]
+    template_id: Optional[str] = None
+    document_path: Optional[Path] = None
+    document_text: Optional[str] = None
+    # overrides the template's fail_fast setting when given
+    fail_fast: Optional[bool] = None
+
+
+@dataclass
+class BatchItemResult:
+    index: int
+    report: Optional[ComparisonReport] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+# Looks up the expected record for batch item ``index`` from its extracted fields.
+SystemDataResolver = Callable[[int, ExecutionPlan, Dict[str, ExtractionResult]], Dict[str, str]]
+
+
+@dataclass
+class _PendingItem:
+    index: int
+    item: BatchItem
+    plan: Optional[ExecutionPlan]
+    # resolves to the document text or to the freshly parsed document
+    future: "Future[Union[str, ParsedDocument]]"
+    lookup: Optional[CacheLookup] = None
+    # the parsed document holds the text of each field's OCR region
+    regions: bool = False
+    # the template is detected from the text once it is available
+    detect: bool = False
+
+
+def _completed(value: Union[str, ParsedDocument, None] = None, error: Optional[BaseException] = None) -> Future:
+    future: Future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(value)
+    return future
+
+
+def _record_parser_timings(parsed: Union[str, ParsedDocument]) -> None:
+    """Add the stages a parser measured, possibly in a worker process, to the current request.
+
+    Its preprocessing steps go to the process-wide :data:`preprocessing.stats`.
+    """
+
+    for stage, seconds in (getattr(parsed, "timings", None) or {}).items():
+        metrics.record_stage(stage, seconds)
+    preprocessing.stats.merge(getattr(parsed, "preprocessing_stats", None))
+
+
+def _parses_plainly(plan: ExecutionPlan, document_path: Path) -> bool:
+    """Whether ``plan`` reads ``document_path`` like a parse without a template (no regions or preprocessing)."""
+
+    parser = DEFAULT_REGISTRY.for_path(document_path)
+    return not (plan.region_only and supports_regions(parser)) and not (
+        plan.preprocessing is not None and supports_preprocessing(parser)
+    )
+
+
+def _resumed(head: Sequence[str], pages: Iterator[str]) -> Iterator[str]:
+    """The pages read ahead followed by the rest; closing it closes ``pages``."""
+
+    try:
+        yield from head
+        yield from pages
+    finally:
+        close = getattr(pages, "close", None)
+        if close is not None:
+            close()
+
+
+def _parser_label(document_path: Optional[Path], document_text: Optional[str]) -> str:
+    if document_text or document_path is None:
+        return "inline"
+    try:
+        return type(DEFAULT_REGISTRY.for_path(document_path)).__name__
+    except ValueError:
+        return "unknown"
+
+
+def _stored_parser(suffix: str) -> str:
+    """Identity of the parser currently handling ``suffix`` files; empty for inline text."""
+
+    return parser_identity(DEFAULT_REGISTRY.for_path(Path(f"document{suffix}"))) if suffix else ""
+
+
+def _with_fail_fast(plan: ExecutionPlan, fail_fast: Optional[bool]) -> ExecutionPlan:
+    """``plan`` with its fail-fast setting overridden by a request, when given."""
+
+    if fail_fast is None or fail_fast == plan.fail_fast:
+        return plan
+    return replace(plan, fail_fast=fail_fast)
+
+
+def _required_field_fails(system_data: Dict[str, str]) -> Callable[[FieldPlan, ExtractionResult], bool]:
+    """Callback telling whether an extracted value already fails its required field."""
+
+    def fails(field_plan: FieldPlan, extracted: ExtractionResult) -> bool:
+        if not field_plan.required or extracted.value is None:
+            return field_plan.required
+        normalized_value = field_plan.normalize(extracted.value)
+        return not field_plan.compare(system_data.get(field_plan.name), normalized_value or extracted.value).passed
+
+    return fails
+
+
+def _observe(report: ComparisonReport, parser: str) -> None:
+    """Record a finished comparison in the process-wide metrics."""
+
+    if not settings.metrics.enabled:
+        return
+    template_id = report.template_id
+    for stage, seconds in report.timings.items():
+        metrics.stage_seconds.labels(stage, template_id, parser).observe(seconds)
+    metrics.comparisons.labels(template_id, report.status).inc()
+    for result in report.fields:
+        outcome = "skipped" if not result.evaluated else "passed" if result.passed else "failed"
+        metrics.field_results.labels(template_id, result.field_name, outcome).inc()
+
+
 class DocumentComparisonService:
     """Service coordinating parsing, extraction and comparison."""
 
@@ -44,78 +219,749 @@ class DocumentComparisonService:
         template_registry: TemplateRegistry = template_registry,
         extractor_registry: extraction.ExtractorRegistry = extraction.registry,
         comparator_registry: comparison.ComparatorRegistry = comparison.registry,
+        executor: TaskExecutor = default_executor,
+        extraction_store: ExtractionStore = default_extraction_store,
     ) -> None:
         self.template_registry = template_registry
         self.extractor_registry = extractor_registry
         self.comparator_registry = comparator_registry
+        self.executor = executor
+        self.extraction_store = extraction_store
+        self._plans: Dict[str, Tuple[Template, ExecutionPlan]] = {}
 
-    def _obtain_document_text(self, document_path: Optional[Path], document_text: Optional[str]) -> str:
-        if document_text:
-            return document_text
-        if not document_path:
-            raise ValueError("Either document_path or document_text must be provided")
-        parsed: ParsedDocument = parse_document(document_path)
-        return parsed.get("text", "")
+    def warm_up(self, config: Optional[WarmUpConfig] = None) -> Dict[str, object]:
+        """Import parser backends, compile templates and start worker processes before traffic.
 
-    def _normalize_value(self, value: Optional[str], normalizers: Iterable) -> Optional[str]:
-        result = value
-        for normalizer in normalizers:
-            result = normalizer(result)  # type: ignore[call-arg]
-        return result
+        Workers are started last so they fork with the backends already
+        imported. Returns a summary of what was done.
+        """
 
-    def compare(
+        config = config or settings.warm_up
+        started = time.perf_counter()
+        missing = DEFAULT_REGISTRY.preload(None if "*" in config.parsers else config.parsers)
+        template_ids = self.template_registry.template_ids() if "*" in config.templates else list(config.templates)
+        compiled = []
+        for template_id in template_ids:
+            try:
+                self._plan_for(self.template_registry.load(template_id))
+            except Exception as exc:  # a broken template fails its own requests, not startup
+                LOGGER.warning("Warm-up could not load template '%s': %s", template_id, exc)
+                continue
+            compiled.append(template_id)
+        if settings.templates.auto_detect:
+            self.template_registry.classifier()
+        workers = self.executor.start_workers() if config.start_workers else 0
+        summary: Dict[str, object] = {
+            "missing_backends": missing,
+            "templates": compiled,
+            "workers": workers,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        LOGGER.info("Warm-up finished: %s", summary)
+        return summary
+
+    def _run_task(self, task: Tuple, offload: bool) -> ParsedDocument:
+        if offload and self.executor.use_processes:
+            return self.executor.result(self.executor.submit_cpu(*task))
+        return task[0](*task[1:])
+
+    def _parse_task(
+        self,
+        plan: ExecutionPlan,
+        document_path: Path,
+        digest: Optional[str] = None,
+    ) -> Tuple[bool, CacheLookup, Tuple]:
+        """Decide how ``plan`` parses ``document_path`` and probe the cache for it.
+
+        Returns whether only the plan's OCR regions are read, the cache
+        lookup, and the parse call as ``(function, *args)``.
+        """
+
+        parser = DEFAULT_REGISTRY.for_path(document_path)
+        regions = plan.region_only and supports_regions(parser)
+        preprocessing = plan.preprocessing if supports_preprocessing(parser) else None
+        # results differ per region set and preprocessing, so they are cached apart
+        variant = ":".join(
+            part
+            for part in (plan.regions_signature if regions else "", preprocessing.signature if preprocessing else "")
+            if part
+        )
+        lookup = lookup_parse_cache(document_path, variant=variant, digest=digest)
+        if regions:
+            return True, lookup, (parse_regions, document_path, plan.regions, None, preprocessing)
+        return False, lookup, (parse_uncached, document_path, None, preprocessing)
+
+    def _extract_document(
+        self,
+        plan: ExecutionPlan,
+        document_path: Path,
+        offload: bool,
+        digest: Optional[str] = None,
+        decided: Optional[Callable[[FieldPlan, ExtractionResult], bool]] = None,
+    ) -> Mapping[str, ExtractionResult]:
+        """Parse ``document_path`` (cache first, paged documents page by page) and extract fields.
+
+        ``offload`` sends parsing to the executor's worker processes; the
+        caller blocks until the result is available. Images whose template
+        declares a region for every field only have those regions OCR'd.
+        Page by page parsing stops once ``decided`` reports a settled outcome.
+        """
+
+        started = time.perf_counter()
+        regions, lookup, task = self._parse_task(plan, document_path, digest)
+        metrics.record_stage("cache_lookup", time.perf_counter() - started)
+        if lookup.document is not None:
+            return self._extract_parsed(plan, lookup.document, regions)
+        if regions:
+            texts = self._parse(task, offload)
+            lookup.store(texts)
+            return self._extract_parsed(plan, texts, regions)
+
+        if self._streams(document_path):
+            routes: List[str] = []
+            pages = self._page_stream(document_path, plan.preprocessing, offload, routes)
+            return self._extract_streamed(plan, pages, routes, lookup, decided)
+
+        parsed = self._parse(task, offload)
+        lookup.store(parsed)
+        return self._extract_parsed(plan, parsed, False)
+
+    @staticmethod
+    def _streams(document_path: Path) -> bool:
+        return settings.parsing.stream_pages and supports_pages(DEFAULT_REGISTRY.for_path(document_path))
+
+    def _page_stream(
+        self,
+        document_path: Path,
+        preprocessing: Optional[ImagePreprocessing],
+        offload: bool,
+        routes: List[str],
+    ) -> Iterator[str]:
+        parsing = settings.parsing
+        # page tasks must not wait on the thread pool the caller may be running in,
+        # and callers that did not ask for offloading parse inline
+        parallel = offload and self.executor.use_processes and parsing.page_window > 1
+        return iter_document_pages(
+            document_path,
+            submit=self.executor.submit_cpu if parallel else None,
+            window=parsing.page_window,
+            preprocessing=preprocessing,
+            timeout=self.executor.task_timeout_seconds,
+            routes=routes,
+        )
+
+    @staticmethod
+    def _extract_streamed(
+        plan: ExecutionPlan,
+        pages: Iterator[str],
+        routes: List[str],
+        lookup: CacheLookup,
+        decided: Optional[Callable[[FieldPlan, ExtractionResult], bool]],
+    ) -> Mapping[str, ExtractionResult]:
+        started = time.perf_counter()
+        # pages are parsed while fields are extracted, so both count as parsing
+        text, extractions, complete = plan.extract_pages(pages, settings.parsing.early_termination, decided)
+        metrics.record_stage("parse", time.perf_counter() - started)
+        if complete:
+            parsed = ParsedDocument(text=text)
+            if routes:
+                parsed["page_routes"] = ",".join(routes)
+            lookup.store(parsed)
+        return extractions
+
+    def _parse(self, task: Tuple, offload: bool) -> ParsedDocument:
+        started = time.perf_counter()
+        parsed = self._run_task(task, offload)
+        metrics.record_stage("parse", time.perf_counter() - started)
+        _record_parser_timings(parsed)
+        return parsed
+
+    @staticmethod
+    def _extract_parsed(plan: ExecutionPlan, parsed: ParsedDocument, regions: bool) -> Mapping[str, ExtractionResult]:
+        if not regions and plan.fail_fast:
+            # fields are extracted as they are evaluated, see _build_report
+            return plan.extract_lazily(parsed.get("text", ""))
+        started = time.perf_counter()
+        if regions:
+            extractions = plan.extract_regions(parsed)
+        else:
+            extractions = plan.extract_all(parsed.get("text", ""))
+        metrics.record_stage("extraction", time.perf_counter() - started)
+        return extractions
+
+    def _plan_for(self, template: Template) -> ExecutionPlan:
+        plan = template.plan
+        if plan is not None and plan.built_with(self.extractor_registry, self.comparator_registry):
+            return plan
+        # Custom registries: compile once per template object and reuse.
+        cached = self._plans.get(template.template_id)
+        if cached is None or cached[0] is not template:
+            cached = (template, compile_plan(template, self.extractor_registry, self.comparator_registry))
+            self._plans[template.template_id] = cached
+        return cached[1]
+
+    def _resolve_plan(self, template_id: Optional[str], fail_fast: Optional[bool] = None) -> ExecutionPlan:
+        template_name = template_id or settings.templates.default_template
+        template: Template = self.template_registry.load(template_name)
+        return _with_fail_fast(self._plan_for(template), fail_fast)
+
+    def _detect_plan(self, text: str, fail_fast: Optional[bool] = None) -> Tuple[ExecutionPlan, Optional[TemplateMatch]]:
+        """Plan of the template whose keywords best match ``text``; the default template otherwise."""
+
+        started = time.perf_counter()
+        match = self.template_registry.classifier().classify(text, settings.templates.detection_min_score)
+        metrics.record_stage("detection", time.perf_counter() - started)
+        return self._resolve_plan(match.template_id if match else None, fail_fast), match
+
+    def _compare_detected(
+        self,
+        system_data: Dict[str, str],
+        document_path: Optional[Path],
+        document_text: Optional[str],
+        offload: bool,
+        document_digest: Optional[str],
+        fail_fast: Optional[bool] = None,
+    ) -> ComparisonReport:
+        if not document_text and document_path:
+            # detection needs the plain parse; templates parsed the same way reuse its text
+            lookup = lookup_parse_cache(document_path, digest=document_digest)
+            parsed = lookup.document
+            if parsed is None and self._streams(document_path):
+                return self._compare_detected_pages(system_data, document_path, offload, document_digest, fail_fast, lookup)
+            if parsed is None:
+                parsed = self._parse((parse_uncached, document_path), offload)
+                lookup.store(parsed)
+            plan, match = self._detect_plan(parsed.get("text", ""), fail_fast)
+            if not _parses_plainly(plan, document_path):
+                report = self._run(plan, system_data, document_path, None, offload, document_digest)
+            else:
+                report = self._run(plan, system_data, None, parsed.get("text", ""))
+        else:
+            plan, match = self._detect_plan(document_text or "", fail_fast)
+            report = self._run(plan, system_data, document_path, document_text, offload, document_digest)
+        report.template_score = match.score if match else None
+        return report
+
+    def _compare_detected_pages(
+        self,
+        system_data: Dict[str, str],
+        document_path: Path,
+        offload: bool,
+        document_digest: Optional[str],
+        fail_fast: Optional[bool],
+        lookup: CacheLookup,
+    ) -> ComparisonReport:
+        """Detect the template from the first pages, then read on with it as with a given template."""
+
+        routes: List[str] = []
+        pages = self._page_stream(document_path, None, offload, routes)
+        started = time.perf_counter()
+        head = list(islice(pages, max(1, settings.templates.detection_pages)))
+        metrics.record_stage("parse", time.perf_counter() - started)
+        plan, match = self._detect_plan("\n".join(head), fail_fast)
+        if _parses_plainly(plan, document_path):
+            decided = _required_field_fails(system_data) if plan.fail_fast else None
+            extractions = self._extract_streamed(plan, _resumed(head, pages), routes, lookup, decided)
+            report = self._build_report(plan, extractions, system_data)
+        else:
+            pages.close()
+            report = self._run(plan, system_data, document_path, None, offload, document_digest)
+        report.template_score = match.score if match else None
+        return report
+
+    def _compare(
         self,
         template_id: Optional[str],
         system_data: Dict[str, str],
-        document_path: Optional[Path] = None,
-        document_text: Optional[str] = None,
+        document_path: Optional[Path],
+        document_text: Optional[str],
+        offload: bool = False,
+        document_digest: Optional[str] = None,
+        fail_fast: Optional[bool] = None,
     ) -> ComparisonReport:
-        template_name = template_id or settings.templates.default_template
-        template: Template = self.template_registry.load(template_name)
-        text = self._obtain_document_text(document_path, document_text)
+        def run() -> ComparisonReport:
+            digest = document_digest
+            if digest is None and self.extraction_store.cache is not None:
+                digest = content_digest(document_path, document_text)
+            if template_id is None and settings.templates.auto_detect:
+                report = self._compare_detected(system_data, document_path, document_text, offload, digest, fail_fast)
+            else:
+                plan = self._resolve_plan(template_id, fail_fast)
+                report = self._run(plan, system_data, document_path, document_text, offload, digest)
+            if digest is not None:
+                suffix = document_path.suffix.lower() if document_path and not document_text else ""
+                self._store_extractions(digest, report, suffix)
+            report.document_digest = digest
+            return report
 
-        field_results: List[FieldComparison] = []
-        overall_passed = True
-        for field_template in template.fields.values():
-            extractor = self.extractor_registry.get(field_template.extractor.get("strategy", "regex"))
-            extracted = extractor.extract(text, field_template.extractor, field_template.name)
-            normalized_value = self._normalize_value(extracted.value, field_template.normalizers)
-            expected_value = system_data.get(field_template.name)
-
-            comparator = self.comparator_registry.get(field_template.comparison.get("strategy", "exact"))
-            comparison_result = comparator.compare(
-                field_name=field_template.name,
-                expected=expected_value,
-                actual=normalized_value or extracted.value,
-                config=field_template.comparison,
+        return self._measured(template_id, _parser_label(document_path, document_text), run)
+
+    def _measured(self, template_id: Optional[str], parser: str, run: Callable[[], ComparisonReport]) -> ComparisonReport:
+        """Run one comparison, recording its stage timings and outcome in the metrics."""
+
+        started = time.perf_counter()
+        with metrics.collect_timings() as timings:
+            try:
+                report = run()
+            except Exception as exc:
+                if settings.metrics.enabled:
+                    metrics.failures.labels(self._template_label(template_id), type(exc).__name__).inc()
+                raise
+        timings.add("total", time.perf_counter() - started)
+        report.timings = timings.as_dict()
+        _observe(report, parser)
+        return report
+
+    def _template_label(self, template_id: Optional[str]) -> str:
+        """Metric label for ``template_id``; ids with no template file share one label."""
+
+        if not template_id:
+            return ""
+        return template_id if template_id in self.template_registry.template_ids() else "unknown"
+
+    def _store_extractions(
+        self,
+        digest: str,
+        report: ComparisonReport,
+        suffix: str,
+        previous: Optional[StoredExtractions] = None,
+    ) -> None:
+        """Store the extractions of ``report``.
+
+        Fields fail-fast evaluation skipped are taken from ``previous`` while
+        still valid and recorded as skipped otherwise; a recomparison extracts
+        them when it needs them.
+        """
+
+        plan = self._resolve_plan(report.template_id)
+        if plan.template_version != report.template_version:  # the template was reloaded meanwhile
+            return
+        signatures = {field_plan.name: field_plan.extraction_signature for field_plan in plan.fields}
+        fields = {
+            result.field_name: StoredField(
+                value=result.extracted_value,
+                confidence=result.confidence,
+                raw=result.raw,
+                normalized=result.normalized_value,
+                signature=signatures[result.field_name],
             )
+            for result in report.fields
+            if result.evaluated
+        }
+        for name, stored_field in (previous.fields if previous else {}).items():
+            if name not in fields and stored_field.signature == signatures.get(name):
+                fields[name] = stored_field
+        stored = StoredExtractions(
+            template_id=report.template_id,
+            template_version=report.template_version,
+            parser=_stored_parser(suffix),
+            suffix=suffix,
+            template_score=report.template_score,
+            fields=fields,
+            skipped=[field_plan.name for field_plan in plan.fields if field_plan.name not in fields],
+        )
+        self.extraction_store.put(digest, stored)
+
+    def _reextract(
+        self,
+        plan: ExecutionPlan,
+        fields: Sequence[FieldPlan],
+        digest: str,
+        suffix: str,
+        document_path: Optional[Path],
+        document_text: Optional[str],
+        offload: bool,
+    ) -> Dict[str, ExtractionResult]:
+        """Extract ``fields`` again, from the cached parse of the document when there is one."""
+
+        if document_text:
+            parsed, regions = ParsedDocument(text=document_text), False
+        elif document_path is None and not suffix:
+            raise LookupError(f"文档 {digest} 的文本未保存，请重新提交文档")
+        else:
+            # without the file the cached parse is found through the digest and the stored suffix
+            regions, lookup, task = self._parse_task(plan, document_path or Path(f"document{suffix}"), digest)
+            parsed = lookup.document
+            if parsed is None:
+                if document_path is None:
+                    raise LookupError(f"文档 {digest} 的解析结果已失效，请重新提交文档")
+                parsed = self._parse(task, offload)
+                lookup.store(parsed)
+        started = time.perf_counter()
+        if regions:
+            extracted = plan.extract_regions(parsed)
+            results = {field_plan.name: extracted[field_plan.name] for field_plan in fields}
+        else:
+            text = parsed.get("text", "")
+            results = {field_plan.name: field_plan.extract(text) for field_plan in fields}
+        metrics.record_stage("extraction", time.perf_counter() - started)
+        return results
+
+    def _recompare(
+        self,
+        template_id: Optional[str],
+        system_data: Dict[str, str],
+        document_path: Optional[Path],
+        document_text: Optional[str],
+        offload: bool,
+        document_digest: Optional[str],
+    ) -> ComparisonReport:
+        digest = document_digest or content_digest(document_path, document_text)
+        stored = self.extraction_store.get(digest, template_id)
+        if stored is not None and stored.parser != _stored_parser(stored.suffix):
+            stored = None  # extracted with an older parser version
+        if stored is None:
+            if document_path is None and not document_text:
+                raise LookupError(f"未找到文档 {digest} 的抽取结果，请重新提交文档")
+            return self._compare(template_id, system_data, document_path, document_text, offload, digest)
+        kept = stored
+
+        def run() -> ComparisonReport:
+            plan = self._resolve_plan(kept.template_id)
+            extractions: Dict[str, ExtractionResult] = {}
+            normalized: Dict[str, Optional[str]] = {}
+            changed, skipped = [], []
+            for field_plan in plan.fields:
+                previous = kept.fields.get(field_plan.name)
+                if previous is None and field_plan.name in kept.skipped:
+                    skipped.append(field_plan)
+                    continue
+                if previous is None or previous.signature != field_plan.extraction_signature:
+                    changed.append(field_plan)
+                    continue
+                extractions[field_plan.name] = ExtractionResult(
+                    field_plan.name, previous.value, previous.confidence, previous.raw
+                )
+                normalized[field_plan.name] = previous.normalized
+            if changed:
+                extractions.update(
+                    self._reextract(plan, changed, digest, kept.suffix, document_path, document_text, offload)
+                )
+            unavailable: List[str] = []
+            if skipped:
+                try:
+                    extractions.update(
+                        self._reextract(plan, skipped, digest, kept.suffix, document_path, document_text, offload)
+                    )
+                except LookupError:
+                    # skipped by fail-fast before and the document is gone: report, don't fail the request
+                    unavailable = [field_plan.name for field_plan in skipped]
+            report = self._build_report(plan, extractions, system_data, normalized, unavailable)
+            report.template_score = kept.template_score
+            report.document_digest = digest
+            if changed or len(unavailable) < len(skipped) or kept.template_version != report.template_version:
+                self._store_extractions(digest, report, kept.suffix, kept)
+            return report
 
+        return self._measured(kept.template_id, "recompare", run)
+
+    def _build_report(
+        self,
+        plan: ExecutionPlan,
+        extractions: Mapping[str, ExtractionResult],
+        system_data: Dict[str, str],
+        normalized_values: Optional[Mapping[str, Optional[str]]] = None,
+        unavailable: Sequence[str] = (),
+    ) -> ComparisonReport:
+        """Normalize and compare every field; ``normalized_values`` holds values normalized earlier.
+
+        With ``plan.fail_fast`` fields are evaluated in ``plan.evaluation_order``
+        and, once a required field fails, the rest are reported as not evaluated.
+        Fields in ``unavailable`` have no extraction and are reported as not
+        evaluated; a required one keeps the report from passing.
+        """
+
+        field_results: Dict[str, FieldComparison] = {}
+        overall_passed = True
+        undetermined = False
+        lazy = isinstance(extractions, LazyExtractions)
+        extracting = normalizing = comparing = 0.0
+        order = plan.evaluation_order or plan.fields if plan.fail_fast else plan.fields
+        for field_plan in order:
+            if plan.fail_fast and not overall_passed:
+                field_results[field_plan.name] = FieldComparison(
+                    field_name=field_plan.name,
+                    extracted_value=None,
+                    normalized_value=None,
+                    expected_value=system_data.get(field_plan.name),
+                    passed=False,
+                    score=0.0,
+                    message="未评估：必填字段已不一致",
+                    confidence=0.0,
+                    evaluated=False,
+                )
+                continue
+            if field_plan.name in unavailable:
+                field_results[field_plan.name] = FieldComparison(
+                    field_name=field_plan.name,
+                    extracted_value=None,
+                    normalized_value=None,
+                    expected_value=system_data.get(field_plan.name),
+                    passed=False,
+                    score=0.0,
+                    message="未评估：抽取结果未保存，请提供文档重新比对",
+                    confidence=0.0,
+                    evaluated=False,
+                )
+                undetermined = undetermined or field_plan.required
+                continue
+            started = time.perf_counter()
+            extracted = extractions[field_plan.name]
+            if lazy:
+                extracted_at = time.perf_counter()
+                extracting += extracted_at - started
+                started = extracted_at
+            if normalized_values is not None and field_plan.name in normalized_values:
+                normalized_value = normalized_values[field_plan.name]
+            else:
+                normalized_value = field_plan.normalize(extracted.value)
+            expected_value = system_data.get(field_plan.name)
+            normalized = time.perf_counter()
+            comparison_result = field_plan.compare(expected_value, normalized_value or extracted.value)
+            normalizing += normalized - started
+            comparing += time.perf_counter() - normalized
             passed = comparison_result.passed
-            if field_template.required and not passed:
+            if field_plan.required and not passed:
                 overall_passed = False
-            elif field_template.required and extracted.value is None:
+            elif field_plan.required and extracted.value is None:
                 overall_passed = False
 
-            field_results.append(
-                FieldComparison(
-                    field_name=field_template.name,
-                    extracted_value=extracted.value,
-                    normalized_value=normalized_value,
-                    expected_value=expected_value,
-                    passed=passed,
-                    score=comparison_result.score,
-                    message=comparison_result.message,
-                    confidence=extracted.confidence,
-                    raw=extracted.raw,
-                )
+            field_results[field_plan.name] = FieldComparison(
+                field_name=field_plan.name,
+                extracted_value=extracted.value,
+                normalized_value=normalized_value,
+                expected_value=expected_value,
+                passed=passed,
+                score=comparison_result.score,
+                message=comparison_result.message,
+                confidence=extracted.confidence,
+                raw=extracted.raw,
+                candidates=list(comparison_result.candidates),
             )
 
-        status = "pass" if overall_passed else "fail"
+        if lazy:
+            metrics.record_stage("extraction", extracting)
+        metrics.record_stage("normalization", normalizing)
+        metrics.record_stage("comparison", comparing)
+        status = "pass" if overall_passed and not undetermined else "fail"
         return ComparisonReport(
-            template_id=template.template_id,
-            description=template.description,
+            template_id=plan.template_id,
+            description=plan.description,
             status=status,
-            fields=field_results,
+            fields=[field_results[field_plan.name] for field_plan in plan.fields],
+            template_version=plan.template_version,
+        )
+
+    def _run(
+        self,
+        plan: ExecutionPlan,
+        system_data: Dict[str, str],
+        document_path: Optional[Path],
+        document_text: Optional[str],
+        offload: bool = False,
+        document_digest: Optional[str] = None,
+    ) -> ComparisonReport:
+        extractions: Mapping[str, ExtractionResult]
+        if document_text and plan.fail_fast:
+            extractions = plan.extract_lazily(document_text)
+        elif document_text:
+            started = time.perf_counter()
+            extractions = plan.extract_all(document_text)
+            metrics.record_stage("extraction", time.perf_counter() - started)
+        elif document_path:
+            decided = _required_field_fails(system_data) if plan.fail_fast else None
+            extractions = self._extract_document(plan, document_path, offload, document_digest, decided)
+        else:
+            raise ValueError("Either document_path or document_text must be provided")
+        return self._build_report(plan, extractions, system_data)
+
+    def _start_item(self, index: int, item: BatchItem, plans: Dict[str, Union[ExecutionPlan, Exception]]) -> _PendingItem:
+        detect = item.template_id is None and settings.templates.auto_detect
+        plan = plans[item.template_id or settings.templates.default_template]
+        if isinstance(plan, Exception) and not detect:
+            return _PendingItem(index, item, None, _completed(error=plan))
+        if detect:
+            plan = None
+        else:
+            plan = _with_fail_fast(cast(ExecutionPlan, plan), item.fail_fast)
+        if item.document_text:
+            return _PendingItem(index, item, plan, _completed(item.document_text), detect=detect)
+        if not item.document_path:
+            error = ValueError("Either document_path or document_text must be provided")
+            return _PendingItem(index, item, plan, _completed(error=error))
+        try:
+            if plan is None:
+                regions, lookup = False, lookup_parse_cache(item.document_path)
+                task: Tuple = (parse_uncached, item.document_path)
+            else:
+                regions, lookup, task = self._parse_task(plan, item.document_path)
+            if lookup.document is not None:
+                return _PendingItem(index, item, plan, _completed(lookup.document), regions=regions, detect=detect)
+            try:
+                future = self.executor.submit_cpu(*task)
+            except ExecutorBusyError:
+                future = _completed(task[0](*task[1:]))
+        except Exception as exc:
+            return _PendingItem(index, item, plan, _completed(error=exc))
+        return _PendingItem(index, item, plan, future, lookup, regions, detect)
+
+    def _finish_item(self, pending: _PendingItem, resolve: Optional[SystemDataResolver] = None) -> BatchItemResult:
+        # parsing overlaps with other items, so only the stages measured by the parser itself count
+        with metrics.collect_timings() as timings:
+            try:
+                result = pending.future.result(timeout=self.executor.task_timeout_seconds)
+                if not isinstance(result, str):
+                    _record_parser_timings(result)
+                    if pending.lookup is not None:
+                        pending.lookup.store(result)
+                parsed = ParsedDocument(text=result) if isinstance(result, str) else result
+                match = None
+                if pending.detect:
+                    plan, match = self._detect_plan(parsed.get("text", ""), pending.item.fail_fast)
+                else:
+                    # the plan is only missing when the future carries the error
+                    plan = cast(ExecutionPlan, pending.plan)
+                extractions = self._extract_parsed(plan, parsed, pending.regions)
+                system_data = resolve(pending.index, plan, extractions) if resolve else pending.item.system_data
+                report = self._build_report(plan, extractions, system_data)
+                report.template_score = match.score if match else None
+            except Exception as exc:
+                if settings.metrics.enabled:
+                    metrics.failures.labels(self._template_label(pending.item.template_id), type(exc).__name__).inc()
+                return BatchItemResult(index=pending.index, error=str(exc) or type(exc).__name__)
+        report.timings = timings.as_dict()
+        _observe(report, _parser_label(pending.item.document_path, pending.item.document_text))
+        return BatchItemResult(index=pending.index, report=report)
+
+    def iter_compare_batch(
+        self,
+        items: Sequence[BatchItem],
+        ordered: bool = True,
+        window: Optional[int] = None,
+        resolve_system_data: Optional[SystemDataResolver] = None,
+    ) -> Iterator[BatchItemResult]:
+        """Compare many documents, yielding one result per item.
+
+        Items are grouped by template so each plan is resolved once. At most
+        ``window`` documents are parsed ahead on the worker processes; new
+        work is only started as results are consumed. With ``ordered=False``
+        results are yielded as soon as they finish. Failures are reported per
+        item instead of aborting the batch. ``resolve_system_data``, when given,
+        supplies each item's expected record from its extracted fields.
+        """
+
+        plans: Dict[str, Union[ExecutionPlan, Exception]] = {}
+        for template_name in {item.template_id or settings.templates.default_template for item in items}:
+            try:
+                plans[template_name] = self._resolve_plan(template_name)
+            except Exception as exc:
+                plans[template_name] = exc
+
+        if window is None:
+            window = self.executor.process_workers * 2 if self.executor.use_processes else self.executor.thread_workers
+        window = max(1, min(window, self.executor.max_queue_depth))
+        pending: Deque[_PendingItem] = deque()
+        next_index = 0
+        try:
+            while next_index < len(items) or pending:
+                while next_index < len(items) and len(pending) < window:
+                    pending.append(self._start_item(next_index, items[next_index], plans))
+                    next_index += 1
+                if ordered:
+                    yield self._finish_item(pending.popleft(), resolve_system_data)
+                    continue
+                done, _ = wait([entry.future for entry in pending], return_when=FIRST_COMPLETED)
+                for entry in [entry for entry in pending if entry.future in done]:
+                    pending.remove(entry)
+                    yield self._finish_item(entry, resolve_system_data)
+        finally:
+            for entry in pending:
+                entry.future.cancel()
+
+    def compare_batch(self, items: Sequence[BatchItem]) -> List[BatchItemResult]:
+        """Compare many documents; results are returned in input order."""
+
+        return list(self.iter_compare_batch(items))
+
+    def compare(
+        self,
+        template_id: Optional[str],
+        system_data: Dict[str, str],
+        document_path: Optional[Path] = None,
+        document_text: Optional[str] = None,
+        offload: bool = False,
+        document_digest: Optional[str] = None,
+        fail_fast: Optional[bool] = None,
+    ) -> ComparisonReport:
+        """Compare a document with ``system_data``.
+
+        Without ``template_id`` the template is detected from the document's
+        keywords (``settings.templates.auto_detect``), for paged documents
+        from their first pages. With ``offload`` parsing runs on the worker
+        processes while the calling thread waits. ``document_digest``, the
+        SHA-256 of ``document_path`` when known, is used for the cache lookup.
+        ``fail_fast`` overrides the template's setting: once a required field
+        fails, the remaining fields (and pages) are skipped.
+        """
+
+        return self._compare(
+            template_id, system_data, document_path, document_text, offload, document_digest, fail_fast
+        )
+
+    def recompare(
+        self,
+        template_id: Optional[str],
+        system_data: Dict[str, str],
+        document_path: Optional[Path] = None,
+        document_text: Optional[str] = None,
+        offload: bool = False,
+        document_digest: Optional[str] = None,
+    ) -> ComparisonReport:
+        """Compare a document compared before against new ``system_data``.
+
+        The extractions and normalized values stored by the earlier
+        comparison are reused, so only the comparators run; fields whose
+        extraction config changed in the template since are extracted again.
+        The document is identified by ``document_digest``
+        (``ComparisonReport.document_digest``) or by its path or text. Without
+        ``template_id`` the template used last for the document applies. Falls
+        back to :meth:`compare` when nothing was stored and the document is
+        given; raises ``LookupError`` otherwise.
+        """
+
+        return self._recompare(template_id, system_data, document_path, document_text, offload, document_digest)
+
+    async def recompare_async(
+        self,
+        template_id: Optional[str],
+        system_data: Dict[str, str],
+        document_path: Optional[Path] = None,
+        document_text: Optional[str] = None,
+        document_digest: Optional[str] = None,
+    ) -> ComparisonReport:
+        """Like :meth:`recompare`, but runs on the executor pools."""
+
+        return await self.executor.run_io(
+            self._recompare, template_id, system_data, document_path, document_text, True, document_digest
+        )
+
+    async def compare_async(
+        self,
+        template_id: Optional[str],
+        system_data: Dict[str, str],
+        document_path: Optional[Path] = None,
+        document_text: Optional[str] = None,
+        document_digest: Optional[str] = None,
+        fail_fast: Optional[bool] = None,
+    ) -> ComparisonReport:
+        """Like :meth:`compare`, but runs on the executor pools.
+
+        The request is driven from a pool thread; parsing and OCR are handed
+        to the worker processes.
+        """
+
+        return await self.executor.run_io(
+            self._compare, template_id, system_data, document_path, document_text, True, document_digest, fail_fast
         )
 
 
@@ -0,0 +1,238 @@
+"""String similarity metrics used by the fuzzy comparator.
+
+Every metric takes two strings and an optional ``threshold`` and returns a
+similarity in ``[0, 1]``. When the threshold cannot be reached the metric may
+stop early; the value returned is then an upper bound that is still below the
+threshold, so ``score >= threshold`` decisions are exact.
+"""
+from __future__ import annotations
+
+import re
+from bisect import bisect_left
+from difflib import SequenceMatcher
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+Metric = Callable[..., float]
+
+_TOKEN_PATTERN = re.compile(r"[^\s,，、;；/|]+")
+
+
+def _max_distance(longest: int, threshold: float) -> int:
+    return int((1.0 - threshold) * longest + 1e-9)
+
+
+def _pattern_masks(text: str) -> Dict[str, int]:
+    masks: Dict[str, int] = {}
+    bit = 1
+    for char in text:
+        masks[char] = masks.get(char, 0) | bit
+        bit <<= 1
+    return masks
+
+
+def levenshtein_distance(a: str, b: str, max_distance: Optional[int] = None, masks: Optional[Dict[str, int]] = None) -> int:
+    """Edit distance using Myers' bit-parallel algorithm, one pass over ``b``.
+
+    With ``max_distance`` the scan stops as soon as the final distance is
+    known to exceed it, and ``max_distance + 1`` is returned.
+    """
+
+    if len(a) < len(b) and masks is None:
+        a, b = b, a
+    m, n = len(a), len(b)
+    if max_distance is not None and abs(m - n) > max_distance:
+        return max_distance + 1
+    if m == 0 or n == 0:
+        return max(m, n)
+    if masks is None:
+        masks = _pattern_masks(a)
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    vp, vn, score = full, 0, m
+    for position, char in enumerate(b, 1):
+        eq = masks.get(char, 0)
+        xv = eq | vn
+        xh = (((eq & vp) + vp) ^ vp) | eq
+        ph = vn | (~(xh | vp) & full)
+        mh = vp & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        if max_distance is not None and score - (n - position) > max_distance:
+            return max_distance + 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        vp = mh | (~(xv | ph) & full)
+        vn = ph & xv
+    return score
+
+
+def damerau_distance(a: str, b: str, max_distance: Optional[int] = None) -> int:
+    """Optimal string alignment distance (adjacent transpositions cost 1).
+
+    Hyyrö's bit-parallel extension of Myers' algorithm, with the same early
+    exit as :func:`levenshtein_distance`.
+    """
+
+    if len(a) < len(b):
+        a, b = b, a
+    m, n = len(a), len(b)
+    if max_distance is not None and abs(m - n) > max_distance:
+        return max_distance + 1
+    if m == 0 or n == 0:
+        return max(m, n)
+    masks = _pattern_masks(a)
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    vp, vn, score = full, 0, m
+    d0, previous_eq = 0, 0
+    for position, char in enumerate(b, 1):
+        eq = masks.get(char, 0)
+        transposed = (((~d0 & eq) << 1) & previous_eq) & full
+        d0 = ((((eq & vp) + vp) ^ vp) | eq | vn | transposed) & full
+        hp = vn | (~(d0 | vp) & full)
+        hn = d0 & vp
+        if hp & last:
+            score += 1
+        elif hn & last:
+            score -= 1
+        if max_distance is not None and score - (n - position) > max_distance:
+            return max_distance + 1
+        hp = ((hp << 1) | 1) & full
+        hn = (hn << 1) & full
+        vp = hn | (~(d0 | hp) & full)
+        vn = hp & d0
+        previous_eq = eq
+    return score
+
+
+def _distance_similarity(distance_func: Callable[..., int], a: str, b: str, threshold: float) -> float:
+    longest = max(len(a), len(b))
+    if longest == 0:
+        return 1.0
+    bound = _max_distance(longest, threshold) if threshold > 0 else None
+    return 1.0 - distance_func(a, b, bound) / longest
+
+
+def levenshtein(a: str, b: str, threshold: float = 0.0) -> float:
+    return _distance_similarity(levenshtein_distance, a, b, threshold)
+
+
+def damerau(a: str, b: str, threshold: float = 0.0) -> float:
+    return _distance_similarity(damerau_distance, a, b, threshold)
+
+
+def jaro_winkler(a: str, b: str, threshold: float = 0.0, prefix_weight: float = 0.1) -> float:
+    if a == b:
+        return 1.0
+    len_a, len_b = len(a), len(b)
+    if not len_a or not len_b:
+        return 0.0
+    shorter = min(len_a, len_b)
+    # best case: every character of the shorter string matches, common prefix of 4
+    upper = (shorter / len_a + shorter / len_b + 1.0) / 3.0
+    upper += min(4, shorter) * prefix_weight * (1.0 - upper)
+    if upper < threshold:
+        return upper
+
+    window = max(0, max(len_a, len_b) // 2 - 1)
+    positions: Dict[str, List[int]] = {}
+    for j, char in enumerate(b):
+        positions.setdefault(char, []).append(j)
+    matched_b = [False] * len_b
+    matches_a = []
+    for i, char in enumerate(a):
+        candidates = positions.get(char)
+        if not candidates:
+            continue
+        start = bisect_left(candidates, i - window)
+        for j in candidates[start:]:
+            if j > i + window:
+                break
+            if not matched_b[j]:
+                matched_b[j] = True
+                matches_a.append(char)
+                break
+    matches = len(matches_a)
+    if not matches:
+        return 0.0
+    matches_b = [b[j] for j in range(len_b) if matched_b[j]]
+    transpositions = sum(x != y for x, y in zip(matches_a, matches_b)) // 2
+    jaro = (matches / len_a + matches / len_b + (matches - transpositions) / matches) / 3.0
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * prefix_weight * (1.0 - jaro)
+
+
+def token_set(a: str, b: str, threshold: float = 0.0) -> float:
+    """Order-insensitive similarity of the token sets (tokens split on spaces and punctuation)."""
+
+    tokens_a = set(_TOKEN_PATTERN.findall(a))
+    tokens_b = set(_TOKEN_PATTERN.findall(b))
+    if not tokens_a and not tokens_b:
+        return 1.0
+    common = " ".join(sorted(tokens_a & tokens_b))
+    only_a = " ".join(sorted(tokens_a - tokens_b))
+    only_b = " ".join(sorted(tokens_b - tokens_a))
+    with_a = f"{common} {only_a}".strip()
+    with_b = f"{common} {only_b}".strip()
+    if common and (not only_a or not only_b):
+        return 1.0
+    return max(
+        levenshtein(common, with_a) if common else 0.0,
+        levenshtein(common, with_b) if common else 0.0,
+        levenshtein(with_a, with_b, threshold),
+    )
+
+
+def sequence_matcher(a: str, b: str, threshold: float = 0.0) -> float:
+    """The original ``difflib`` ratio, kept for templates tuned against it."""
+
+    return SequenceMatcher(None, a, b).ratio()
+
+
+METRICS: Dict[str, Metric] = {
+    "levenshtein": levenshtein,
+    "damerau": damerau,
+    "jaro_winkler": jaro_winkler,
+    "token_set": token_set,
+    "sequence_matcher": sequence_matcher,
+}
+
+
+def get_metric(name: str) -> Metric:
+    if name not in METRICS:
+        raise KeyError(f"Unsupported similarity metric '{name}'")
+    return METRICS[name]
+
+
+def score_pairs(pairs: Iterable[Tuple[str, str]], metric: str = "levenshtein", threshold: float = 0.0) -> List[float]:
+    """Score many ``(expected, actual)`` pairs with one metric.
+
+    Levenshtein reuses the bit masks of repeated expected values, which is
+    the common case when one system value is compared with many documents.
+    """
+
+    if metric != "levenshtein":
+        func = get_metric(metric)
+        return [func(a, b, threshold) for a, b in pairs]
+    scores = []
+    masks_by_text: Dict[str, Dict[str, int]] = {}
+    for a, b in pairs:
+        if len(a) < len(b):
+            scores.append(levenshtein(a, b, threshold))
+            continue
+        longest = len(a)
+        if longest == 0:
+            scores.append(1.0)
+            continue
+        masks = masks_by_text.get(a)
+        if masks is None:
+            masks = masks_by_text[a] = _pattern_masks(a)
+        bound = _max_distance(longest, threshold) if threshold > 0 else None
+        scores.append(1.0 - levenshtein_distance(a, b, bound, masks) / longest)
+    return scores
@@ -0,0 +1,219 @@
+"""Streaming handling of uploaded documents.
+
+A multipart request body is parsed as it arrives. The document part is
+hashed while it is written, kept in memory while small and spilled to a
+temporary file once it grows past ``settings.uploads.spool_bytes``, so a
+request holds at most one spool buffer regardless of the document size.
+The digest doubles as the parse cache key, so the parser never has to
+re-read the file to look it up.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+from datacomparison.config import UploadConfig, settings
+from datacomparison.utils.optional import OptionalModules
+
+# optional dependency for multipart uploads, imported on the first upload;
+# older releases use the "multipart" package name
+_optional = OptionalModules(
+    globals(),
+    {"python_multipart": "python_multipart.multipart", "legacy_multipart": "multipart.multipart"},
+)
+__getattr__ = _optional.module_getattr
+
+
+def _multipart() -> Any:
+    module = _optional.get("python_multipart") or _optional.get("legacy_multipart")
+    if module is None:
+        raise RuntimeError("python-multipart is required for uploads but is not installed")
+    return module
+
+
+class UploadTooLargeError(ValueError):
+    """The upload or one of its form fields exceeds the configured limit."""
+
+
+class SpooledUpload:
+    """An uploaded file, hashed as it is written and spilled to disk when large."""
+
+    def __init__(self, filename: str, config: UploadConfig = settings.uploads) -> None:
+        self.filename = filename
+        self.size = 0
+        self._config = config
+        self._hash = hashlib.sha256()
+        self._buffer = bytearray()
+        self._file: Optional[Any] = None
+        self._path: Optional[Path] = None
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self._config.max_bytes:
+            raise UploadTooLargeError(f"上传文件超过 {self._config.max_bytes} 字节上限")
+        self._hash.update(data)
+        if self._file is not None:
+            self._file.write(data)
+            return
+        self._buffer += data
+        if len(self._buffer) > self._config.spool_bytes:
+            self._spill()
+
+    def _spill(self) -> None:
+        directory = self._config.directory
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+        # keep the suffix: parsers are chosen by file extension
+        self._file = tempfile.NamedTemporaryFile(
+            prefix="upload-", suffix=Path(self.filename).suffix.lower(), dir=directory, delete=False
+        )
+        self._path = Path(self._file.name)
+        self._file.write(self._buffer)
+        self._buffer = bytearray()
+
+    @property
+    def in_memory(self) -> bool:
+        return self._file is None
+
+    @property
+    def digest(self) -> str:
+        """Hex SHA-256 of everything written so far."""
+
+        return self._hash.hexdigest()
+
+    def materialize(self) -> Path:
+        """Close the upload for writing and return the path of its contents."""
+
+        if self._file is None:
+            self._spill()
+        if not self._file.closed:
+            self._file.close()
+        return self._path  # type: ignore[return-value]
+
+    def close(self) -> None:
+        """Release the buffer and delete the temporary file, if any."""
+
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        if self._path is not None:
+            try:
+                os.unlink(self._path)
+            except FileNotFoundError:
+                pass
+        self._buffer = bytearray()
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+@dataclass
+class UploadForm:
+    fields: Dict[str, str] = field(default_factory=dict)
+    upload: Optional[SpooledUpload] = None
+
+    def close(self) -> None:
+        if self.upload is not None:
+            self.upload.close()
+
+
+class _FormBuilder:
+    """Callbacks for ``MultipartParser`` collecting text fields and one file part."""
+
+    def __init__(self, config: UploadConfig) -> None:
+        self.config = config
+        self.form = UploadForm()
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._headers: Dict[bytes, bytes] = {}
+        self._name = ""
+        self._value: Optional[bytearray] = None
+        self._upload: Optional[SpooledUpload] = None
+
+    def callbacks(self) -> Dict[str, Any]:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+
+    def on_headers_finished(self) -> None:
+        _disposition, options = _multipart().parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("utf-8")
+        filename = options.get(b"filename")
+        if filename is None:
+            self._value = bytearray()
+            return
+        if self.form.upload is not None:
+            raise ValueError("只能上传一个文件")
+        self._upload = self.form.upload = SpooledUpload(Path(filename.decode("utf-8")).name, self.config)
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._upload is not None:
+            self._upload.write(data[start:end])
+            return
+        self._value += data[start:end]  # type: ignore[operator]
+        if len(self._value) > self.config.max_field_bytes:  # type: ignore[arg-type]
+            raise UploadTooLargeError(f"表单字段 {self._name} 超过 {self.config.max_field_bytes} 字节上限")
+
+    def on_part_end(self) -> None:
+        if self._value is not None:
+            self.form.fields[self._name] = self._value.decode("utf-8")
+        self._value = None
+        self._upload = None
+
+
+async def read_multipart(
+    chunks: AsyncIterator[bytes],
+    content_type: str,
+    config: UploadConfig = settings.uploads,
+) -> UploadForm:
+    """Parse a ``multipart/form-data`` body chunk by chunk.
+
+    Text parts become ``fields``; the single file part is spooled into
+    ``upload``. Raises :class:`UploadTooLargeError` as soon as a limit is
+    exceeded and ``ValueError`` for malformed bodies; the partial upload is
+    cleaned up in both cases.
+    """
+
+    multipart = _multipart()
+    media_type, options = multipart.parse_options_header(content_type)
+    boundary = options.get(b"boundary")
+    if media_type != b"multipart/form-data" or not boundary:
+        raise ValueError("请求须为带 boundary 的 multipart/form-data")
+    builder = _FormBuilder(config)
+    parser = multipart.MultipartParser(boundary, builder.callbacks())
+    try:
+        async for chunk in chunks:
+            if chunk:
+                parser.write(chunk)
+        parser.finalize()
+    except BaseException:
+        builder.form.close()
+        raise
+    return builder.form
+
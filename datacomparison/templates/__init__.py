@@ -1,8 +1,13 @@
 """Template loading utilities for document field extraction."""
 from __future__ import annotations
 
+import hashlib
 import importlib
 import json
+import logging
+import os
+import threading
+import time
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, Callable, Dict, Iterable, List, Optional
@@ -13,6 +18,12 @@ except Exception:  # pragma: no cover
     yaml = None
 
 from datacomparison.config import settings
+from datacomparison.services.classifier import TemplateClassifier
+from datacomparison.services.comparison import ComparatorRegistry
+from datacomparison.services.extraction import ExtractorRegistry
+from datacomparison.services.plan import ExecutionPlan, compile_plan
+
+LOGGER = logging.getLogger(__name__)
 
 
 @dataclass
@@ -25,6 +36,10 @@ class FieldTemplate:
     comparison: Dict[str, Any] = None
     normalizers: List[Callable[[Optional[str]], Optional[str]]] = field(default_factory=list)
     normalizer_names: List[str] = field(default_factory=list)
+    # optional page area OCR'd on its own for this field, see OcrRegion.from_config
+    region: Optional[Dict[str, Any]] = None
+    # fields with a higher priority are evaluated first in fail-fast mode
+    priority: int = 0
 
 
 @dataclass
@@ -34,20 +49,53 @@ class Template:
     template_id: str
     description: str
     fields: Dict[str, FieldTemplate]
+    extraction_mode: str = "per_field"
+    # skip the remaining fields once a required field fails
+    fail_fast: bool = False
+    # image preprocessing before OCR, see ImagePreprocessing.from_config
+    preprocessing: Dict[str, Any] = field(default_factory=dict)
+    # anchor keywords for template detection, with their weights
+    keywords: Dict[str, float] = field(default_factory=dict)
+    # digest of the template file; changes whenever the definition does
+    version: str = ""
+    plan: Optional[ExecutionPlan] = field(default=None, repr=False, compare=False)
+
+
+# probed in this order when several files share a template id
+_EXTENSIONS = (".yaml", ".yml", ".json")
+
+
+@dataclass(frozen=True)
+class _TemplateFile:
+    path: Path
+    mtime_ns: int
+    size: int
 
 
 class TemplateRegistry:
-    """Loads template definitions from YAML files."""
+    """Loads template definitions from YAML or JSON files.
+
+    The template directory is indexed once; :meth:`refresh` (called
+    periodically by :class:`TemplateWatcher`) rescans file modification
+    times, recompiles the loaded templates whose files changed and swaps
+    them in. Readers never take a lock: the cache is replaced as a whole.
+    """
 
-    def __init__(self, base_path: Optional[Path] = None) -> None:
+    def __init__(
+        self,
+        base_path: Optional[Path] = None,
+        extractor_registry: Optional[ExtractorRegistry] = None,
+        comparator_registry: Optional[ComparatorRegistry] = None,
+    ) -> None:
         self._base_path = base_path or settings.template_directory
         self._cache: Dict[str, Template] = {}
-
-    def _load_yaml(self, template_file: Path) -> Dict[str, Any]:
-        if yaml is None:
-            raise RuntimeError("Loading YAML templates requires the optional dependency PyYAML")
-        with template_file.open("r", encoding="utf-8") as stream:
-            return yaml.safe_load(stream)
+        self._index: Optional[Dict[str, _TemplateFile]] = None
+        self._lock = threading.RLock()
+        self._extractor_registry = extractor_registry
+        self._comparator_registry = comparator_registry
+        self._classifier: Optional[TemplateClassifier] = None
+        # monotonic time of the last directory scan
+        self._scanned_at = 0.0
 
     def _resolve_normalizers(self, normalizer_names: Iterable[str]):
         resolved = []
@@ -60,24 +108,125 @@ class TemplateRegistry:
             resolved.append(getattr(module, func_name))
         return resolved
 
+    def _compile(self, template: Template) -> ExecutionPlan:
+        return compile_plan(template, self._extractor_registry, self._comparator_registry)
+
+    def _scan(self) -> Dict[str, _TemplateFile]:
+        index: Dict[str, _TemplateFile] = {}
+        with os.scandir(self._base_path) as entries:
+            for entry in entries:
+                stem, extension = os.path.splitext(entry.name)
+                if extension not in _EXTENSIONS or not entry.is_file():
+                    continue
+                current = index.get(stem)
+                if current is not None and _EXTENSIONS.index(current.path.suffix) <= _EXTENSIONS.index(extension):
+                    continue
+                stat = entry.stat()
+                index[stem] = _TemplateFile(Path(entry.path), stat.st_mtime_ns, stat.st_size)
+        return index
+
+    def _files(self) -> Dict[str, _TemplateFile]:
+        index = self._index
+        if index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._scan()
+                    self._scanned_at = time.monotonic()
+                index = self._index
+        return index
+
+    def template_ids(self) -> List[str]:
+        """Ids of every template file in the template directory."""
+
+        return sorted(self._files())
+
+    def classifier(self) -> TemplateClassifier:
+        """Keyword classifier over every template, rebuilt after templates change."""
+
+        classifier = self._classifier
+        if classifier is None:
+            keywords: Dict[str, Dict[str, float]] = {}
+            for template_id in self.template_ids():
+                try:
+                    keywords[template_id] = self.load(template_id).keywords
+                except Exception:
+                    # a broken file must not disable detection of the others
+                    LOGGER.exception("Loading template %s failed; it is left out of template detection", template_id)
+            classifier = TemplateClassifier(keywords)
+            self._classifier = classifier
+        return classifier
+
     def load(self, template_id: str) -> Template:
-        if template_id in self._cache:
-            return self._cache[template_id]
-
-        template_file = None
-        for extension in (".yaml", ".yml", ".json"):
-            candidate = self._base_path / f"{template_id}{extension}"
-            if candidate.exists():
-                template_file = candidate
-                break
+        template = self._cache.get(template_id)
+        if template is not None:
+            return template
+        template_file = self._files().get(template_id)
+        if template_file is None and self._may_rescan() and template_id in self.refresh():
+            # added since the last scan
+            template_file = self._files().get(template_id)
         if template_file is None:
             raise FileNotFoundError(f"Template '{template_id}' not found in {self._base_path}")
+        with self._lock:
+            template = self._cache.get(template_id)
+            if template is None:
+                template = self._read(template_id, template_file.path)
+                self._cache = {**self._cache, template_id: template}
+        return template
+
+    def _may_rescan(self) -> bool:
+        """Whether a lookup miss may rescan the directory; bounds the scans unknown ids cause."""
 
+        return time.monotonic() - self._scanned_at >= settings.templates.missing_rescan_seconds
+
+    def refresh(self) -> List[str]:
+        """Rescan the template directory and reload the templates that changed.
+
+        Templates loaded before are recompiled right away; a template whose
+        new definition fails to load keeps serving its previous version.
+        Returns the ids of the templates that were added, changed or removed.
+        """
+
+        with self._lock:
+            previous = self._files()
+            index = self._scan()
+            self._scanned_at = time.monotonic()
+            changed = sorted(
+                template_id
+                for template_id in set(previous) | set(index)
+                if previous.get(template_id) != index.get(template_id)
+            )
+            if not changed:
+                return []
+            cache = dict(self._cache)
+            for template_id in changed:
+                if template_id not in index:
+                    cache.pop(template_id, None)
+                    continue
+                if template_id not in cache:
+                    continue  # compiled on first use
+                try:
+                    template = self._read(template_id, index[template_id].path)
+                except Exception:
+                    LOGGER.exception("Reloading template %s failed; keeping version %s", template_id, cache[template_id].version)
+                    # retried on the next refresh
+                    index[template_id] = previous[template_id]
+                    continue
+                if template.version != cache[template_id].version:
+                    LOGGER.info("Reloaded template %s: version %s -> %s", template_id, cache[template_id].version, template.version)
+                cache[template_id] = template
+            self._index = index
+            self._cache = cache
+            self._classifier = None
+            return changed
+
+    def _read(self, template_id: str, template_file: Path) -> Template:
+        content = template_file.read_bytes()
         if template_file.suffix in {".yaml", ".yml"}:
-            data = self._load_yaml(template_file)
+            if yaml is None:
+                raise RuntimeError("Loading YAML templates requires the optional dependency PyYAML")
+            data = yaml.safe_load(content.decode("utf-8"))
         else:
-            with template_file.open("r", encoding="utf-8") as stream:
-                data = json.load(stream)
+            data = json.loads(content.decode("utf-8"))
         tpl_data = data.get("template", {})
         description = tpl_data.get("description", "")
         fields: Dict[str, FieldTemplate] = {}
@@ -91,11 +240,61 @@ class TemplateRegistry:
                 comparison=field.get("comparison", {"strategy": "exact"}),
                 normalizers=list(normalizers),
                 normalizer_names=normalizer_names,
+                region=field.get("region"),
+                priority=int(field.get("priority", 0)),
             )
 
-        template = Template(template_id=template_id, description=description, fields=fields)
-        self._cache[template_id] = template
+        template = Template(
+            template_id=template_id,
+            description=description,
+            fields=fields,
+            extraction_mode=tpl_data.get("extraction_mode", settings.extraction.mode),
+            fail_fast=bool(tpl_data.get("fail_fast", settings.extraction.fail_fast)),
+            preprocessing={**settings.parsing.preprocessing, **tpl_data.get("preprocessing", {})},
+            keywords=_keyword_weights(tpl_data.get("keywords", [])),
+            version=hashlib.sha256(content).hexdigest()[:12],
+        )
+        template.plan = self._compile(template)
         return template
 
 
+class TemplateWatcher:
+    """Background thread calling :meth:`TemplateRegistry.refresh` periodically.
+
+    Polling file modification times needs no OS-specific file watching API.
+    """
+
+    def __init__(self, registry: TemplateRegistry, interval: float = 2.0) -> None:
+        self.registry = registry
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="datacomparison-templates", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.registry.refresh()
+            except Exception:  # pragma: no cover - keep watching if the directory is briefly unavailable
+                LOGGER.exception("Template refresh failed")
+
+
+def _keyword_weights(keywords: Any) -> Dict[str, float]:
+    """Template ``keywords``: a list (all weighted 1) or a mapping of keyword to weight."""
+
+    if isinstance(keywords, dict):
+        return {str(keyword): float(weight) for keyword, weight in keywords.items()}
+    return {str(keyword): 1.0 for keyword in keywords}
+
+
 registry = TemplateRegistry()
@@ -1,53 +1,167 @@
-"""Normalization helpers used before comparison."""
+"""Normalization helpers used before comparison.
+
+Each normalizer recognises its input format with one precompiled pattern
+and builds the result from the matched components, so adding a format does
+not add another failed parse to every call. Results are memoized in a
+bounded LRU cache because the same values recur across documents.
+"""
 from __future__ import annotations
 
-from datetime import datetime
+import re
+from datetime import date
 from decimal import Decimal, InvalidOperation
-from typing import Optional
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional
 
+Normalizer = Callable[[Optional[str]], Optional[str]]
 
-def normalize_date(value: str) -> Optional[str]:
-    """Normalize date strings into ISO format (YYYY-MM-DD).
+_CACHE_SIZE = 8192
+# Decimal's default context precision; normalize() rounds longer values
+_DECIMAL_DIGITS = 28
 
-    Supports common separators (., /, -) and returns ``None`` when parsing fails.
-    """
+# full-width digits and punctuation as produced by OCR and Chinese input methods
+_FULL_WIDTH = str.maketrans("０１２３４５６７８９．，－／：＋　", "0123456789.,-/:+ ")
+
+# the compact month/day and the time fields accept what strptime's %m%d and
+# %H:%M:%S do, including single digits: 2024520, 202451, 2024-05-20 1:2:3
+_DATE_PATTERN = re.compile(
+    r"(?P<year>\d{4})(?:"
+    r"(?P<sep>[-/.])(?P<month>\d{1,2})(?P=sep)(?P<day>\d{1,2})"
+    r"(?:\s+(?:2[0-3]|[01]?\d):[0-5]?\d:[0-5]?\d)?"
+    r"|\s*年\s*(?P<cn_month>\d{1,2})\s*月\s*(?P<cn_day>\d{1,2})\s*日?"
+    r"|(?P<compact_month>1[0-2]|0[1-9]|[1-9])(?P<compact_day>3[01]|[12]\d|0[1-9]|[1-9])"
+    r")",
+    re.ASCII,
+)
+
+_PLAIN_NUMBER = re.compile(r"(?P<sign>[+-]?)(?P<whole>\d+)(?:\.(?P<fraction>\d+))?", re.ASCII)
+
+_CN_DIGITS = {
+    "零": 0, "〇": 0, "壹": 1, "一": 1, "贰": 2, "二": 2, "两": 2, "叁": 3, "三": 3, "肆": 4, "四": 4,
+    "伍": 5, "五": 5, "陆": 6, "六": 6, "柒": 7, "七": 7, "捌": 8, "八": 8, "玖": 9, "九": 9,
+}
+_CN_UNITS = {"拾": 10, "十": 10, "佰": 100, "百": 100, "仟": 1000, "千": 1000}
+_CN_SECTIONS = {"万": 10_000, "亿": 100_000_000}
+_CN_AMOUNT = re.compile(
+    r"(?:人民币)?(?P<integer>[零〇壹贰叁肆伍陆柒捌玖一二两三四五六七八九拾十佰百仟千万亿]*)"
+    r"[元圆]?(?P<jiao>[零〇壹贰叁肆伍陆柒捌玖一二两三四五六七八九]角)?"
+    r"(?P<fen>[零〇壹贰叁肆伍陆柒捌玖一二两三四五六七八九]分)?[整正]?"
+)
 
-    if value is None:
-        return None
 
-    value = value.strip()
-    if not value:
+def _prepare(value: Optional[str]) -> Optional[str]:
+    if value is None:
         return None
+    value = value.translate(_FULL_WIDTH).strip()
+    return value or None
 
-    # try multiple formats
-    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d", "%Y%m%d", "%Y-%m-%d %H:%M:%S"):
-        try:
-            parsed = datetime.strptime(value, fmt)
-            return parsed.date().isoformat()
-        except ValueError:
-            continue
 
-    # handle formats like YYYY年MM月DD日
+@lru_cache(maxsize=_CACHE_SIZE)
+def _normalize_date(value: str) -> Optional[str]:
+    match = _DATE_PATTERN.fullmatch(value)
+    if match is None:
+        return None
+    groups = match.groupdict()
+    month = groups["month"] or groups["cn_month"] or groups["compact_month"]
+    day = groups["day"] or groups["cn_day"] or groups["compact_day"]
     try:
-        clean = value.replace("年", "-").replace("月", "-").replace("日", "")
-        parsed = datetime.strptime(clean, "%Y-%m-%d")
-        return parsed.date().isoformat()
+        return date(int(groups["year"]), int(month), int(day)).isoformat()
     except ValueError:
         return None
 
 
-def normalize_numeric(value: str) -> Optional[str]:
-    """Normalize numeric strings by removing separators and standardizing decimals."""
+def normalize_date(value: Optional[str]) -> Optional[str]:
+    """Normalize date strings into ISO format (YYYY-MM-DD).
 
-    if value is None:
-        return None
+    Accepts ``-``, ``/`` and ``.`` separators (optionally followed by a
+    time), ``YYYYMMDD`` (also with single-digit parts, as ``%Y%m%d``
+    parses them) and ``YYYY年M月D日``, with half- or full-width digits.
+    Returns ``None`` when the value is not a valid date.
+    """
+
+    value = _prepare(value)
+    return _normalize_date(value) if value is not None else None
 
-    value = value.strip().replace(",", "")
-    if not value:
+
+def _cn_integer(text: str) -> Optional[int]:
+    total = section = number = 0
+    pending_digit = False
+    for char in text:
+        if char in _CN_DIGITS:
+            if pending_digit and number:
+                return None  # digits without a unit between them, e.g. 一二
+            number = _CN_DIGITS[char]
+            pending_digit = True
+        elif char in _CN_UNITS:
+            # a bare 拾 at the start reads as 一拾
+            section += (number if pending_digit else 1) * _CN_UNITS[char]
+            number, pending_digit = 0, False
+        elif char == "万":
+            section = (section + number) * _CN_SECTIONS[char]
+            total, section, number, pending_digit = total + section, 0, 0, False
+        else:  # 亿
+            total = (total + section + number) * _CN_SECTIONS[char]
+            section, number, pending_digit = 0, 0, False
+    return total + section + number
+
+
+def _cn_amount(value: str) -> Optional[str]:
+    """``壹拾万元整`` -> ``100000``; ``人民币叁佰元肆角伍分`` -> ``300.45``."""
+
+    match = _CN_AMOUNT.fullmatch(value)
+    if match is None or not any(match.groups()):
         return None
+    integer = _cn_integer(match.group("integer")) if match.group("integer") else 0
+    if integer is None:
+        return None
+    cents = integer * 100
+    if match.group("jiao"):
+        cents += _CN_DIGITS[match.group("jiao")[0]] * 10
+    if match.group("fen"):
+        cents += _CN_DIGITS[match.group("fen")[0]]
+    whole, fraction = divmod(cents, 100)
+    return f"{whole}.{fraction:02d}".rstrip("0").rstrip(".") if fraction else str(whole)
+
 
+@lru_cache(maxsize=_CACHE_SIZE)
+def _normalize_numeric(value: str) -> Optional[str]:
+    value = value.replace(",", "")
+    match = _PLAIN_NUMBER.fullmatch(value)
+    if match is not None:
+        whole = match.group("whole").lstrip("0")
+        fraction = (match.group("fraction") or "").rstrip("0")
+        if len(whole) + len(fraction) <= _DECIMAL_DIGITS:
+            sign = "-" if match.group("sign") == "-" else ""
+            number = f"{whole or '0'}.{fraction}" if fraction else whole or "0"
+            return sign + number
+    elif not value[:1].isascii():
+        amount = _cn_amount(value)
+        if amount is not None:
+            return amount
     try:
-        number = Decimal(value)
-        return format(number.normalize(), "f")
+        return format(Decimal(value).normalize(), "f")
     except (InvalidOperation, ValueError):
         return None
+
+
+def normalize_numeric(value: Optional[str]) -> Optional[str]:
+    """Normalize numeric strings by removing separators and standardizing decimals.
+
+    Also reads full-width digits and Chinese uppercase amounts such as
+    ``壹拾万元整``.
+    """
+
+    value = _prepare(value)
+    return _normalize_numeric(value) if value is not None else None
+
+
+def normalize_batch(normalizer: Normalizer, values: Iterable[Optional[str]]) -> List[Optional[str]]:
+    """Apply ``normalizer`` to many values, computing each distinct value once."""
+
+    seen: Dict[Optional[str], Optional[str]] = {}
+    results = []
+    for value in values:
+        if value not in seen:
+            seen[value] = normalizer(value)
+        results.append(seen[value])
+    return results
@@ -0,0 +1,47 @@
+"""Optional third-party dependencies imported on first use.
+
+Parser backends (Pillow, pdfplumber, python-docx, pytesseract) are slow to
+import, and a worker serving only text comparisons never needs them, so
+modules bind them lazily instead of at import time.
+"""
+from __future__ import annotations
+
+import importlib
+from types import ModuleType
+from typing import Any, Dict, Mapping, Optional
+
+_NOT_LOADED = object()
+
+
+def import_optional(name: str) -> Optional[ModuleType]:
+    """Import module ``name``; ``None`` if it (or one of its dependencies) is unavailable."""
+
+    try:
+        return importlib.import_module(name)
+    except Exception:
+        return None
+
+
+class OptionalModules:
+    """Module attributes bound to optional dependencies when first used.
+
+    ``namespace`` is the owning module's ``globals()``. A value already
+    stored there wins, so ``monkeypatch.setattr(module, "pytesseract", ...)``
+    keeps working. Assign ``__getattr__ = modules.module_getattr`` in the
+    owning module to expose the attributes to other modules as well.
+    """
+
+    def __init__(self, namespace: Dict[str, Any], modules: Mapping[str, str]) -> None:
+        self._namespace = namespace
+        self._modules = dict(modules)
+
+    def get(self, name: str) -> Any:
+        value = self._namespace.get(name, _NOT_LOADED)
+        if value is _NOT_LOADED:
+            value = self._namespace[name] = import_optional(self._modules[name])
+        return value
+
+    def module_getattr(self, name: str) -> Any:
+        if name in self._modules:
+            return self.get(name)
+        raise AttributeError(f"module {self._namespace['__name__']!r} has no attribute {name!r}")
@@ -0,0 +1,22 @@
+"""Streaming readers for system-of-record extracts."""
+from __future__ import annotations
+
+import csv
+import json
+from pathlib import Path
+from typing import Dict, Iterator
+
+
+def read_records(source: Path) -> Iterator[Dict[str, str]]:
+    """Yield the rows of a CSV or JSONL extract as string dictionaries."""
+
+    if source.suffix.lower() in (".jsonl", ".ndjson"):
+        with source.open("r", encoding="utf-8") as stream:
+            for line in stream:
+                if line.strip():
+                    yield {key: "" if value is None else str(value) for key, value in json.loads(line).items()}
+    elif source.suffix.lower() == ".csv":
+        with source.open("r", encoding="utf-8-sig", newline="") as stream:
+            yield from csv.DictReader(stream)
+    else:
+        raise ValueError(f"Unsupported system extract format '{source.suffix}', expected .csv or .jsonl")
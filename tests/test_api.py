@@ -30,3 +30,124 @@ def test_compare_endpoint_with_text():
     data = response.json()
     assert data["status"] == "pass"
     assert data["fields"]["customer_name"]["passed"] is True
+
+
+def test_compare_batch_endpoint():
+    client = TestClient(app)
+    item = {
+        "template_id": "promise_letter",
+        "system_data": {"customer_name": "张三"},
+        "document_text": "姓名：张三",
+    }
+    response = client.post("/compare/batch", json={"items": [item, dict(item, template_id="missing")]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["result"]["fields"]["customer_name"]["passed"] is True
+    assert results[1]["error"]
+
+
+def test_compare_batch_stream_endpoint():
+    import json
+
+    client = TestClient(app)
+    item = {
+        "template_id": "promise_letter",
+        "system_data": {"customer_name": "张三"},
+        "document_text": "姓名：张三",
+    }
+    response = client.post("/compare/batch/stream", json={"items": [item] * 3})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    assert all(line["result"]["fields"]["customer_name"]["passed"] for line in lines)
+
+
+def test_compare_upload_endpoint():
+    import json
+
+    client = TestClient(app)
+    document = "承诺书\n姓名：张三\n身份证号：110101199001011234".encode("utf-8")
+    data = {
+        "template_id": "promise_letter",
+        "system_data": json.dumps({"customer_name": "张三", "id_number": "110101199001011234"}),
+    }
+    response = client.post("/compare/upload", data=data, files={"document": ("letter.txt", document)})
+    assert response.status_code == 200
+    assert response.json()["fields"]["customer_name"]["passed"] is True
+
+    response = client.post("/compare/upload", data={"system_data": "[]"}, files={"document": ("letter.txt", document)})
+    assert response.status_code == 400
+
+
+def test_metrics_endpoint_and_request_timings():
+    client = TestClient(app)
+    payload = {
+        "template_id": "promise_letter",
+        "system_data": {"customer_name": "张三"},
+        "document_text": "承诺书\n姓名：张三",
+        "include_timings": True,
+    }
+    data = client.post("/compare", json=payload).json()
+    assert "extraction" in data["timings"]
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "datacomparison_stage_seconds_bucket" in response.text
+    assert "datacomparison_parse_cache_events_total" in response.text
+
+
+def test_recompare_endpoint_reuses_earlier_comparison(monkeypatch):
+    from datacomparison.config import settings
+
+    monkeypatch.setattr(settings.cache, "store_extractions", True)
+    client = TestClient(app)
+    payload = {
+        "template_id": "promise_letter",
+        "system_data": {"customer_name": "李四"},
+        "document_text": "承诺书\n姓名：张三\n备注：recompare",
+    }
+    first = client.post("/compare", json=payload).json()
+    assert first["fields"]["customer_name"]["passed"] is False
+
+    response = client.post(
+        "/compare/recompare",
+        json={"system_data": {"customer_name": "张三"}, "document_digest": first["document_digest"]},
+    )
+    assert response.status_code == 200
+    assert response.json()["fields"]["customer_name"]["passed"] is True
+
+    missing = client.post("/compare/recompare", json={"system_data": {}, "document_digest": "0" * 64})
+    assert missing.status_code == 404
+
+
+def test_jobs_endpoint_is_disabled_by_default():
+    client = TestClient(app)
+    payload = {"system_data": {"customer_name": "张三"}, "document_text": "姓名：张三"}
+    assert client.post("/jobs", json=payload).status_code == 503
+
+
+def test_job_status_and_result_are_read_off_the_event_loop(tmp_path, monkeypatch):
+    from datacomparison import api
+    from datacomparison.config import settings
+    from datacomparison.services.jobs import JobStore
+
+    monkeypatch.setattr(settings.jobs, "enabled", True)
+    monkeypatch.setattr(api, "job_store", JobStore(tmp_path / "jobs.sqlite3"))
+    client = TestClient(app)
+    payload = {"system_data": {"customer_name": "张三"}, "document_text": "姓名：张三"}
+    job_id = client.post("/jobs", json=payload).json()["job_id"]
+
+    assert client.get(f"/jobs/{job_id}").json()["status"] == "queued"
+    assert client.get(f"/jobs/{job_id}/result").status_code == 409
+    assert client.get("/jobs/missing").status_code == 404
+
+
+def test_upload_with_malformed_content_length_is_rejected():
+    client = TestClient(app)
+    response = client.post(
+        "/compare/upload",
+        content=b"",
+        headers={"content-type": "multipart/form-data; boundary=x", "content-length": "abc"},
+    )
+    assert response.status_code == 400
@@ -0,0 +1,72 @@
+from datacomparison.services import cache as cache_module
+from datacomparison.services.cache import ParseCache
+from datacomparison.services.document_parser import ParsedDocument, ParserRegistry, parse_document
+
+
+class CountingParser:
+    version = "1"
+    cacheable = True
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def parse(self, path):
+        self.calls += 1
+        return ParsedDocument(text=path.read_text(encoding="utf-8"))
+
+
+def test_parse_document_hits_cache_by_content(tmp_path):
+    parser = CountingParser()
+    registry = ParserRegistry(parsers={".pdf": parser})
+    cache = ParseCache()
+    first = tmp_path / "a.pdf"
+    second = tmp_path / "b.pdf"
+    first.write_text("姓名：张三", encoding="utf-8")
+    second.write_text("姓名：张三", encoding="utf-8")
+
+    assert parse_document(first, registry, cache)["text"] == "姓名：张三"
+    assert parse_document(second, registry, cache)["text"] == "姓名：张三"
+
+    assert parser.calls == 1
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+
+def test_memory_tier_evicts_by_size_and_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    cache = ParseCache(memory_max_bytes=40, ttl_seconds=10)
+    cache.put("a", {"text": "a" * 20})
+    cache.put("b", {"text": "b" * 20})
+
+    assert cache.get("a") is None
+    assert cache.get("b") == {"text": "b" * 20}
+    assert cache.stats.evictions == 1
+
+    now[0] += 11
+    assert cache.get("b") is None
+    assert cache.stats.expirations == 1
+    assert cache.memory_bytes == 0
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    ParseCache(disk_path=path).put("key", {"text": "内容"})
+
+    reopened = ParseCache(disk_path=path)
+
+    assert reopened.get("key") == {"text": "内容"}
+    assert reopened.stats.disk_hits == 1
+
+
+def test_disk_hits_keep_their_creation_time(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    path = tmp_path / "cache.sqlite3"
+    ParseCache(disk_path=path, ttl_seconds=10).put("key", {"text": "内容"})
+
+    reopened = ParseCache(disk_path=path, ttl_seconds=10)
+    now[0] += 6
+    assert reopened.get("key") == {"text": "内容"}  # promoted to memory
+    now[0] += 6
+    assert reopened.get("key") is None
+    assert reopened.stats.expirations >= 1
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from datacomparison.services.candidates import NgramIndex
+from datacomparison.services.comparison import ComparatorRegistry, prepare_config
+from datacomparison.services.jobs import report_from_dict, report_to_dict
+from datacomparison.services.service import DocumentComparisonService
+from datacomparison.templates import TemplateRegistry
+
+
+def _index():
+    return NgramIndex.build([("1", "张三"), ("2", "张三丰"), ("3", "李四"), ("4", "王小明"), ("5", "")])
+
+
+def test_search_ranks_candidates_and_survives_save_load(tmp_path):
+    index = _index()
+    assert len(index) == 4
+
+    results = index.search("张三丰", top_k=2)
+    assert [candidate.record_id for candidate in results] == ["2", "1"]
+    assert results[0].score == 1.0
+    assert index.search("赵六", min_score=0.5) == []
+
+    path = tmp_path / "names.idx"
+    index.save(path)
+    loaded = NgramIndex.load(path)
+    assert loaded.search("王小名", top_k=1)[0].text == "王小明"
+
+
+def test_candidate_search_comparator_uses_registered_index():
+    registry = ComparatorRegistry()
+    comparator = registry.get("candidate_search")
+    comparator.register_index("customers", _index())
+    config = prepare_config(comparator, {"strategy": "candidate_search", "index": "customers", "threshold": 0.5})
+
+    outcome = comparator.compare("customer_name", "张三丰", "张三车", config)
+    assert outcome.passed
+    assert outcome.candidates[0].text in ("张三", "张三丰")
+    assert "张三丰" in outcome.message
+
+    outcome = comparator.compare("customer_name", "李四", "张三车", config)
+    assert not outcome.passed
+    assert outcome.score == 0.0
+
+
+def test_index_path_config_and_candidates_in_the_report(tmp_path):
+    path = tmp_path / "customers.idx"
+    _index().save(path)
+    assert path.read_bytes().startswith(b"NGIDX")
+    comparator = ComparatorRegistry().get("candidate_search")
+
+    # a raw config is prepared on first use
+    outcome = comparator.compare("customer_name", None, "王小名", {"index_path": str(path), "threshold": 0.3})
+    assert outcome.passed and outcome.candidates[0].record_id == "4"
+    with pytest.raises(ValueError):
+        comparator.compare("customer_name", None, "王小名", {"threshold": 0.3})
+
+    field = {
+        "name": "customer_name",
+        "extractor": {"strategy": "regex", "pattern": "姓名：(?P<value>\\S+)"},
+        "comparison": {"strategy": "candidate_search", "index_path": str(path), "threshold": 0.3},
+    }
+    (tmp_path / "lookup.json").write_text(json.dumps({"template": {"fields": [field]}}), encoding="utf-8")
+    service = DocumentComparisonService(template_registry=TemplateRegistry(base_path=tmp_path))
+    report = service.compare("lookup", {"customer_name": "4"}, document_text="姓名：王小名")
+
+    assert report.passed
+    assert [candidate.text for candidate in report.fields[0].candidates][:1] == ["王小明"]
+    restored = report_from_dict(report_to_dict(report))
+    assert restored.fields[0].candidates == report.fields[0].candidates
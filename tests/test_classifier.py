@@ -0,0 +1,85 @@
+import json
+
+from datacomparison.config import settings
+from datacomparison.services.classifier import KeywordAutomaton, TemplateClassifier
+from datacomparison.services.document_parser import DEFAULT_REGISTRY
+from datacomparison.services.service import DocumentComparisonService
+from datacomparison.templates import TemplateRegistry
+
+
+def test_automaton_reports_overlapping_keywords():
+    automaton = KeywordAutomaton(["he", "she", "his", "hers", "借款合同", "合同"])
+    text = "ushers 借款合同"
+
+    matches = {(end, automaton.keywords[index]) for end, index in automaton.iter_matches(text)}
+
+    assert matches == {(4, "he"), (4, "she"), (6, "hers"), (11, "合同"), (11, "借款合同")}
+    assert automaton.found("his") == [False, False, True, False, False, False]
+
+
+def test_classifier_ranks_templates_by_weighted_keyword_share():
+    classifier = TemplateClassifier(
+        {
+            "promise_letter": {"承诺书": 3, "承诺人": 1},
+            "loan_contract": ["借款合同", "借款人", "贷款人"],
+            "no_keywords": [],
+        }
+    )
+
+    match = classifier.classify("借款合同\n借款人：张三\n本人承诺按期还款")
+
+    assert len(classifier) == 2
+    assert (match.template_id, match.score, match.keywords) == ("loan_contract", 0.6667, ("借款人", "借款合同"))
+    assert classifier.classify("承诺人：张三", min_score=0.5) is None
+
+
+def test_service_detects_template_without_template_id(tmp_path, monkeypatch):
+    for template_id, keywords, label in (("loan", ["借款合同", "借款人"], "借款人"), ("lease", ["租赁合同", "承租人"], "承租人")):
+        field = {"name": "name", "extractor": {"strategy": "regex", "pattern": label + "：(?P<value>\\S+)"}}
+        template = {"template": {"keywords": keywords, "fields": [field]}}
+        (tmp_path / f"{template_id}.json").write_text(json.dumps(template, ensure_ascii=False), encoding="utf-8")
+    monkeypatch.setattr(settings.templates, "default_template", "loan")
+    service = DocumentComparisonService(template_registry=TemplateRegistry(base_path=tmp_path))
+
+    report = service.compare(None, {"name": "李四"}, document_text="房屋租赁合同\n承租人：李四")
+    fallback = service.compare(None, {"name": "李四"}, document_text="借款人：李四")
+
+    assert (report.template_id, report.template_score, report.status) == ("lease", 1.0, "pass")
+    assert (fallback.template_id, fallback.template_score) == ("loan", 0.5)
+
+
+def test_paged_documents_are_detected_from_their_first_page(tmp_path, monkeypatch):
+    field = {"name": "name", "required": True, "extractor": {"strategy": "regex", "pattern": "承租人：(?P<value>\\S+)"}}
+    template = {"template": {"keywords": ["租赁合同", "承租人"], "fields": [field]}}
+    (tmp_path / "lease.json").write_text(json.dumps(template, ensure_ascii=False), encoding="utf-8")
+
+    class PagedParser:
+        pages = ["房屋租赁合同", "承租人：李四", "附件"]
+
+        def __init__(self):
+            self.parsed = []
+
+        def page_count(self, path):
+            return len(self.pages)
+
+        def parse_page(self, path, index):
+            self.parsed.append(index)
+            return self.pages[index]
+
+        def iter_pages(self, path):
+            for index in range(len(self.pages)):
+                yield self.parse_page(path, index)
+
+        def parse(self, path):
+            raise AssertionError("detection should not parse the whole document")
+
+    parser = PagedParser()
+    monkeypatch.setitem(DEFAULT_REGISTRY.parsers, ".pdf", parser)
+    monkeypatch.setattr(settings.cache, "enabled", False)
+    service = DocumentComparisonService(template_registry=TemplateRegistry(base_path=tmp_path))
+
+    report = service.compare(None, {"name": "李四"}, document_path=tmp_path / "lease.pdf")
+
+    assert (report.template_id, report.status) == ("lease", "pass")
+    # the detection page is reused and reading stops once the required field matched
+    assert parser.parsed == [0, 1]
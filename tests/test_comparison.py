@@ -0,0 +1,44 @@
+import pytest
+
+from datacomparison.services import comparison
+from datacomparison.services.comparison import ComparatorRegistry, prepare_config
+
+AMOUNTS = ["100000.00", "99999.99", "0", "-12.5", "1e5", "abc", None, " 7 ", "0.0000001", "12.", "１２", "3"]
+
+
+def _columns(size):
+    expected = [AMOUNTS[i % len(AMOUNTS)] for i in range(size)]
+    actual = [AMOUNTS[(i * 7 + 3) % len(AMOUNTS)] if i % 3 else expected[i] for i in range(size)]
+    return expected, actual
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+@pytest.mark.parametrize("tolerance", ["0", "0.01", "1E+2"])
+def test_numeric_batch_matches_scalar(monkeypatch, use_numpy, tolerance):
+    if not use_numpy:
+        monkeypatch.setattr(comparison, "np", None)
+    registry = ComparatorRegistry()
+    expected, actual = _columns(200)
+
+    batch = registry.compare_batch("numeric", "amount", expected, actual, {"tolerance": tolerance})
+
+    comparator = registry.get("numeric")
+    config = prepare_config(comparator, {"tolerance": tolerance})
+    scalar = [comparator.compare("amount", e, a, config) for e, a in zip(expected, actual)]
+    assert list(batch) == scalar
+    assert batch.passed == [outcome.passed for outcome in scalar]
+    assert batch.failed() == [index for index, outcome in enumerate(scalar) if not outcome.passed]
+
+
+def test_equality_batches_and_column_lengths():
+    registry = ComparatorRegistry()
+    expected = ["2024-05-20", None, "2024-05-21"]
+    actual = ["2024-05-20", None, "2024-05-22"]
+    for strategy in ("date", "exact", "fuzzy"):
+        comparator = registry.get(strategy)
+        config = prepare_config(comparator, {})
+        scalar = [comparator.compare("signing_date", e, a, config) for e, a in zip(expected, actual)]
+        assert list(registry.compare_batch(strategy, "signing_date", expected, actual)) == scalar
+
+    with pytest.raises(ValueError):
+        registry.compare_batch("date", "signing_date", expected, actual[:2])
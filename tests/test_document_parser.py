@@ -0,0 +1,192 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from datacomparison.services import document_parser
+from datacomparison.services.document_parser import (
+    OCR_PRESETS,
+    OcrRegion,
+    ParsedDocument,
+    ParserRegistry,
+    iter_document_pages,
+)
+
+
+class FakePagedParser:
+    def __init__(self, pages):
+        self.pages = pages
+        self.parsed = []
+
+    def page_count(self, path):
+        return len(self.pages)
+
+    def parse_page(self, path, index):
+        self.parsed.append(index)
+        return self.pages[index]
+
+    def iter_pages(self, path):
+        for index in range(len(self.pages)):
+            yield self.parse_page(path, index)
+
+    def parse(self, path):
+        return ParsedDocument(text="\n".join(self.iter_pages(path)))
+
+
+def test_iter_document_pages_keeps_order_and_stops_early(tmp_path):
+    parser = FakePagedParser([f"page {index}" for index in range(20)])
+    registry = ParserRegistry(parsers={".pdf": parser})
+    path = tmp_path / "contract.pdf"
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        pages = iter_document_pages(path, registry, submit=pool.submit, window=3)
+        first = [next(pages) for _ in range(2)]
+        pages.close()
+
+    assert first == ["page 0", "page 1"]
+    assert len(parser.parsed) <= 5
+
+
+def test_iter_document_pages_sequential_without_submit(tmp_path):
+    parser = FakePagedParser(["a", "b"])
+    registry = ParserRegistry(parsers={".pdf": parser})
+
+    assert list(iter_document_pages(tmp_path / "x.pdf", registry)) == ["a", "b"]
+
+
+class FakeRoutedParser(FakePagedParser):
+    def parse_routed_page(self, path, index):
+        return self.parse_page(path, index), "ocr" if index % 2 else "text"
+
+    def iter_routed_pages(self, path):
+        for index in range(len(self.pages)):
+            yield self.parse_routed_page(path, index)
+
+
+def test_iter_document_pages_reports_page_routes(tmp_path):
+    registry = ParserRegistry(parsers={".pdf": FakeRoutedParser(["a", "b", "c"])})
+    sequential, parallel = [], []
+
+    assert list(iter_document_pages(tmp_path / "x.pdf", registry, routes=sequential)) == ["a", "b", "c"]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        pages = iter_document_pages(tmp_path / "x.pdf", registry, submit=pool.submit, window=2, routes=parallel)
+        assert list(pages) == ["a", "b", "c"]
+
+    assert sequential == parallel == ["text", "ocr", "text"]
+
+
+def test_ocr_region_from_config_resolves_presets_and_pixels():
+    region = OcrRegion.from_config("amount", {"box": [0.5, 0.25, 1.0, 0.5], "ocr": "amount"})
+
+    assert region.config == OCR_PRESETS["amount"]
+    assert region.pixel_box(1000, 800) == (500, 200, 1000, 400)
+    assert OcrRegion.from_config("id", {"box": [10, 20, 3000, 40], "units": "pixels"}).pixel_box(1000, 800) == (10, 20, 1000, 40)
+    with pytest.raises(ValueError):
+        OcrRegion.from_config("amount", {"box": [0.5, 0.25, 0.4, 0.5]})
+    with pytest.raises(ValueError):
+        OcrRegion.from_config("amount", {"box": [0, 0, 2, 1]})
+
+
+class FakePdfPage:
+    def __init__(self, page_number, text):
+        self.page_number = page_number
+        self.text = text
+        self.rasterized_at = None
+
+    def extract_text(self):
+        return self.text
+
+    def to_image(self, resolution):
+        self.rasterized_at = resolution
+        return SimpleNamespace(original=SimpleNamespace(info={}, page=self))
+
+
+def test_pdf_parser_ocrs_only_pages_without_text_layer(monkeypatch):
+    pages = [FakePdfPage(1, "承诺书 姓名：张三 身份证号：110101199001011234"), FakePdfPage(2, " 2 ")]
+    recognized = []
+
+    def image_to_string(image, config=""):
+        recognized.append((image.page.page_number, config))
+        return "金额：100,000.00"
+
+    monkeypatch.setattr(document_parser, "pytesseract", SimpleNamespace(image_to_string=image_to_string))
+    monkeypatch.setattr(document_parser, "Image", object())
+    parser = document_parser.PdfParser()
+    monkeypatch.setattr(parser, "_open", lambda path: nullcontext(SimpleNamespace(pages=pages)))
+
+    parsed = parser.parse(Path("contract.pdf"))
+
+    assert parsed["page_routes"] == "text,ocr"
+    assert parsed["text"].endswith("\n金额：100,000.00")
+    assert recognized == [(2, "--dpi 300")]
+    assert pages[0].rasterized_at is None
+
+
+def test_pdf_parser_opens_a_document_once_for_its_pages(monkeypatch, tmp_path):
+    document = tmp_path / "contract.pdf"
+    document.write_bytes(b"%PDF")
+    opened, closed = [], []
+    parser = document_parser.PdfParser()
+
+    def open_pdf(path):
+        opened.append(path)
+        pages = [FakePdfPage(index + 1, f"第{index + 1}页 承诺书 姓名：张三 身份证号：110101199001011234") for index in range(3)]
+        return SimpleNamespace(pages=pages, close=lambda: closed.append(path))
+
+    monkeypatch.setattr(parser, "_open", open_pdf)
+    monkeypatch.setattr(document_parser._open_pdfs, "current", None, raising=False)
+
+    texts = [parser.parse_routed_page(document, index) for index in range(2)]
+    assert opened == [document] and closed == []
+    texts.append(parser.parse_routed_page(document, 2))
+    assert [route for _text, route in texts] == ["text"] * 3
+    assert texts[2][0].startswith("第3页")
+    # closed once its last page is read
+    assert opened == [document] and closed == [document]
+
+    other = tmp_path / "other.pdf"
+    other.write_bytes(b"%PDF")
+    parser.parse_page(other, 0)
+    assert opened == [document, other] and closed == [document]
+    document_parser.release_open_pdf(document)
+    assert closed == [document]
+    # a document that stopped early is released by the thread's next parse
+    document_parser.release_open_pdf()
+    assert closed == [document, other]
+
+
+class PluginParser:
+    backends = ("datacomparison", "datacomparison_missing_backend")
+    created = 0
+
+    def __init__(self):
+        PluginParser.created += 1
+
+    def parse(self, path):
+        return ParsedDocument(text=path.name)
+
+
+def test_registry_creates_registered_parsers_on_first_use():
+    PluginParser.created = 0
+    registry = ParserRegistry()
+    registry.register(["odt", ".ODS"], PluginParser)
+    registry.register(".txt", "datacomparison.services.document_parser:TextParser")
+
+    assert PluginParser.created == 0
+    assert registry.suffixes() == [".ods", ".odt", ".txt"]
+    assert registry.for_path(Path("a.odt")) is registry.for_path(Path("b.ods"))
+    assert PluginParser.created == 1
+    assert type(registry.for_path(Path("c.txt"))).__name__ == "TextParser"
+    assert registry.preload() == ["datacomparison_missing_backend"]
+    with pytest.raises(ValueError):
+        registry.for_path(Path("d.rtf"))
+
+
+def test_backends_are_imported_on_first_access(monkeypatch):
+    monkeypatch.delitem(document_parser.__dict__, "pytesseract", raising=False)
+
+    assert "pytesseract" not in document_parser.__dict__
+    backend = document_parser.pytesseract
+    assert document_parser.__dict__["pytesseract"] is backend
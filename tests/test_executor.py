@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from datacomparison.config import WarmUpConfig
+from datacomparison.services.executor import ExecutorBusyError, TaskExecutor, TaskTimeoutError
+from datacomparison.services.service import DocumentComparisonService
+
+SYSTEM_DATA = {
+    "customer_name": "张三",
+    "id_number": "110101199001011234",
+    "amount": "100000.00",
+    "signing_date": "2024-05-20",
+}
+DOCUMENT_TEXT = "承诺书\n姓名：张三\n身份证号：110101199001011234\n金额：100,000.00\n日期：2024-05-20"
+
+
+def test_compare_async_parses_in_worker_process(tmp_path):
+    document = tmp_path / "letter.txt"
+    document.write_text(DOCUMENT_TEXT, encoding="utf-8")
+    executor = TaskExecutor(process_workers=1, max_tasks_per_worker=2, task_timeout_seconds=60)
+    service = DocumentComparisonService(executor=executor)
+
+    async def run_all():
+        return await asyncio.gather(
+            *(service.compare_async("promise_letter", SYSTEM_DATA, document_path=document) for _ in range(3))
+        )
+
+    try:
+        reports = asyncio.run(run_all())
+    finally:
+        executor.shutdown()
+
+    assert [report.status for report in reports] == ["pass"] * 3
+    assert executor.in_flight == 0
+
+
+def test_executor_rejects_when_queue_full_and_times_out():
+    executor = TaskExecutor(use_processes=False, thread_workers=1, max_queue_depth=1)
+    release = threading.Event()
+    blocker = executor.submit_io(release.wait)
+    try:
+        with pytest.raises(ExecutorBusyError):
+            executor.submit_io(time.sleep, 0)
+    finally:
+        release.set()
+        blocker.result()
+
+    with pytest.raises(TaskTimeoutError):
+        asyncio.run(executor.run_io(time.sleep, 0.5, timeout=0.01))
+    executor.shutdown()
+    assert executor.in_flight == 0
+
+
+def test_executor_result_times_out():
+    executor = TaskExecutor(use_processes=False, thread_workers=1)
+    with pytest.raises(TaskTimeoutError):
+        executor.result(executor.submit_io(time.sleep, 0.5), timeout=0.01)
+    executor.shutdown()
+
+
+def test_compare_async_with_text_matches_compare():
+    executor = TaskExecutor(use_processes=False)
+    service = DocumentComparisonService(executor=executor)
+
+    report = asyncio.run(service.compare_async("promise_letter", SYSTEM_DATA, document_text=DOCUMENT_TEXT))
+
+    assert report == service.compare("promise_letter", SYSTEM_DATA, document_text=DOCUMENT_TEXT)
+    executor.shutdown()
+
+
+def test_warm_up_compiles_templates_and_starts_workers():
+    executor = TaskExecutor(process_workers=2)
+    service = DocumentComparisonService(executor=executor)
+    try:
+        summary = service.warm_up(WarmUpConfig(enabled=True, parsers=[".txt"], templates=["promise_letter", "missing"]))
+    finally:
+        executor.shutdown()
+
+    assert summary["templates"] == ["promise_letter"]
+    assert summary["missing_backends"] == []
+    assert summary["workers"] == 2
+
+
+def test_cpu_work_without_processes_does_not_wait_on_the_io_pool():
+    executor = TaskExecutor(use_processes=False, process_workers=1, thread_workers=1)
+
+    def driver():
+        # a batch driver occupying the only I/O thread while it waits on CPU work
+        return executor.submit_cpu(sum, [1, 2]).result(timeout=5)
+
+    assert executor.result(executor.submit_io(driver), timeout=10) == 3
+    executor.shutdown()
+
+
+def test_io_pool_covers_the_workers_and_batch_drivers_run_apart():
+    executor = TaskExecutor(process_workers=2, thread_workers=1, driver_workers=1)
+    # one comparison per worker process plus light work run at once
+    barrier = threading.Barrier(3, timeout=5)
+    futures = [executor.submit_io(barrier.wait) for _ in range(3)]
+    assert all(executor.result(future, timeout=10) is not None for future in futures)
+
+    release = threading.Event()
+    driver = executor.submit_driver(release.wait, 5)
+    assert executor.result(executor.submit_io(sum, [1, 2]), timeout=10) == 3
+    release.set()
+    assert executor.result(driver, timeout=10)
+    executor.shutdown()
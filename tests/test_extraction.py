@@ -0,0 +1,49 @@
+import json
+
+from datacomparison.services.extraction import RegexExtractor, SinglePassScanner, literal_prefixes
+from datacomparison.services.service import DocumentComparisonService
+from datacomparison.templates import TemplateRegistry
+
+
+def test_literal_prefixes():
+    assert literal_prefixes("姓名[：:]?\\s*(?P<value>.+)") == ["姓名"]
+    assert literal_prefixes("(?:姓名|名称)[：:](.+)") == ["姓名", "名称"]
+    assert literal_prefixes("日期?(.+)") == ["日"]
+    assert literal_prefixes("a|b") == []
+    assert literal_prefixes("[ab]c") == []
+
+
+def test_single_pass_scanner_matches_per_field_search():
+    extractor = RegexExtractor()
+    patterns = {
+        "date": "日期[：:]?(?P<value>[0-9-]+)",
+        "period": "期[:](\\d)",
+        "amount": "(?:金额|总额)[：:]?(?P<value>[0-9,.]+)",
+        "any_digit": "[0-9](\\d)",
+    }
+    compiled = [extractor.compile({"pattern": pattern}, name) for name, pattern in patterns.items()]
+    text = "签署期:1\n总额：5.00\n日期：2024-05-20\n金额：100"
+
+    expected = {item.field_name: item(text) for item in compiled}
+
+    assert SinglePassScanner(compiled).scan(text) == expected
+    assert SinglePassScanner(compiled).scan("") == {item.field_name: item("") for item in compiled}
+
+
+def test_single_pass_template_mode(tmp_path):
+    source = json.loads((TemplateRegistry()._base_path / "promise_letter.json").read_text(encoding="utf-8"))
+    source["template"]["extraction_mode"] = "single_pass"
+    (tmp_path / "promise_letter.json").write_text(json.dumps(source, ensure_ascii=False), encoding="utf-8")
+    service = DocumentComparisonService(template_registry=TemplateRegistry(tmp_path))
+    document_text = "承诺书\n姓名：张三\n身份证号：110101199001011234\n金额：100,000.00\n日期：2024-05-20"
+    system_data = {
+        "customer_name": "张三",
+        "id_number": "110101199001011234",
+        "amount": "100000.00",
+        "signing_date": "2024-05-20",
+    }
+
+    report = service.compare("promise_letter", system_data, document_text=document_text)
+
+    assert service.template_registry.load("promise_letter").plan.scanner is not None
+    assert report.status == "pass"
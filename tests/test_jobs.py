@@ -0,0 +1,97 @@
+import threading
+import time
+
+from datacomparison.services import jobs
+from datacomparison.services.executor import TaskExecutor
+from datacomparison.services.service import DocumentComparisonService
+
+PAYLOAD = {
+    "template_id": "promise_letter",
+    "system_data": {"customer_name": "张三"},
+    "document_text": "姓名：张三",
+}
+
+
+def make_worker(store, service=None):
+    service = service or DocumentComparisonService(executor=TaskExecutor(use_processes=False))
+    return jobs.JobWorker(store, service, retry_backoff_seconds=0.0)
+
+
+def test_job_round_trip(tmp_path):
+    store = jobs.JobStore(tmp_path / "jobs.sqlite3")
+    job_id = store.submit(PAYLOAD)
+
+    assert make_worker(store).run_once()
+
+    job = store.get(job_id)
+    assert job.status == jobs.SUCCEEDED
+    report = jobs.report_from_dict(store.result(job_id))
+    assert report.fields[0].field_name == "customer_name"
+    assert report.fields[0].passed
+
+
+def test_transient_failures_retry_until_max_attempts(tmp_path):
+    class FlakyService:
+        calls = 0
+
+        def compare(self, **kwargs):
+            FlakyService.calls += 1
+            raise RuntimeError("OCR backend unavailable")
+
+    store = jobs.JobStore(tmp_path / "jobs.sqlite3")
+    job_id = store.submit(PAYLOAD, max_attempts=2)
+    worker = make_worker(store, FlakyService())
+
+    while worker.run_once():
+        pass
+
+    job = store.get(job_id)
+    assert FlakyService.calls == 2
+    assert job.status == jobs.FAILED
+    assert job.error == "OCR backend unavailable"
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    crashed = jobs.JobStore(path, lease_seconds=-1)
+    job_id = crashed.submit(PAYLOAD)
+    assert crashed.claim().job_id == job_id  # worker dies without completing
+
+    restarted = jobs.JobStore(path)
+    assert make_worker(restarted).run_once()
+    assert restarted.get(job_id).status == jobs.SUCCEEDED
+    assert restarted.get(job_id).attempts == 2
+
+
+def test_expired_lease_on_last_attempt_fails_the_job(tmp_path):
+    store = jobs.JobStore(tmp_path / "jobs.sqlite3", lease_seconds=-1)
+    job_id = store.submit(PAYLOAD, max_attempts=1)
+    stale = store.claim()
+
+    assert store.claim() is None
+    job = store.get(job_id)
+    assert job.status == jobs.FAILED
+    assert job.attempts == 1
+    assert not store.complete(job_id, {}, stale.lease_expires_at)
+
+
+def test_lease_is_renewed_while_a_slow_job_runs(tmp_path):
+    class SlowService:
+        def compare(self, **kwargs):
+            time.sleep(0.5)
+            return DocumentComparisonService().compare(**{**kwargs, "offload": False})
+
+    store = jobs.JobStore(tmp_path / "jobs.sqlite3", lease_seconds=0.3)
+    job_id = store.submit(PAYLOAD)
+    worker = make_worker(store, SlowService())
+    competitor = jobs.JobStore(tmp_path / "jobs.sqlite3", lease_seconds=0.3)
+
+    thread = threading.Thread(target=worker.run_once)
+    thread.start()
+    time.sleep(0.4)
+    assert competitor.claim() is None  # the first worker still holds the lease
+    thread.join()
+
+    job = store.get(job_id)
+    assert job.status == jobs.SUCCEEDED
+    assert job.attempts == 1
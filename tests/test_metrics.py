@@ -0,0 +1,48 @@
+import pytest
+
+from datacomparison.services import metrics
+from datacomparison.services.metrics import MetricsRegistry
+from datacomparison.services.service import DocumentComparisonService
+
+DOCUMENT = "承诺书\n姓名：张三\n身份证号：110101199001011234\n金额：100,000.00\n日期：2024-05-20"
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    latency = registry.histogram("demo_seconds", "Demo latency", ("stage",), buckets=(0.1, 1.0))
+    calls = registry.counter("demo_calls", "Demo calls", ("result",))
+    latency.labels("parse").observe(0.05)
+    latency.labels("parse").observe(0.5)
+    latency.labels("parse").observe(5)
+    calls.labels('a"b').inc()
+
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{stage="parse",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="parse",le="1"} 2' in text
+    assert 'demo_seconds_bucket{stage="parse",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{stage="parse"} 3' in text
+    assert 'demo_calls_total{result="a\\"b"} 1' in text
+
+
+def test_compare_records_stage_timings_and_counters():
+    service = DocumentComparisonService()
+    passed = metrics.field_results.value("promise_letter", "customer_name", "passed")
+    report = service.compare("promise_letter", {"customer_name": "张三", "amount": "1"}, document_text=DOCUMENT)
+
+    assert {"extraction", "normalization", "comparison", "total"} <= set(report.timings)
+    assert report.timings["total"] >= report.timings["comparison"]
+    assert metrics.field_results.value("promise_letter", "customer_name", "passed") == passed + 1
+    assert metrics.stage_seconds.labels("total", "promise_letter", "inline").count >= 1
+    assert 'datacomparison_comparisons_total{template="promise_letter",status="fail"}' in metrics.registry.render()
+
+
+def test_failures_for_unknown_templates_share_one_label():
+    service = DocumentComparisonService()
+    unknown = metrics.failures.value("unknown", "FileNotFoundError")
+    for template_id in ("no-such-template-1", "no-such-template-2"):
+        with pytest.raises(FileNotFoundError):
+            service.compare(template_id, {}, document_text=DOCUMENT)
+
+    assert metrics.failures.value("unknown", "FileNotFoundError") == unknown + 2
+    assert metrics.failures.value("no-such-template-1", "FileNotFoundError") == 0
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from datacomparison.utils.normalizers import normalize_batch, normalize_date, normalize_numeric
+
+
+def test_normalize_date_formats():
+    for value in ("2024-05-20", "2024/5/20", "2024.05.20", "20240520", "2024-05-20 10:30:00", "2024年5月20日", "２０２４年０５月２０日"):
+        assert normalize_date(value) == "2024-05-20", value
+    assert normalize_date("2024-02-30") is None
+    assert normalize_date("2024-05/20") is None
+    assert normalize_date(None) is None
+
+
+def test_normalize_date_is_as_lenient_as_strptime():
+    def strptime(value, fmt):
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            return None
+
+    for value in ("2024520", "202451", "2024121", "20241231", "2024132", "20241132", "2024000", "20240230", "2024"):
+        assert normalize_date(value) == strptime(value, "%Y%m%d"), value
+    for value in ("2024-05-20 1:2:3", "2024-05-20 23:59:59", "2024-05-20 24:00:00", "2024-05-20 10:60:00", "2024-05-20 1:2"):
+        assert normalize_date(value) == strptime(value, "%Y-%m-%d %H:%M:%S"), value
+    assert normalize_date("2024520") == "2024-05-20"
+
+
+def test_normalize_numeric_plain_full_width_and_chinese_amounts():
+    assert normalize_numeric("100,000.00") == "100000"
+    assert normalize_numeric("-0012.50") == "-12.5"
+    assert normalize_numeric("1e3") == "1000"
+    assert normalize_numeric("１００，０００．５０") == "100000.5"
+    assert normalize_numeric("壹拾万元整") == "100000"
+    assert normalize_numeric("人民币叁佰零伍元肆角伍分") == "305.45"
+    assert normalize_numeric("一亿二千万") == "120000000"
+    assert normalize_numeric("一二三") is None
+    assert normalize_numeric("abc") is None
+
+
+def test_normalize_batch_keeps_order():
+    values = ["2024年5月20日", None, "2024/5/20", "bad", "2024年5月20日"]
+    assert normalize_batch(normalize_date, values) == ["2024-05-20", None, "2024-05-20", None, "2024-05-20"]
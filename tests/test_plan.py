@@ -0,0 +1,161 @@
+import dataclasses
+import json
+from decimal import Decimal
+
+import pytest
+
+from datacomparison.config import settings
+from datacomparison.services import comparison, extraction
+from datacomparison.services.document_parser import DEFAULT_REGISTRY, ParsedDocument
+from datacomparison.services.service import DocumentComparisonService
+from datacomparison.templates import TemplateRegistry
+
+
+def test_template_load_compiles_plan():
+    template = TemplateRegistry().load("promise_letter")
+    plan = template.plan
+
+    assert [field.name for field in plan.fields] == list(template.fields)
+    by_name = {field.name: field for field in plan.fields}
+    assert by_name["amount"].comparison_config["tolerance"] == Decimal("0")
+    assert by_name["customer_name"].comparison_config["threshold"] == 0.9
+    assert by_name["customer_name"].extract("姓名：张三").value == "张三"
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        plan.fields[0].required = False  # type: ignore[misc]
+
+
+def test_service_recompiles_plan_for_custom_registries():
+    extractor_registry = extraction.ExtractorRegistry()
+    comparator_registry = comparison.ComparatorRegistry()
+    service = DocumentComparisonService(
+        template_registry=TemplateRegistry(),
+        extractor_registry=extractor_registry,
+        comparator_registry=comparator_registry,
+    )
+    template = service.template_registry.load("promise_letter")
+
+    plan = service._plan_for(template)
+
+    assert plan is not template.plan
+    assert plan.built_with(extractor_registry, comparator_registry)
+    assert service._plan_for(template) is plan
+
+
+def test_extract_pages_stops_once_required_fields_match():
+    plan = TemplateRegistry().load("promise_letter").plan
+    pages = ["承诺书\n姓名：张三\n身份证号：110101199001011234", "金额：100,000.00\n日期：", "2024-05-20", "附件"]
+    consumed = []
+
+    def page_stream():
+        for page in pages:
+            consumed.append(page)
+            yield page
+
+    text, extractions, complete = plan.extract_pages(page_stream())
+
+    assert consumed == pages[:3]
+    assert not complete
+    assert extractions["signing_date"].value == "2024-05-20"
+    assert {name: result.value for name, result in extractions.items()} == {
+        name: result.value for name, result in plan.extract_all("\n".join(pages)).items()
+    }
+
+
+def test_fail_fast_skips_pages_and_fields_after_required_failure():
+    service = DocumentComparisonService()
+    plan = service._resolve_plan("promise_letter", fail_fast=True)
+    assert [field.name for field in plan.evaluation_order] == ["id_number", "amount", "signing_date", "customer_name"]
+    pages = ["承诺书\n身份证号：110101199001011299", "金额：100,000.00", "日期：2024-05-20", "姓名：张三"]
+    consumed = []
+
+    def page_stream():
+        for page in pages:
+            consumed.append(page)
+            yield page
+
+    fails = lambda field_plan, extracted: field_plan.name == "id_number"  # noqa: E731
+    _text, _extractions, complete = plan.extract_pages(page_stream(), stop_early=True, decided=fails)
+    assert consumed == pages[:1]
+    assert not complete
+
+    # customer_name is evaluated last: its failure on page 1 must not stop before id_number is read
+    asked = []
+    everything_fails = lambda field_plan, extracted: asked.append(field_plan.name) or True  # noqa: E731
+    consumed.clear()
+    pages.insert(0, "姓名：李四")
+    _text, _extractions, complete = plan.extract_pages(page_stream(), stop_early=True, decided=everything_fails)
+    assert consumed == pages[:2]
+    assert asked == ["id_number"]
+    pages.pop(0)
+
+    system_data = {
+        "customer_name": "张三",
+        "id_number": "110101199001011234",
+        "amount": "100000.00",
+        "signing_date": "2024-05-20",
+    }
+    report = service.compare("promise_letter", system_data, document_text="\n".join(pages), fail_fast=True)
+    by_name = {field.field_name: field for field in report.fields}
+    assert report.status == "fail"
+    assert list(by_name) == ["customer_name", "id_number", "amount", "signing_date"]
+    assert by_name["id_number"].evaluated and not by_name["id_number"].passed
+    assert not any(by_name[name].evaluated for name in ("amount", "signing_date", "customer_name"))
+    assert by_name["amount"].extracted_value is None
+
+    system_data["id_number"] = "110101199001011299"
+    report = service.compare("promise_letter", system_data, document_text="\n".join(pages), fail_fast=True)
+    assert report.passed
+    assert all(field.evaluated for field in report.fields)
+
+
+def test_region_template_ocrs_only_regions(tmp_path, monkeypatch, caplog):
+    template = {
+        "template": {
+            "fields": [
+                {
+                    "name": "id_number",
+                    "extractor": {"strategy": "regex", "pattern": "身份证号[：:]?\\s*(?P<value>[0-9Xx]{6,})"},
+                    "comparison": {"strategy": "exact"},
+                    "region": {"box": [0.1, 0.1, 0.9, 0.2], "ocr": "id_number"},
+                },
+                {
+                    "name": "amount",
+                    "extractor": {"strategy": "regex", "pattern": "金额[：:]?\\s*(?P<value>[0-9,.]+)"},
+                    "comparison": {"strategy": "numeric"},
+                    "normalizers": ["numeric"],
+                    "region": {"box": [0.1, 0.3, 0.9, 0.4], "ocr": "amount"},
+                },
+            ]
+        }
+    }
+    (tmp_path / "scan.json").write_text(json.dumps(template), encoding="utf-8")
+    del template["template"]["fields"][1]["region"]
+    (tmp_path / "partial.json").write_text(json.dumps(template), encoding="utf-8")
+
+    class RegionParser:
+        def __init__(self):
+            self.calls = []
+
+        def parse(self, path):
+            raise AssertionError("full-page OCR should be skipped")
+
+        def parse_regions(self, path, regions):
+            self.calls.append([region.field_name for region in regions])
+            return ParsedDocument(id_number="110101199001011234\n", amount="金额：100,000.00")
+
+    parser = RegionParser()
+    monkeypatch.setitem(DEFAULT_REGISTRY.parsers, ".png", parser)
+    monkeypatch.setattr(settings.cache, "enabled", False)
+    service = DocumentComparisonService(template_registry=TemplateRegistry(base_path=tmp_path))
+    system_data = {"id_number": "110101199001011234", "amount": "100000"}
+
+    report = service.compare("scan", system_data, document_path=tmp_path / "scan.png")
+
+    assert service._resolve_plan("scan").region_only
+    assert parser.calls == [["id_number", "amount"]]
+    assert report.status == "pass"
+    # the id box holds only the value, taken whole with reduced confidence
+    assert [field.confidence for field in report.fields] == [0.8, 1.0]
+    with caplog.at_level("WARNING", logger="datacomparison.services.plan"):
+        assert not service._resolve_plan("partial").region_only
+    assert "Fields without a region: amount" in caplog.text
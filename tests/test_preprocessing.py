@@ -0,0 +1,62 @@
+import pytest
+
+from datacomparison.services import preprocessing as preprocessing_module
+from datacomparison.services.preprocessing import ImagePreprocessing, otsu_threshold
+
+
+def test_from_config_validates_and_orders_steps():
+    preprocessing = ImagePreprocessing.from_config(
+        {"color": "binarize", "crop_margins": True, "target_dpi": 300, "deskew": True}
+    )
+
+    assert preprocessing.steps == ("grayscale", "downscale", "deskew", "crop_margins", "binarize")
+    assert preprocessing.signature != ImagePreprocessing.from_config({"color": "binarize", "target_dpi": 300}).signature
+    assert ImagePreprocessing.from_config({}) is None
+    assert ImagePreprocessing.from_config({"deskew": False}) is None
+    with pytest.raises(ValueError):
+        ImagePreprocessing.from_config({"color": "sepia"})
+    with pytest.raises(ValueError):
+        ImagePreprocessing.from_config({"target_dpi": 300, "dpi": 200})
+
+
+def test_otsu_threshold_separates_ink_from_paper():
+    histogram = [0] * 256
+    histogram[30] = 100
+    histogram[220] = 900
+
+    assert 30 <= otsu_threshold(histogram) < 220
+    assert otsu_threshold([0] * 256) == 128
+
+
+def test_apply_downscales_to_target_dpi_and_records_steps():
+    Image = pytest.importorskip("PIL.Image")
+    image = Image.new("RGB", (1200, 1600), "white")
+    image.paste((0, 0, 0), (200, 300, 1000, 340))
+    image.info["dpi"] = (600, 600)
+    preprocessing = ImagePreprocessing.from_config({"target_dpi": 300, "color": "binarize", "crop_margins": True})
+    preprocessing_module.stats.reset()
+
+    processed = preprocessing.apply(image)
+
+    assert processed.mode == "1"
+    assert processed.size[0] < 600 and processed.size[1] < 100
+    totals = preprocessing_module.stats.snapshot()
+    assert set(totals) == {"decode", "grayscale", "downscale", "crop_margins", "binarize"}
+    assert totals["downscale"].bytes_saved == 1200 * 1600 - 600 * 800
+    assert processed.info["dpi"] == (300, 300)
+
+
+def test_collected_steps_reach_the_process_wide_stats_and_metrics():
+    Image = pytest.importorskip("PIL.Image")
+    from datacomparison.services import metrics
+
+    preprocessing = ImagePreprocessing.from_config({"color": "grayscale"})
+    preprocessing_module.stats.reset()
+    with preprocessing_module.collect_stats() as collected:
+        preprocessing.apply(Image.new("RGB", (200, 100), "white"))
+
+    # as in a worker process: nothing reaches the process-wide stats until merged
+    assert preprocessing_module.stats.snapshot() == {}
+    preprocessing_module.stats.merge(collected.as_dict())
+    assert preprocessing_module.stats.snapshot()["grayscale"].bytes_saved == 200 * 100 * 3
+    assert 'datacomparison_preprocessing_bytes_saved_total{step="grayscale"} 60000' in metrics.registry.render()
@@ -0,0 +1,84 @@
+import json
+
+from datacomparison.services.executor import TaskExecutor
+from datacomparison.services.reconciliation import Reconciler, SystemRecordIndex, key_normalizer
+from datacomparison.services.service import DocumentComparisonService
+from datacomparison.templates import TemplateRegistry
+
+
+def test_record_index_builds_from_csv_and_jsonl(tmp_path):
+    csv_source = tmp_path / "records.csv"
+    csv_source.write_text("id_number,customer_name\n1,张三\n2,李四\n,无键\n2,李四四\n", encoding="utf-8")
+    index = SystemRecordIndex.build(csv_source, tmp_path / "records.sqlite3")
+    assert len(index) == 2
+    assert index.get("2")["customer_name"] == "李四四"
+    assert index.get("3") is None
+    index.close()
+
+    jsonl_source = tmp_path / "records.jsonl"
+    jsonl_source.write_text(json.dumps({"id_number": 7, "amount": "1.00"}) + "\n", encoding="utf-8")
+    index = SystemRecordIndex.build(jsonl_source, tmp_path / "records-jsonl.sqlite3")
+    assert index.get("7") == {"id_number": "7", "amount": "1.00"}
+    index.close()
+
+
+def test_reconciler_matches_documents_by_extracted_key(tmp_path):
+    source = tmp_path / "records.csv"
+    source.write_text(
+        "id_number,customer_name,amount,signing_date\n"
+        "110101199001011234,张三,100000.00,2024-05-20\n"
+        "110101199001019999,王五,5.00,2024-01-01\n",
+        encoding="utf-8",
+    )
+    documents = []
+    for name, id_number in (("match.txt", "110101199001011234"), ("orphan.txt", "110101199001010000")):
+        document = tmp_path / name
+        document.write_text(
+            f"承诺书\n姓名：张三\n身份证号：{id_number}\n金额：100,000.00\n日期：2024-05-20", encoding="utf-8"
+        )
+        documents.append(document)
+
+    executor = TaskExecutor(use_processes=False)
+    index = SystemRecordIndex.build(source, tmp_path / "records.sqlite3")
+    reconciler = Reconciler(index, DocumentComparisonService(executor=executor))
+    results = list(reconciler.iter_reconcile(documents, "promise_letter"))
+    executor.shutdown()
+
+    assert [(result.key, result.matched) for result in results] == [
+        ("110101199001011234", True),
+        ("110101199001010000", False),
+    ]
+    assert results[0].report.status == "pass"
+    assert results[1].report.status == "fail"
+    assert [key for key, _ in reconciler.unmatched_records()] == ["110101199001019999"]
+    index.close()
+
+
+def test_record_keys_go_through_the_key_fields_normalizers(tmp_path):
+    fields = [
+        {"name": "signing_date", "normalizers": ["date"], "extractor": {"strategy": "regex", "pattern": "日期：(?P<value>\\S+)"}},
+        {"name": "customer_name", "extractor": {"strategy": "regex", "pattern": "姓名：(?P<value>\\S+)"}},
+    ]
+    (tmp_path / "dated.json").write_text(json.dumps({"template": {"fields": fields}}, ensure_ascii=False), encoding="utf-8")
+    source = tmp_path / "records.jsonl"
+    source.write_text(
+        json.dumps({"signing_date": " 2024/05/20 ", "customer_name": "张三"}, ensure_ascii=False)
+        + "\n"
+        + json.dumps({"signing_date": None, "customer_name": "无键"}, ensure_ascii=False)
+        + "\n",
+        encoding="utf-8",
+    )
+    document = tmp_path / "letter.txt"
+    document.write_text("姓名：张三\n日期：2024年5月20日", encoding="utf-8")
+
+    executor = TaskExecutor(use_processes=False)
+    service = DocumentComparisonService(executor=executor, template_registry=TemplateRegistry(base_path=tmp_path))
+    normalize_key = key_normalizer("signing_date", "dated", service)
+    index = SystemRecordIndex.build(source, tmp_path / "records.sqlite3", "signing_date", normalize_key)
+    results = list(Reconciler(index, service).iter_reconcile([document], "dated"))
+    executor.shutdown()
+
+    assert len(index) == 1
+    assert [(result.key, result.matched) for result in results] == [("2024-05-20", True)]
+    assert list(index.unseen()) == []
+    index.close()
@@ -1,4 +1,14 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from datacomparison.config import settings
+from datacomparison.services.cache import ParseCache, cache as parse_cache
+from datacomparison.services.extraction_store import ExtractionStore, StoredExtractions, extractions_cache
 from datacomparison.services.service import DocumentComparisonService
+from datacomparison.templates import TemplateRegistry
 
 
 def test_document_comparison_pass():
@@ -35,3 +45,122 @@ def test_document_comparison_fail_on_mismatch():
     assert not result_by_field["customer_name"].passed
     assert not result_by_field["amount"].passed
     assert result_by_field["id_number"].passed
+
+
+def test_compare_batch_reports_per_item_errors_in_order(tmp_path):
+    from datacomparison.services.executor import TaskExecutor
+    from datacomparison.services.service import BatchItem
+
+    executor = TaskExecutor(use_processes=False)
+    service = DocumentComparisonService(executor=executor)
+    system_data = {
+        "customer_name": "张三",
+        "id_number": "110101199001011234",
+        "amount": "100000.00",
+        "signing_date": "2024-05-20",
+    }
+    document_text = "承诺书\n姓名：张三\n身份证号：110101199001011234\n金额：100,000.00\n日期：2024-05-20"
+    document = tmp_path / "letter.txt"
+    document.write_text(document_text, encoding="utf-8")
+    items = [
+        BatchItem(system_data=system_data, template_id="promise_letter", document_text=document_text),
+        BatchItem(system_data=system_data, template_id="missing_template", document_text=document_text),
+        BatchItem(system_data=system_data, document_path=document),
+        BatchItem(system_data=system_data, document_path=tmp_path / "absent.txt"),
+    ]
+
+    results = service.compare_batch(items)
+    executor.shutdown()
+
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    assert results[0].report.status == "pass"
+    assert "missing_template" in results[1].error
+    assert results[2].report.status == "pass"
+    assert not results[3].ok
+
+
+def test_iter_compare_batch_unordered_yields_every_item():
+    from datacomparison.services.executor import TaskExecutor
+    from datacomparison.services.service import BatchItem
+
+    executor = TaskExecutor(use_processes=False)
+    service = DocumentComparisonService(executor=executor)
+    items = [BatchItem(system_data={"customer_name": "张三"}, document_text="姓名：张三") for _ in range(10)]
+
+    results = list(service.iter_compare_batch(items, ordered=False, window=3))
+    executor.shutdown()
+
+    assert sorted(result.index for result in results) == list(range(10))
+    assert all(result.ok for result in results)
+
+
+def _write_letter_template(path, amount_pattern):
+    fields = [
+        {"name": "customer_name", "extractor": {"type": "regex", "pattern": r"姓名[:：]\s*(?P<value>\S+)"}},
+        {"name": "amount", "extractor": {"type": "regex", "pattern": amount_pattern}, "comparison": {"strategy": "numeric"}},
+    ]
+    path.write_text(json.dumps({"template": {"description": "Letter", "fields": fields}}), encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_recompare_reuses_extractions_and_reextracts_changed_fields(tmp_path):
+    _write_letter_template(tmp_path / "letter.json", r"金额[:：]\s*(?P<value>[\d.]+)")
+    registry = TemplateRegistry(base_path=tmp_path)
+    service = DocumentComparisonService(template_registry=registry, extraction_store=ExtractionStore(ParseCache()))
+    text = "姓名：张三\n金额：100\n合计：200"
+
+    first = service.compare("letter", {"customer_name": "李四", "amount": "100"}, document_text=text)
+    assert not first.passed
+
+    corrected = service.recompare(None, {"customer_name": "张三", "amount": "100"}, document_digest=first.document_digest)
+    assert corrected.passed
+    assert corrected.document_digest == first.document_digest
+    assert "extraction" not in corrected.timings and "normalization" in corrected.timings
+
+    _write_letter_template(tmp_path / "letter.json", r"合计[:：]\s*(?P<value>[\d.]+)")
+    registry.refresh()
+    with pytest.raises(LookupError):
+        # the changed field needs the text, which is not kept for inline documents
+        service.recompare("letter", {"customer_name": "张三", "amount": "200"}, document_digest=first.document_digest)
+    report = service.recompare("letter", {"customer_name": "张三", "amount": "200"}, document_text=text)
+    assert report.passed
+    assert {field.field_name: field.extracted_value for field in report.fields} == {"customer_name": "张三", "amount": "200"}
+    with pytest.raises(LookupError):
+        service.recompare("letter", {}, document_digest="0" * 64)
+
+
+def test_recompare_after_fail_fast_covers_the_skipped_fields():
+    store = ExtractionStore(ParseCache())
+    service = DocumentComparisonService(extraction_store=store)
+    text = "承诺书\n姓名：张三\n身份证号：110101199001011234\n金额：100,000.00\n日期：2024-05-20"
+    system_data = {"customer_name": "张三", "id_number": "110101199001019999", "amount": "100000.00", "signing_date": "2024-05-20"}
+
+    first = service.compare("promise_letter", system_data, document_text=text, fail_fast=True)
+    skipped = [field.field_name for field in first.fields if not field.evaluated]
+    assert skipped
+    # skipped fields are recorded, not extracted on the request path
+    assert store.get(first.document_digest).skipped == skipped
+
+    corrected = {**system_data, "id_number": "110101199001011234"}
+    report = service.recompare(None, corrected, document_digest=first.document_digest)
+    assert report.status == "fail"
+    assert all("未保存" in field.message for field in report.fields if field.field_name in skipped)
+
+    # given the document again, the recomparison extracts them and stores them for later
+    assert service.recompare(None, corrected, document_text=text).passed
+    assert store.get(first.document_digest).skipped == []
+    assert service.recompare(None, corrected, document_digest=first.document_digest).passed
+
+
+def test_extraction_store_merges_concurrent_puts_outside_the_parse_cache(monkeypatch):
+    store = ExtractionStore(ParseCache())
+    stored = [StoredExtractions(template_id=f"t{index}", template_version="1") for index in range(20)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda item: store.put("digest", item), stored))
+
+    assert all(store.get("digest", item.template_id) is not None for item in stored)
+    assert ExtractionStore().cache is None
+    monkeypatch.setattr(settings.cache, "store_extractions", True)
+    assert ExtractionStore().cache is extractions_cache
+    assert extractions_cache is not parse_cache
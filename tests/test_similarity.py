@@ -0,0 +1,42 @@
+import pytest
+
+from datacomparison.services.comparison import FuzzyComparator
+from datacomparison.services.similarity import (
+    damerau_distance,
+    jaro_winkler,
+    levenshtein,
+    levenshtein_distance,
+    score_pairs,
+    token_set,
+)
+
+
+def test_edit_distances():
+    assert levenshtein_distance("kitten", "sitting") == 3
+    assert levenshtein_distance("", "abc") == 3
+    assert damerau_distance("ca", "ac") == 1
+    assert levenshtein_distance("ca", "ac") == 2
+    assert damerau_distance("北京市朝阳区", "北京朝市阳区") == 1
+    assert jaro_winkler("MARTHA", "MARHTA") == pytest.approx(0.9611, abs=1e-4)
+    assert token_set("北京市 朝阳区 建国路", "建国路 北京市 朝阳区") == 1.0
+
+
+def test_threshold_early_exit_keeps_decisions_exact():
+    pairs = [("上海市浦东新区世纪大道100号", "上海市浦东新区世纪大道101号"), ("张三", "李四五六七"), ("abcdef", "badcfe")]
+    for threshold in (0.3, 0.6, 0.9):
+        bounded = score_pairs(pairs, "levenshtein", threshold)
+        exact = [levenshtein(a, b) for a, b in pairs]
+        assert [score >= threshold for score in bounded] == [score >= threshold for score in exact]
+        assert levenshtein_distance("张三", "李四五六七", max_distance=1) == 2
+
+
+def test_fuzzy_comparator_metric_is_configurable():
+    comparator = FuzzyComparator()
+    config = comparator.prepare({"strategy": "fuzzy", "metric": "token_set", "threshold": 0.9})
+    assert comparator.compare("address", "朝阳区 建国路", "建国路 朝阳区", config).passed
+
+    config = comparator.prepare({"strategy": "fuzzy", "metric": "levenshtein", "threshold": 0.9})
+    assert not comparator.compare("address", "朝阳区 建国路", "建国路 朝阳区", config).passed
+
+    with pytest.raises(KeyError):
+        comparator.prepare({"metric": "unknown"})
@@ -0,0 +1,81 @@
+import json
+import os
+
+import pytest
+
+from datacomparison.config import settings
+from datacomparison.services.service import DocumentComparisonService
+from datacomparison.templates import TemplateRegistry
+
+
+def _write(path, pattern, keywords=("承诺书",)):
+    template = {
+        "template": {
+            "description": "Promise letter",
+            "keywords": list(keywords),
+            "fields": [{"name": "customer_name", "extractor": {"type": "regex", "pattern": pattern}}],
+        }
+    }
+    path.write_text(json.dumps(template, ensure_ascii=False), encoding="utf-8")
+    # bump the mtime explicitly: coarse filesystem clocks may not tick between writes
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_refresh_reloads_only_changed_templates(tmp_path):
+    _write(tmp_path / "letter.json", r"姓名[:：]\s*(?P<value>\S+)")
+    _write(tmp_path / "other.json", r"名称[:：]\s*(?P<value>\S+)")
+    registry = TemplateRegistry(base_path=tmp_path)
+    letter, other = registry.load("letter"), registry.load("other")
+    service = DocumentComparisonService(template_registry=registry)
+    assert service.compare("letter", {"customer_name": "张三"}, document_text="姓名：张三").passed
+
+    assert registry.refresh() == []
+    _write(tmp_path / "letter.json", r"客户[:：]\s*(?P<value>\S+)", keywords=("借款合同",))
+    assert registry.refresh() == ["letter"]
+
+    reloaded = registry.load("letter")
+    assert reloaded.version != letter.version
+    assert registry.load("other") is other
+    assert registry.classifier().classify("借款合同").template_id == "letter"
+    report = service.compare("letter", {"customer_name": "张三"}, document_text="客户：张三")
+    assert report.passed
+    assert report.template_version == reloaded.version
+
+
+def test_refresh_keeps_previous_version_when_reload_fails_and_drops_deleted(tmp_path):
+    _write(tmp_path / "letter.json", r"姓名[:：]\s*(?P<value>\S+)")
+    registry = TemplateRegistry(base_path=tmp_path)
+    letter = registry.load("letter")
+
+    (tmp_path / "letter.json").write_text("{not json", encoding="utf-8")
+    assert registry.refresh() == ["letter"]
+    assert registry.load("letter") is letter
+
+    (tmp_path / "letter.json").unlink()
+    (tmp_path / "new.json").write_text("{}", encoding="utf-8")
+    assert registry.refresh() == ["letter", "new"]
+    assert registry.template_ids() == ["new"]
+    with pytest.raises(FileNotFoundError):
+        registry.load("letter")
+
+
+def test_classifier_skips_broken_templates_and_misses_rescan_at_most_once_per_interval(tmp_path, monkeypatch):
+    _write(tmp_path / "letter.json", r"姓名[:：]\s*(?P<value>\S+)")
+    (tmp_path / "broken.json").write_text("{not json", encoding="utf-8")
+    registry = TemplateRegistry(base_path=tmp_path)
+
+    assert registry.classifier().classify("承诺书").template_id == "letter"
+
+    monkeypatch.setattr(settings.templates, "missing_rescan_seconds", 3600)
+    scans = []
+    monkeypatch.setattr(registry, "_scan", lambda scan=registry._scan: scans.append(1) or scan())
+    for _ in range(3):
+        with pytest.raises(FileNotFoundError):
+            registry.load("missing")
+    assert scans == []
+
+    monkeypatch.setattr(settings.templates, "missing_rescan_seconds", 0)
+    _write(tmp_path / "missing.json", r"姓名[:：]\s*(?P<value>\S+)")
+    assert registry.load("missing").template_id == "missing"
+    assert scans == [1]
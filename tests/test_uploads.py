@@ -0,0 +1,49 @@
+import asyncio
+import hashlib
+
+import pytest
+
+pytest.importorskip("python_multipart")
+from datacomparison.config import UploadConfig
+from datacomparison.services.uploads import UploadTooLargeError, read_multipart
+
+BOUNDARY = "----datacomparison"
+
+
+def _body(document: bytes, filename: str = "scan.png") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"template_id\"\r\n\r\npromise_letter\r\n"
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"document\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode("utf-8") + document + f"\r\n--{BOUNDARY}--\r\n".encode("utf-8")
+
+
+async def _chunks(body: bytes, size: int = 1000):
+    for start in range(0, len(body), size):
+        yield body[start : start + size]
+
+
+def _read(body: bytes, config: UploadConfig):
+    content_type = f"multipart/form-data; boundary={BOUNDARY}"
+    return asyncio.run(read_multipart(_chunks(body), content_type, config))
+
+
+def test_read_multipart_spools_large_upload_to_disk_and_hashes_it(tmp_path):
+    document = bytes(range(256)) * 200
+    form = _read(_body(document), UploadConfig(spool_bytes=4096, directory=tmp_path))
+
+    upload = form.upload
+    assert form.fields == {"template_id": "promise_letter"}
+    assert not upload.in_memory
+    assert upload.size == len(document)
+    assert upload.digest == hashlib.sha256(document).hexdigest()
+    path = upload.materialize()
+    assert path.suffix == ".png" and path.read_bytes() == document
+    form.close()
+    assert not path.exists()
+
+
+def test_read_multipart_rejects_oversized_upload(tmp_path):
+    with pytest.raises(UploadTooLargeError):
+        _read(_body(b"x" * 10_000), UploadConfig(max_bytes=5000, spool_bytes=1000, directory=tmp_path))
+    assert list(tmp_path.iterdir()) == []